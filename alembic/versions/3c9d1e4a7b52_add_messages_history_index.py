@@ -0,0 +1,33 @@
+"""Add messages history index
+
+Revision ID: 3c9d1e4a7b52
+Revises: f2ba65b31ae8
+Create Date: 2026-10-18 10:12:41.118204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "3c9d1e4a7b52"
+down_revision: Union[str, Sequence[str], None] = "f2ba65b31ae8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_messages_chat_id_created_at_id",
+        "messages",
+        ["chat_id", sa.text("created_at DESC"), sa.text("id DESC")],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_chat_id_created_at_id", table_name="messages")
@@ -0,0 +1,42 @@
+"""Create cached responses table
+
+Revision ID: 5a0e6c3d9f14
+Revises: b7f3a9c21e08
+Create Date: 2026-10-18 13:41:52.306417
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5a0e6c3d9f14"
+down_revision: Union[str, Sequence[str], None] = "b7f3a9c21e08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "cached_responses",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("response", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index(
+        op.f("ix_cached_responses_expires_at"),
+        "cached_responses",
+        ["expires_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_cached_responses_expires_at"), table_name="cached_responses")
+    op.drop_table("cached_responses")
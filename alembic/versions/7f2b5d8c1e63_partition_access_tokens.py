@@ -0,0 +1,113 @@
+"""Partition access tokens by day (optional)
+
+Revision ID: 7f2b5d8c1e63
+Revises: d41c7e2a9b36
+Create Date: 2026-10-18 16:20:11.504873
+
+Runs only with ``alembic -x partition_access_tokens=true upgrade head``;
+otherwise the revision is recorded without touching the table. After the
+switch the pruning task drops whole expired partitions instead of deleting
+rows. The primary key becomes (token, created_at) because a partitioned
+table needs the partition key in every unique constraint.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "7f2b5d8c1e63"
+down_revision: Union[str, Sequence[str], None] = "d41c7e2a9b36"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Дни назад (живые токены) и вперед, на которые партиции создаются сразу
+DAYS_BACK = 2
+DAYS_AHEAD = 7
+
+
+def _enabled() -> bool:
+    value = context.get_x_argument(as_dictionary=True).get("partition_access_tokens")
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def _midnight(day: date) -> str:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc).isoformat()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _enabled():
+        return
+
+    op.execute("ALTER TABLE access_tokens RENAME TO access_tokens_unpartitioned")
+    op.execute(
+        "ALTER INDEX ix_access_tokens_created_at "
+        "RENAME TO ix_access_tokens_unpartitioned_created_at"
+    )
+    op.execute(
+        "ALTER TABLE access_tokens_unpartitioned "
+        "RENAME CONSTRAINT access_tokens_pkey TO access_tokens_unpartitioned_pkey"
+    )
+    op.execute(
+        """
+        CREATE TABLE access_tokens (
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            token VARCHAR(43) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            PRIMARY KEY (token, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute("CREATE INDEX ix_access_tokens_created_at ON access_tokens (created_at)")
+    op.execute("CREATE TABLE access_tokens_default PARTITION OF access_tokens DEFAULT")
+
+    today = datetime.now(timezone.utc).date()
+    for offset in range(-DAYS_BACK, DAYS_AHEAD):
+        day = today + timedelta(days=offset)
+        op.execute(
+            f"CREATE TABLE access_tokens_p{day:%Y%m%d} PARTITION OF access_tokens "
+            f"FOR VALUES FROM ('{_midnight(day)}') "
+            f"TO ('{_midnight(day + timedelta(days=1))}')"
+        )
+
+    # Старше DAYS_BACK дней токены уходят в партицию по умолчанию, их дочистит DELETE
+    op.execute(
+        "INSERT INTO access_tokens (user_id, token, created_at) "
+        "SELECT user_id, token, created_at FROM access_tokens_unpartitioned"
+    )
+    op.execute("DROP TABLE access_tokens_unpartitioned")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if not _enabled():
+        return
+
+    op.execute("ALTER TABLE access_tokens RENAME TO access_tokens_partitioned")
+    op.execute(
+        "ALTER TABLE access_tokens_partitioned "
+        "RENAME CONSTRAINT access_tokens_pkey TO access_tokens_partitioned_pkey"
+    )
+    op.execute(
+        "ALTER INDEX ix_access_tokens_created_at "
+        "RENAME TO ix_access_tokens_partitioned_created_at"
+    )
+    op.execute(
+        """
+        CREATE TABLE access_tokens (
+            user_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+            token VARCHAR(43) NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            CONSTRAINT access_tokens_pkey PRIMARY KEY (token)
+        )
+        """
+    )
+    op.execute("CREATE INDEX ix_access_tokens_created_at ON access_tokens (created_at)")
+    op.execute(
+        "INSERT INTO access_tokens (user_id, token, created_at) "
+        "SELECT user_id, token, created_at FROM access_tokens_partitioned "
+        "ON CONFLICT (token) DO NOTHING"
+    )
+    op.execute("DROP TABLE access_tokens_partitioned")
@@ -0,0 +1,46 @@
+"""Add chat message counters
+
+Revision ID: 8e41b07f2d6a
+Revises: 3c9d1e4a7b52
+Create Date: 2026-10-18 11:03:27.540913
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "8e41b07f2d6a"
+down_revision: Union[str, Sequence[str], None] = "3c9d1e4a7b52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "chats",
+        sa.Column("message_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    op.add_column("chats", sa.Column("last_message_at", sa.DateTime(), nullable=True))
+    op.execute(
+        """
+        UPDATE chats
+        SET message_count = stats.message_count,
+            last_message_at = stats.last_message_at
+        FROM (
+            SELECT chat_id, count(*) AS message_count, max(created_at) AS last_message_at
+            FROM messages
+            GROUP BY chat_id
+        ) AS stats
+        WHERE chats.id = stats.chat_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("chats", "last_message_at")
+    op.drop_column("chats", "message_count")
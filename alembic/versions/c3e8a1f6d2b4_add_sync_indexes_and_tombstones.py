@@ -0,0 +1,65 @@
+"""Add sync indexes and tombstones table
+
+Revision ID: c3e8a1f6d2b4
+Revises: 7f2b5d8c1e63
+Create Date: 2026-10-18 18:21:09.412977
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c3e8a1f6d2b4"
+down_revision: Union[str, Sequence[str], None] = "7f2b5d8c1e63"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "tombstones",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "entity",
+            sa.Enum("CHAT", "MESSAGE", name="tombstoneentity"),
+            nullable=False,
+        ),
+        sa.Column("entity_id", sa.Integer(), nullable=False),
+        sa.Column("chat_id", sa.Integer(), nullable=True),
+        sa.Column("deleted_at", sa.DateTime(), nullable=False),
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="cascade"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_tombstones_user_id_deleted_at",
+        "tombstones",
+        ["user_id", "deleted_at"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_tombstones_deleted_at", "tombstones", ["deleted_at"], unique=False
+    )
+    op.create_index(
+        "ix_chats_user_id_updated_at", "chats", ["user_id", "updated_at"], unique=False
+    )
+    op.create_index(
+        "ix_messages_chat_id_updated_at_id",
+        "messages",
+        ["chat_id", "updated_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_chat_id_updated_at_id", table_name="messages")
+    op.drop_index("ix_chats_user_id_updated_at", table_name="chats")
+    op.drop_index("ix_tombstones_deleted_at", table_name="tombstones")
+    op.drop_index("ix_tombstones_user_id_deleted_at", table_name="tombstones")
+    op.drop_table("tombstones")
+    sa.Enum(name="tombstoneentity").drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,48 @@
+"""Add messages user_id for sync
+
+Revision ID: e5b2d9a4c710
+Revises: c3e8a1f6d2b4
+Create Date: 2026-10-18 21:47:15.208341
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b2d9a4c710"
+down_revision: Union[str, Sequence[str], None] = "c3e8a1f6d2b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("messages", sa.Column("user_id", sa.Integer(), nullable=True))
+    op.execute(
+        """
+        UPDATE messages
+        SET user_id = chats.user_id
+        FROM chats
+        WHERE chats.id = messages.chat_id
+        """
+    )
+    op.alter_column("messages", "user_id", nullable=False)
+    op.create_foreign_key(
+        "messages_user_id_fkey", "messages", "users", ["user_id"], ["id"]
+    )
+    op.create_index(
+        "ix_messages_user_id_updated_at_id",
+        "messages",
+        ["user_id", "updated_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_messages_user_id_updated_at_id", table_name="messages")
+    op.drop_constraint("messages_user_id_fkey", "messages", type_="foreignkey")
+    op.drop_column("messages", "user_id")
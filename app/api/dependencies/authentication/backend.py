@@ -1,10 +1,21 @@
 from fastapi_users.authentication import AuthenticationBackend
 
+from app.core.authentication.backend import RefreshTokenAuthenticationBackend
+from app.core.authentication.refresh_tokens import refresh_token_store
 from app.core.authentication.transport import bearer_transport
-from .strategy import get_database_strategy
+from app.core.config import settings
+from .strategy import get_database_strategy, get_jwt_strategy
 
-authentication_backend = AuthenticationBackend(
-    name="access-tokens-db",
-    transport=bearer_transport,
-    get_strategy=get_database_strategy,
-)
+if settings.access_token.strategy == "jwt":
+    authentication_backend = RefreshTokenAuthenticationBackend(
+        name="jwt",
+        transport=bearer_transport,
+        get_strategy=get_jwt_strategy,
+        refresh_tokens=refresh_token_store,
+    )
+else:
+    authentication_backend = AuthenticationBackend(
+        name="access-tokens-db",
+        transport=bearer_transport,
+        get_strategy=get_database_strategy,
+    )
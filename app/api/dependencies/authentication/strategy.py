@@ -8,6 +8,11 @@ from fastapi_users.authentication.strategy.db import (
     DatabaseStrategy,
 )
 
+from app.core.authentication.strategy import (
+    CachingDatabaseStrategy,
+    StatelessJWTStrategy,
+)
+from app.core.authentication.token_cache import token_cache
 from app.core.config import settings
 from .access_tokens import get_access_tokens_db
 
@@ -22,7 +27,20 @@ def get_database_strategy(
         Depends(get_access_tokens_db),
     ],
 ) -> DatabaseStrategy:
+    if settings.access_token.cache_enabled:
+        return CachingDatabaseStrategy(
+            database=access_tokens_db,
+            cache=token_cache,
+            lifetime_seconds=settings.access_token.lifetime_seconds,
+        )
     return DatabaseStrategy(
         database=access_tokens_db,
         lifetime_seconds=settings.access_token.lifetime_seconds,
     )
+
+
+def get_jwt_strategy() -> StatelessJWTStrategy:
+    return StatelessJWTStrategy(
+        secret=settings.jwt_secret,
+        lifetime_seconds=settings.access_token.jwt_lifetime_seconds,
+    )
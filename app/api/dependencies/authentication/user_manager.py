@@ -1,8 +1,9 @@
 from fastapi import Depends
 
+from app.core.authentication.password import password_helper
 from app.core.authentication.user_manager import UserManager
 from .users import get_users_db
 
 
 async def get_user_manager(users_db=Depends(get_users_db)):
-    yield UserManager(users_db)
+    yield UserManager(users_db, password_helper)
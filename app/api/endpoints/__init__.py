@@ -2,3 +2,6 @@ from .auth import auth_router
 from .chats import chats_router
 from .messages import messages_router
 from .users import users_router
+from .metrics import metrics_router
+from .realtime import realtime_router
+from .sync import sync_router
@@ -1,6 +1,14 @@
-from fastapi import APIRouter
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi_users import exceptions
+from fastapi_users.authentication import Strategy
+
 from app.core.authentication.auth import fastapi_users
-from app.api.dependencies.authentication import authentication_backend
+from app.core.authentication.backend import RefreshTokenAuthenticationBackend
+from app.core.authentication.user_manager import UserManager
+from app.api.dependencies.authentication import authentication_backend, get_user_manager
+from app.schemas.auth import RefreshTokenRequest, TokenPair
 from app.schemas.user import UserRead, UserCreate
 
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
@@ -12,3 +20,31 @@ auth_router.include_router(fastapi_users.get_register_router(UserRead, UserCreat
 auth_router.include_router(fastapi_users.get_verify_router(UserRead))
 
 auth_router.include_router(fastapi_users.get_reset_password_router())
+
+
+if isinstance(authentication_backend, RefreshTokenAuthenticationBackend):
+
+    @auth_router.post("/refresh", response_model=TokenPair)
+    async def refresh_tokens(
+        body: RefreshTokenRequest,
+        user_manager: Annotated[UserManager, Depends(get_user_manager)],
+        strategy: Annotated[Strategy, Depends(authentication_backend.get_strategy)],
+    ):
+        """Обменять refresh-токен на новую пару токенов (старый гасится)"""
+        user_id = await authentication_backend.refresh_tokens.consume(
+            body.refresh_token
+        )
+        user = None
+        if user_id is not None:
+            try:
+                user = await user_manager.get(user_id)
+            except exceptions.UserNotExists:
+                pass
+
+        if user is None or not user.is_active:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid or expired refresh token",
+            )
+
+        return await authentication_backend.issue_tokens(strategy, user)
@@ -1,8 +1,9 @@
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.authentication.auth import current_active_user
 from app.db.database import db_helper
+from app.db.instrumentation import statement_budget
 from app.db.models import User
 from app.schemas.chat import (
     ChatRead,
@@ -10,32 +11,86 @@ from app.schemas.chat import (
     ChatUpdate,
 )
 from app.services.ChatService import chat_service
+from app.utils.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified,
+    set_validators,
+)
+from app.utils.serialization import (
+    MSGPACK_RESPONSES,
+    list_response,
+    response_media_type,
+    rows_to_dicts,
+)
 
 chats_router = APIRouter(prefix="/chats", tags=["chats"])
 
 
-@chats_router.get("", response_model=List[ChatRead])
+async def _chat_access_error(
+    db: AsyncSession, chat_id: int, user_id: int, detail: str
+) -> HTTPException:
+    """Ошибка для чата, который не нашелся запросом с фильтром по владельцу
+
+    Дополнительный запрос делается только в этом случае, чтобы отличить
+    несуществующий чат (404) от чужого (403).
+    """
+    owner_id = await chat_service.get_chat_owner_id(db, chat_id)
+    if owner_id is None or owner_id == user_id:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
+        )
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+
+@chats_router.get("", response_model=List[ChatRead], responses=MSGPACK_RESPONSES)
+@statement_budget(2)
 async def get_current_user_chats(
+    request: Request,
     user: Annotated[User, Depends(current_active_user)],
-    db: AsyncSession = Depends(db_helper.session_getter),
+    db: AsyncSession = Depends(db_helper.read_session_getter),
     skip: int = Query(0, ge=0, description="Number of records to skip"),
     limit: int = Query(100, ge=1, le=1000,
                        description="Number of records to return"),
 ):
-    """Получить все чаты текущего пользователя"""
-    chats = await chat_service.get_user_chats(
+    """Получить все чаты текущего пользователя
+
+    Отдает ETag и Last-Modified; повторный запрос с If-None-Match или
+    If-Modified-Since получает 304 после одного запроса версии списка.
+    """
+    media_type = response_media_type(request)
+    count, last_modified = await chat_service.get_user_chats_version(db, user.id)
+    etag = make_etag("chats", user.id, count, last_modified, skip, limit, media_type)
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(etag, last_modified, vary=("Accept",))
+
+    # Строки из колонок и JSON без повторной валидации, схема - из response_model
+    chats = await chat_service.get_user_chat_rows(
         db, user_id=user.id, skip=skip, limit=limit
     )
-    return chats
+    response = list_response(media_type, rows_to_dicts(chats))
+    set_validators(response, etag, last_modified)
+    return response
 
 
 @chats_router.get("/{chat_id}", response_model=ChatRead)
+@statement_budget(2)
 async def get_chat(
     chat_id: int,
+    request: Request,
+    response: Response,
     user: Annotated[User, Depends(current_active_user)],
-    db: AsyncSession = Depends(db_helper.session_getter),
+    db: AsyncSession = Depends(db_helper.read_session_getter),
 ):
     """Получить информацию о конкретном чате"""
+    if "if-none-match" in request.headers or "if-modified-since" in request.headers:
+        # Проверка версии без загрузки чата; без заголовков версия берется из него
+        version = await chat_service.get_chat_version(db, chat_id)
+        if version is not None and version[0] == user.id:
+            etag = make_etag("chat", chat_id, version[1])
+            if is_not_modified(request, etag, version[1]):
+                return not_modified(etag, version[1])
+
     chat = await chat_service.get_chat(db, chat_id)
     if not chat:
         raise HTTPException(
@@ -49,10 +104,12 @@ async def get_chat(
             detail="Not enough permissions to access this chat",
         )
 
+    set_validators(response, make_etag("chat", chat.id, chat.updated_at), chat.updated_at)
     return chat
 
 
 @chats_router.post("", response_model=ChatRead, status_code=status.HTTP_201_CREATED)
+@statement_budget(2)
 async def create_chat(
     chat_create: ChatCreate,
     user: Annotated[User, Depends(current_active_user)],
@@ -71,6 +128,7 @@ async def create_chat(
 
 
 @chats_router.put("/{chat_id}", response_model=ChatRead)
+@statement_budget(2)
 async def update_chat(
     chat_id: int,
     chat_update: ChatUpdate,
@@ -78,29 +136,18 @@ async def update_chat(
     db: AsyncSession = Depends(db_helper.session_getter),
 ):
     """Обновить информацию о чате"""
-    chat = await chat_service.get_chat(db, chat_id)
-    if not chat:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
-        )
-
-    # Проверяем, что чат принадлежит пользователю
-    if chat.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to update this chat",
-        )
-
-    updated_chat = await chat_service.update_chat(db, chat_id, chat_update)
+    # Проверка владельца входит в сам UPDATE
+    updated_chat = await chat_service.update_user_chat(db, chat_id, user.id, chat_update)
     if not updated_chat:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found after update"
+        raise await _chat_access_error(
+            db, chat_id, user.id, "Not enough permissions to update this chat"
         )
 
     return updated_chat
 
 
 @chats_router.patch("/{chat_id}/title", response_model=ChatRead)
+@statement_budget(2)
 async def update_chat_title(
     chat_id: int,
     title: Annotated[str, Body(..., embed=True, description="New chat title")],
@@ -108,51 +155,29 @@ async def update_chat_title(
     db: AsyncSession = Depends(db_helper.session_getter),
 ):
     """Обновить только название чата"""
-    chat = await chat_service.get_chat(db, chat_id)
-    if not chat:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
-        )
-
-    if chat.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to update this chat",
-        )
-
-    updated_chat = await chat_service.update_chat(db, chat_id, ChatUpdate(title=title))
+    updated_chat = await chat_service.update_user_chat(
+        db, chat_id, user.id, ChatUpdate(title=title)
+    )
     if not updated_chat:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found after update"
+        raise await _chat_access_error(
+            db, chat_id, user.id, "Not enough permissions to update this chat"
         )
 
     return updated_chat
 
 
 @chats_router.delete("/{chat_id}", status_code=status.HTTP_204_NO_CONTENT)
+@statement_budget(5)
 async def delete_chat(
     chat_id: int,
     user: Annotated[User, Depends(current_active_user)],
     db: AsyncSession = Depends(db_helper.session_getter),
 ):
     """Удалить чат"""
-    chat = await chat_service.get_chat(db, chat_id)
-    if not chat:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
-        )
-
-    if chat.user_id != user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to delete this chat",
-        )
-
-    deleted_chat = await chat_service.delete_chat(db, chat_id)
+    deleted_chat = await chat_service.delete_user_chat(db, chat_id, user.id)
     if not deleted_chat:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Chat not found during deletion",
+        raise await _chat_access_error(
+            db, chat_id, user.id, "Not enough permissions to delete this chat"
         )
 
     return None
@@ -1,62 +1,196 @@
-from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy import select
+from typing import Annotated, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.authentication.auth import current_active_user
 from app.db.database import db_helper
-from app.db.models import User, Chat
+from app.db.instrumentation import statement_budget
+from app.db.models import User
 from app.schemas.message import (
     MessageRead,
     MessageCreate,
     MessageUpdate,
+    SortOrder,
 )
+from app.services.ChatService import chat_service
 from app.services.MessageService import message_service
+from app.utils.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified,
+    set_validators,
+)
+from app.utils.pagination import Cursor, decode_cursor, encode_cursor
+from app.utils.serialization import (
+    MSGPACK_RESPONSES,
+    list_response,
+    response_media_type,
+    rows_to_dicts,
+)
+from app.utils.sse import format_sse
 
 messages_router = APIRouter(prefix="/messages", tags=["messages"])
 
 
-@messages_router.get("/chat/{chat_id}", response_model=List[MessageRead])
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _parse_cursor(value: Optional[str]) -> Optional[Cursor]:
+    if value is None:
+        return None
+    try:
+        return decode_cursor(value)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+async def _message_access_error(
+    db: AsyncSession, message_id: int, user_id: int, detail: str
+) -> HTTPException:
+    """Ошибка для сообщения, которое не нашлось запросом с фильтром по владельцу
+
+    Дополнительный запрос делается только в этом случае, чтобы отличить
+    несуществующее сообщение (404) от чужого (403).
+    """
+    owner_id = await message_service.get_message_owner_id(db, message_id)
+    if owner_id is None or owner_id == user_id:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Message not found"
+        )
+    return HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+
+
+@messages_router.get(
+    "/chat/{chat_id}", response_model=List[MessageRead], responses=MSGPACK_RESPONSES
+)
+@statement_budget(2)
 async def get_chat_messages(
     chat_id: int,
+    request: Request,
+    response: Response,
     user: Annotated[User, Depends(current_active_user)],
-    db: AsyncSession = Depends(db_helper.session_getter),
+    db: AsyncSession = Depends(db_helper.read_session_getter),
     skip: int = Query(0, ge=0, description="Number of messages to skip"),
     limit: int = Query(100, ge=1, le=1000,
                        description="Number of messages to return"),
-    order: str = Query(
-        "desc", description="Order by creation time (asc/desc)"),
+    order: SortOrder = Query(
+        SortOrder.DESC, description="Order by creation time (asc/desc)"),
+    before: Optional[str] = Query(
+        None, description="Cursor: return messages older than this position"),
+    after: Optional[str] = Query(
+        None, description="Cursor: return messages newer than this position"),
 ):
-    """Получить все сообщения чата (только если чат принадлежит пользователю)"""
-    messages = await message_service.get_user_chat_messages(
-        db, chat_id=chat_id, user_id=user.id, skip=skip, limit=limit
+    """Получить все сообщения чата (только если чат принадлежит пользователю)
+
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor и
+    передается обратно в тот же параметр (before или after). ETag зависит
+    от версии истории и параметров страницы; 304 отдается без загрузки
+    сообщений.
+    """
+    if before is not None and after is not None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Use either 'before' or 'after' cursor, not both",
+        )
+
+    media_type = response_media_type(request)
+    # Чужой или несуществующий чат проходит дальше и получает обычную ошибку
+    version = await message_service.get_user_chat_messages_version(
+        db, chat_id=chat_id, user_id=user.id
+    )
+    if version is not None:
+        count, last_modified = version
+        etag = make_etag(
+            "messages",
+            chat_id,
+            count,
+            last_modified,
+            skip,
+            limit,
+            order.value,
+            before,
+            after,
+            media_type,
+        )
+        if is_not_modified(request, etag, last_modified):
+            return not_modified(etag, last_modified, vary=("Accept",))
+        set_validators(response, etag, last_modified)
+
+    # Строки из колонок вместо сущностей ORM и JSON без повторной валидации;
+    # response_model описывает ответ в OpenAPI
+    messages = await message_service.get_user_chat_message_rows(
+        db,
+        chat_id=chat_id,
+        user_id=user.id,
+        skip=skip,
+        limit=limit,
+        order=order,
+        before=_parse_cursor(before),
+        after=_parse_cursor(after),
     )
 
-    # При необходимости изменить порядок
-    if order == "asc":
-        messages = sorted(messages, key=lambda x: x.created_at)
+    if len(messages) == limit:
+        # Следующая страница продолжается от последней строки в направлении чтения:
+        # after читает к новым сообщениям, before к старым, без курсора по order
+        if after is not None:
+            scan = SortOrder.ASC
+        elif before is not None:
+            scan = SortOrder.DESC
+        else:
+            scan = order
+        edge = messages[-1] if scan == order else messages[0]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            Cursor(created_at=edge.created_at, id=edge.id)
+        )
 
-    return messages
+    return list_response(media_type, rows_to_dicts(messages), headers=response.headers)
+
+
+@messages_router.get("/chat/{chat_id}/export", response_class=StreamingResponse)
+@statement_budget(1)
+async def export_chat_messages(
+    chat_id: int,
+    user: Annotated[User, Depends(current_active_user)],
+    db: AsyncSession = Depends(db_helper.read_session_getter),
+    order: SortOrder = Query(
+        SortOrder.ASC, description="Order by creation time (asc/desc)"),
+):
+    """Выгрузить всю историю чата потоком NDJSON, начиная со старых сообщений"""
+    if await chat_service.get_chat_owner_id(db, chat_id) != user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions to access this chat",
+        )
+
+    async def rows():
+        # Отдельная сессия живет ровно столько, сколько идет выгрузка
+        async with db_helper.session_factory() as session:
+            async for message in message_service.stream_chat_messages(
+                session, chat_id=chat_id, order=order
+            ):
+                yield MessageRead.model_validate(message).model_dump_json() + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
 
 
 @messages_router.get("/{message_id}", response_model=MessageRead)
+@statement_budget(1)
 async def get_message(
     message_id: int,
     user: Annotated[User, Depends(current_active_user)],
-    db: AsyncSession = Depends(db_helper.session_getter),
+    db: AsyncSession = Depends(db_helper.read_session_getter),
 ):
     """Получить конкретное сообщение"""
-    message = await message_service.get_message(db, message_id)
-    if not message:
+    found = await message_service.get_message_with_owner(db, message_id)
+    if not found:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Message not found"
         )
 
-    chat_result = await db.execute(
-        select(Chat).filter(Chat.id == message.chat_id, Chat.user_id == user.id)
-    )
-    chat = chat_result.scalar_one_or_none()
-
-    if not chat:
+    message, owner_id = found
+    if owner_id != user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to access this message",
@@ -68,6 +202,7 @@ async def get_message(
 @messages_router.post(
     "", response_model=MessageRead, status_code=status.HTTP_201_CREATED
 )
+@statement_budget(6)
 async def create_message(
     message_create: MessageCreate,
     user: Annotated[User, Depends(current_active_user)],
@@ -84,125 +219,124 @@ async def create_message(
     return message
 
 
-@messages_router.put("/{message_id}", response_model=MessageRead)
-async def update_message(
-    message_id: int,
-    message_update: MessageUpdate,
+@messages_router.post("/stream", response_class=StreamingResponse)
+@statement_budget(6)
+async def stream_message(
+    message_create: MessageCreate,
     user: Annotated[User, Depends(current_active_user)],
     db: AsyncSession = Depends(db_helper.session_getter),
 ):
-    """Обновить сообщение"""
-    message = await message_service.get_message(db, message_id)
-    if not message:
+    """Создать сообщение и получить ответ нейросети потоком Server-Sent Events
+
+    События: user_message и bot_message (заготовка в статусе SENDING),
+    затем token с очередным фрагментом текста и в конце done или error
+    с итоговым сообщением бота (error без сообщения, если его удалили).
+    """
+    started = await message_service.start_stream(db, message_create, user.id)
+    if not started:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Message not found"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat not found or you don't have access to it",
         )
+    user_message, bot_message = started
 
-    # Проверяем, что сообщение принадлежит чату пользователя
-    chat_result = await db.execute(
-        select(Chat).filter(Chat.id == message.chat_id, Chat.user_id == user.id)
+    async def events():
+        yield format_sse(
+            "user_message", MessageRead.model_validate(user_message).model_dump_json()
+        )
+        yield format_sse(
+            "bot_message", MessageRead.model_validate(bot_message).model_dump_json()
+        )
+        async for event, data in message_service.stream_ai_response(
+            bot_message, user_message
+        ):
+            yield format_sse(event, data)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    chat = chat_result.scalar_one_or_none()
 
-    if not chat:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to update this message",
-        )
 
+@messages_router.put("/{message_id}", response_model=MessageRead)
+@statement_budget(2)
+async def update_message(
+    message_id: int,
+    message_update: MessageUpdate,
+    user: Annotated[User, Depends(current_active_user)],
+    db: AsyncSession = Depends(db_helper.session_getter),
+):
+    """Обновить сообщение"""
+    # Проверка владельца чата входит в сам UPDATE
     updated_message = await message_service.update_message(
-        db, message_id, message_update
+        db, message_id, user.id, message_update
     )
     if not updated_message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found after update",
+        raise await _message_access_error(
+            db, message_id, user.id, "Not enough permissions to update this message"
         )
 
     return updated_message
 
 
 @messages_router.delete("/{message_id}", status_code=status.HTTP_204_NO_CONTENT)
+@statement_budget(3)
 async def delete_message(
     message_id: int,
     user: Annotated[User, Depends(current_active_user)],
     db: AsyncSession = Depends(db_helper.session_getter),
 ):
     """Удалить сообщение"""
-    message = await message_service.get_message(db, message_id)
-    if not message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="Message not found"
-        )
-
-    # Проверяем, что сообщение принадлежит чату пользователя
-    chat_result = await db.execute(
-        select(Chat).filter(Chat.id == message.chat_id, Chat.user_id == user.id)
-    )
-    chat = chat_result.scalar_one_or_none()
-
-    if not chat:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions to delete this message",
-        )
-
-    deleted_message = await message_service.delete_message(db, message_id)
+    # Проверка владельца чата входит в сам DELETE
+    deleted_message = await message_service.delete_message(db, message_id, user.id)
     if not deleted_message:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Message not found during deletion",
+        raise await _message_access_error(
+            db, message_id, user.id, "Not enough permissions to delete this message"
         )
 
     return None
 
 
 @messages_router.get("/chat/{chat_id}/latest", response_model=List[MessageRead])
+@statement_budget(2)
 async def get_latest_messages(
     chat_id: int,
     user: Annotated[User, Depends(current_active_user)],
-    db: AsyncSession = Depends(db_helper.session_getter),
+    db: AsyncSession = Depends(db_helper.read_session_getter),
     limit: int = Query(
         10, ge=1, le=100, description="Number of latest messages to return"
     ),
 ):
     """Получить последние сообщения чата"""
-    # Сначала проверяем доступ к чату
-    chat_result = await db.execute(
-        select(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id)
+    messages = await message_service.get_latest_messages(
+        db, chat_id=chat_id, user_id=user.id, limit=limit
     )
-    chat = chat_result.scalar_one_or_none()
-
-    if not chat:
+    # Пустой ответ: чат пуст или недоступен, владельца проверяем только тогда
+    if not messages and await chat_service.get_chat_owner_id(db, chat_id) != user.id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to access this chat",
         )
 
-    messages = await message_service.get_latest_messages(
-        db, chat_id=chat_id, limit=limit
-    )
     return messages
 
 
 @messages_router.get("/chat/{chat_id}/count", response_model=dict)
+@statement_budget(1)
 async def get_message_count(
     chat_id: int,
     user: Annotated[User, Depends(current_active_user)],
-    db: AsyncSession = Depends(db_helper.session_getter),
+    db: AsyncSession = Depends(db_helper.read_session_getter),
 ):
     """Получить количество сообщений в чате"""
-    # Проверяем доступ к чату
-    chat_result = await db.execute(
-        select(Chat).filter(Chat.id == chat_id, Chat.user_id == user.id)
+    count = await message_service.get_message_count(
+        db, chat_id=chat_id, user_id=user.id
     )
-    chat = chat_result.scalar_one_or_none()
-
-    if not chat:
+    if count is None:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions to access this chat",
         )
 
-    count = await message_service.get_message_count(db, chat_id=chat_id)
     return {"chat_id": chat_id, "message_count": count}
@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import re
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect, status
+
+from app.core.authentication.auth import read_active_user
+from app.db.database import db_helper
+from app.services.ChatService import chat_service
+from app.services.RealtimeService import realtime_service
+
+realtime_router = APIRouter(prefix="/ws", tags=["realtime"])
+
+# Браузерный WebSocket не ставит заголовки, но передает подпротоколы:
+# new WebSocket(url, ["bearer", token]) -> Sec-WebSocket-Protocol: bearer, <token>
+BEARER_SUBPROTOCOL = "bearer"
+
+_TOKEN_PARAM = re.compile(r"(?<=[?&]token=)[^&\s\"]+")
+
+
+class _TokenRedactingFilter(logging.Filter):
+    """Прячет ?token= в строках запросов, которые uvicorn пишет в лог"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        message = record.getMessage()
+        if "token=" in message:
+            record.msg, record.args = _TOKEN_PARAM.sub("***", message), ()
+        return True
+
+
+for _logger in ("uvicorn.access", "uvicorn.error"):
+    logging.getLogger(_logger).addFilter(_TokenRedactingFilter())
+
+
+def _bearer_token(
+    websocket: WebSocket, token: Optional[str]
+) -> Tuple[Optional[str], Optional[str]]:
+    """Токен и подпротокол, который нужно подтвердить при accept"""
+    subprotocols = websocket.scope.get("subprotocols") or []
+    if BEARER_SUBPROTOCOL in subprotocols:
+        index = subprotocols.index(BEARER_SUBPROTOCOL)
+        if index + 1 < len(subprotocols):
+            return subprotocols[index + 1], BEARER_SUBPROTOCOL
+    scheme, _, credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        return credentials, None
+    # Устаревший способ: адрес с токеном попадает в логи прокси и истории браузера
+    return token or None, None
+
+
+@realtime_router.websocket("/chats/{chat_id}")
+async def chat_updates(
+    websocket: WebSocket,
+    chat_id: int,
+    token: Optional[str] = Query(
+        None,
+        description="Bearer token (deprecated: ends up in access logs, "
+        "use Sec-WebSocket-Protocol: bearer, <token>)",
+        deprecated=True,
+    ),
+):
+    """События чата в реальном времени вместо опроса /messages/chat/{id}/latest
+
+    Токен передается подпротоколами "bearer" и сам токен (из браузера:
+    new WebSocket(url, ["bearer", token])), заголовком Authorization или,
+    устаревшим способом, параметром token. Каждое событие - JSON с полем
+    type: message, message_deleted, chat, chat_deleted; resync - события
+    были пропущены, состояние нужно перечитать.
+    """
+    bearer, subprotocol = _bearer_token(websocket, token)
+    user = await read_active_user(bearer) if bearer else None
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    async with db_helper.session_factory() as session:
+        owner_id = await chat_service.get_chat_owner_id(session, chat_id)
+    if owner_id != user.id:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    # Подписка до accept: события, сохраненные во время рукопожатия, не теряются
+    with realtime_service.subscribe(chat_id) as subscription:
+        await websocket.accept(subprotocol=subprotocol)
+
+        async def forward() -> None:
+            while True:
+                await websocket.send_text(await subscription.get())
+
+        sender = asyncio.create_task(forward())
+        try:
+            # Сообщения клиента не нужны, чтение только ловит отключение
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
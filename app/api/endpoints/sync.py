@@ -0,0 +1,42 @@
+from typing import Annotated, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.authentication.auth import current_active_user
+from app.db.database import db_helper
+from app.db.instrumentation import statement_budget
+from app.db.models import User
+from app.schemas.sync import SyncResponse
+from app.services.SyncService import sync_service
+from app.utils.pagination import decode_sync_token
+
+sync_router = APIRouter(prefix="/sync", tags=["sync"])
+
+
+# Читаем с основной базы, а не с реплики: токен строится по часам базы, и
+# отставшая реплика выдала бы токен, за которым еще не видны свежие изменения
+@sync_router.get("", response_model=SyncResponse)
+@statement_budget(4)
+async def sync(
+    user: Annotated[User, Depends(current_active_user)],
+    db: AsyncSession = Depends(db_helper.session_getter),
+    since: Optional[str] = Query(
+        None, description="next_token from the previous sync; omit for a full sync"
+    ),
+):
+    """Изменения чатов и сообщений пользователя с прошлой синхронизации"""
+    token = None
+    if since is not None:
+        try:
+            token = decode_sync_token(since)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid sync token"
+            )
+
+    changes = await sync_service.get_changes(db, user.id, since=token)
+    if changes is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Sync token expired, a full sync is required",
+        )
+    return changes
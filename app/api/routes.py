@@ -1,5 +1,13 @@
 from fastapi import APIRouter
-from .endpoints import auth_router, chats_router, messages_router, users_router
+from .endpoints import (
+    auth_router,
+    chats_router,
+    messages_router,
+    metrics_router,
+    realtime_router,
+    sync_router,
+    users_router,
+)
 
 api_router = APIRouter()
 
@@ -10,3 +18,9 @@ api_router.include_router(chats_router)
 api_router.include_router(messages_router)
 
 api_router.include_router(users_router)
+
+api_router.include_router(sync_router)
+
+api_router.include_router(realtime_router)
+
+api_router.include_router(metrics_router)
@@ -1,10 +1,20 @@
+from typing import Optional
+
 from fastapi_users import FastAPIUsers
 
-from app.db.models import User
+from app.core.authentication.password import password_helper
+from app.core.authentication.user_manager import UserManager
+from app.core.config import settings
+from app.db.database import db_helper
+from app.db.models import AccessToken, User
 from app.db.types import UserIdType
 
 from app.api.dependencies.authentication import get_user_manager
 from app.api.dependencies.authentication import authentication_backend
+from app.api.dependencies.authentication.strategy import (
+    get_database_strategy,
+    get_jwt_strategy,
+)
 
 fastapi_users = FastAPIUsers[User, UserIdType](
     get_user_manager,
@@ -13,3 +23,21 @@ fastapi_users = FastAPIUsers[User, UserIdType](
 
 current_active_user = fastapi_users.current_user(active=True)
 current_active_superuser = fastapi_users.current_user(active=True, superuser=True)
+
+
+async def read_active_user(token: str) -> Optional[User]:
+    """Активный пользователь по bearer-токену вне HTTP-запроса (WebSocket)
+
+    Та же стратегия, что у authentication_backend, но сессия базы закрывается
+    сразу после проверки, а не живет вместе с соединением.
+    """
+    async with db_helper.session_factory() as session:
+        user_manager = UserManager(User.get_db(session), password_helper)
+        if settings.access_token.strategy == "jwt":
+            strategy = get_jwt_strategy()
+        else:
+            strategy = get_database_strategy(AccessToken.get_db(session))
+        user = await strategy.read_token(token, user_manager)
+    if user is None or not user.is_active:
+        return None
+    return user
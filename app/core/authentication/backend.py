@@ -0,0 +1,35 @@
+from fastapi import Response, status
+from fastapi.responses import JSONResponse
+from fastapi_users.authentication import AuthenticationBackend, Strategy
+
+from app.core.authentication.refresh_tokens import RefreshTokenStore
+from app.db.models import User
+from app.db.types import UserIdType
+from app.schemas.auth import TokenPair
+
+
+class RefreshTokenAuthenticationBackend(AuthenticationBackend[User, UserIdType]):
+    """Бэкенд, который при входе выдает вместе с access-токеном refresh-токен"""
+
+    def __init__(self, *args, refresh_tokens: RefreshTokenStore, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.refresh_tokens = refresh_tokens
+
+    async def issue_tokens(
+        self, strategy: Strategy[User, UserIdType], user: User
+    ) -> TokenPair:
+        return TokenPair(
+            access_token=await strategy.write_token(user),
+            refresh_token=await self.refresh_tokens.issue(user.id),
+        )
+
+    async def login(self, strategy: Strategy[User, UserIdType], user: User) -> Response:
+        tokens = await self.issue_tokens(strategy, user)
+        return JSONResponse(tokens.model_dump())
+
+    async def logout(
+        self, strategy: Strategy[User, UserIdType], user: User, token: str
+    ) -> Response:
+        # Сам access-токен отозвать нельзя, он доживет свой короткий срок
+        await self.refresh_tokens.revoke_user(user.id)
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from fastapi_users.password import PasswordHelper
+from pwdlib import PasswordHash
+from pwdlib.hashers.argon2 import Argon2Hasher
+from pwdlib.hashers.bcrypt import BcryptHasher
+
+from app.core.config import PasswordSettings, settings
+
+
+def build_password_hash(config: PasswordSettings) -> PasswordHash:
+    """Основной алгоритм из настроек хеширует, второй только проверяет старые хеши"""
+    argon2 = Argon2Hasher(
+        time_cost=config.argon2_time_cost,
+        memory_cost=config.argon2_memory_cost,
+        parallelism=config.argon2_parallelism,
+    )
+    bcrypt = BcryptHasher(rounds=config.bcrypt_rounds)
+    if config.algorithm == "bcrypt":
+        return PasswordHash((bcrypt, argon2))
+    return PasswordHash((argon2, bcrypt))
+
+
+@lru_cache(maxsize=1)
+def _process_password_hash() -> PasswordHash:
+    # В процессе пула свой экземпляр, настройки читаются из того же окружения
+    return build_password_hash(settings.password)
+
+
+def _hash(password: str) -> str:
+    return _process_password_hash().hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _process_password_hash().verify_and_update(password, hashed)
+
+
+class AsyncPasswordHelper(PasswordHelper):
+    """PasswordHelper с асинхронными hash/verify в отдельном пуле
+
+    argon2 и bcrypt держат процессор сотни миллисекунд; в пуле они не
+    останавливают цикл событий. Пул ограничен max_workers, лишние вызовы
+    ждут своей очереди. Синхронные методы базового класса остаются для
+    редких путей fastapi-users (сброс пароля).
+    """
+
+    def __init__(self, config: PasswordSettings) -> None:
+        super().__init__(build_password_hash(config))
+        self.config = config
+        self._executor: Optional[Executor] = None
+
+    @property
+    def executor(self) -> Optional[Executor]:
+        if self._executor is None and self.config.executor != "inline":
+            workers = self.config.max_workers or min(4, os.cpu_count() or 1)
+            if self.config.executor == "process":
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=workers, thread_name_prefix="password"
+                )
+        return self._executor
+
+    async def _run(self, func, remote_func, *args):
+        executor = self.executor
+        if executor is None:
+            return func(*args)
+        # Процессу пула передаем только строки, хешер он строит сам из настроек
+        if isinstance(executor, ProcessPoolExecutor):
+            func = remote_func
+        return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run(self.hash, _hash, password)
+
+    async def verify_and_update_async(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self._run(
+            self.verify_and_update, _verify_and_update, plain_password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_helper = AsyncPasswordHelper(settings.password)
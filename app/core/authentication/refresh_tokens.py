@@ -0,0 +1,91 @@
+import hashlib
+import logging
+import secrets
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.db.database import db_helper
+from app.db.maintenance import delete_in_batches
+from app.db.models import RefreshToken
+
+log = logging.getLogger(__name__)
+
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RefreshTokenStore:
+    """Одноразовые refresh-токены в таблице refresh_tokens
+
+    Токен обменивается на новую пару ровно один раз (consume удаляет
+    строку), выход пользователя отзывает все его refresh-токены.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        lifetime_seconds: int,
+        prune_batch_size: int = 1000,
+    ) -> None:
+        self.session_factory = session_factory
+        self.lifetime_seconds = lifetime_seconds
+        self.prune_batch_size = prune_batch_size
+
+    async def issue(self, user_id: int) -> str:
+        token = secrets.token_urlsafe()
+        async with self.session_factory() as session:
+            await session.execute(
+                insert(RefreshToken).values(
+                    token_hash=_hash(token),
+                    user_id=user_id,
+                    expires_at=func.now() + timedelta(seconds=self.lifetime_seconds),
+                )
+            )
+            await session.commit()
+        return token
+
+    async def consume(self, token: str) -> Optional[int]:
+        """Погасить токен; id пользователя или None, если токен неизвестен или истек"""
+        async with self.session_factory() as session:
+            result = await session.execute(
+                delete(RefreshToken)
+                .where(
+                    RefreshToken.token_hash == _hash(token),
+                    RefreshToken.expires_at > func.now(),
+                )
+                .returning(RefreshToken.user_id)
+            )
+            user_id = result.scalar_one_or_none()
+            await session.commit()
+        return user_id
+
+    async def revoke_user(self, user_id: int) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                delete(RefreshToken).where(RefreshToken.user_id == user_id)
+            )
+            await session.commit()
+
+    async def prune(self) -> int:
+        """Удалить истекшие токены пачками по prune_batch_size, вернуть их число"""
+        total = await delete_in_batches(
+            self.session_factory,
+            RefreshToken.token_hash,
+            RefreshToken.expires_at <= func.now(),
+            batch_size=self.prune_batch_size,
+        )
+        if total:
+            log.info("Pruned %s expired refresh tokens", total)
+        return total
+
+
+refresh_token_store = RefreshTokenStore(
+    db_helper.session_factory,
+    lifetime_seconds=settings.access_token.refresh_lifetime_seconds,
+    prune_batch_size=settings.access_token.prune_batch_size,
+)
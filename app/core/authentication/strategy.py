@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import jwt
+from fastapi_users import BaseUserManager, exceptions
+from fastapi_users.authentication import JWTStrategy
+from fastapi_users.authentication.strategy.db import AccessTokenDatabase, DatabaseStrategy
+from fastapi_users.jwt import decode_jwt, generate_jwt
+
+from app.core.authentication.token_cache import TokenCache, detached_user
+from app.db.models import AccessToken, User
+from app.db.types import UserIdType
+
+
+class CachingDatabaseStrategy(DatabaseStrategy[User, UserIdType, AccessToken]):
+    """DatabaseStrategy, который не ходит в базу за уже проверенными токенами
+
+    Промах читает access_tokens и users как обычно и кладет снимок
+    пользователя в кеш до истечения токена (но не дольше TTL кеша).
+    """
+
+    def __init__(
+        self,
+        database: AccessTokenDatabase[AccessToken],
+        cache: TokenCache,
+        lifetime_seconds: Optional[int] = None,
+    ) -> None:
+        super().__init__(database=database, lifetime_seconds=lifetime_seconds)
+        self.cache = cache
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager[User, UserIdType]
+    ) -> Optional[User]:
+        if token is None:
+            return None
+
+        await self.cache.start()
+        user = self.cache.get(token)
+        if user is not None:
+            return user
+
+        generation = self.cache.generation
+        now = datetime.now(timezone.utc)
+        max_age = None
+        if self.lifetime_seconds:
+            max_age = now - timedelta(seconds=self.lifetime_seconds)
+
+        access_token = await self.database.get_by_token(token, max_age)
+        if access_token is None:
+            return None
+
+        try:
+            parsed_id = user_manager.parse_id(access_token.user_id)
+            user = await user_manager.get(parsed_id)
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+        ttl = self.cache_ttl_for(access_token, now)
+        self.cache.set(token, user, ttl=ttl, generation=generation)
+        return user
+
+    async def destroy_token(self, token: str, user: User) -> None:
+        await self.cache.invalidate_token(token)
+        await super().destroy_token(token, user)
+
+    def cache_ttl_for(self, access_token: AccessToken, now: datetime) -> float:
+        if not self.lifetime_seconds:
+            return float("inf")
+        created_at = access_token.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        expires_at = created_at + timedelta(seconds=self.lifetime_seconds)
+        return (expires_at - now).total_seconds()
+
+
+class StatelessJWTStrategy(JWTStrategy[User, UserIdType]):
+    """JWT, который проверяется только по подписи, без запроса пользователя
+
+    Нужные зависимостям current_user поля лежат в самом токене, так что
+    изменения пользователя (в том числе деактивация) вступают в силу с
+    выдачей следующего токена через refresh.
+    """
+
+    claims = ("email", "is_active", "is_superuser", "is_verified")
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager[User, UserIdType]
+    ) -> Optional[User]:
+        if token is None:
+            return None
+
+        try:
+            data = decode_jwt(
+                token, self.decode_key, self.token_audience, algorithms=[self.algorithm]
+            )
+            values = {claim: data[claim] for claim in self.claims}
+            values["id"] = user_manager.parse_id(data["sub"])
+        except (jwt.PyJWTError, KeyError, exceptions.InvalidID):
+            return None
+        return detached_user(values)
+
+    async def write_token(self, user: User) -> str:
+        data = {"sub": str(user.id), "aud": self.token_audience}
+        data.update({claim: getattr(user, claim) for claim in self.claims})
+        return generate_jwt(
+            data, self.encode_key, self.lifetime_seconds, algorithm=self.algorithm
+        )
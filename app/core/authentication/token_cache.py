@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.core.config import settings
+from app.db.database import db_helper
+from app.db.models import User
+from app.db.notify import PgNotifier
+from app.utils.cache import TTLCache
+from app.utils.metrics import metrics
+
+log = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "auth_token_cache"
+
+token_cache_requests = metrics.counter(
+    "auth_token_cache_requests_total",
+    "Access token lookups served from or missed by the in-process cache",
+    labelnames=("result",),
+)
+
+UserSnapshot = Dict[str, Any]
+
+
+def _token_key(token: str) -> str:
+    # Сырые токены не держим в памяти и не рассылаем другим процессам
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def detached_user(values: UserSnapshot) -> User:
+    """Пользователь из известных значений колонок, как будто загруженный из базы
+
+    Каждому запросу свой объект: его можно добавить в сессию, незаданные
+    колонки догрузятся при обращении.
+    """
+    user = User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+class TokenCache:
+    """Кеш токен -> снимок пользователя в памяти процесса
+
+    Запись живет не дольше ttl и не дольше самого токена. Выход, изменение
+    или удаление пользователя сбрасывают записи; с notifier сброс
+    рассылается и остальным процессам.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: float = 60.0,
+        notifier: Optional[PgNotifier] = None,
+    ) -> None:
+        self._cache: TTLCache[str, Tuple[int, UserSnapshot]] = TTLCache(max_size, ttl)
+        self.notifier = notifier
+        # Меняется при каждом сбросе: ответ базы, прочитанный до сброса, не кешируется
+        self.generation = 0
+        self._started = False
+        self._start_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        if self._started or self.notifier is None:
+            return
+        async with self._start_lock:
+            if not self._started:
+                # Сбросы за время разрыва LISTEN потеряны, кеш чистим целиком
+                self.notifier.on_reconnect(self.clear)
+                await self.notifier.subscribe(INVALIDATION_CHANNEL, self._on_remote)
+                self._started = True
+
+    async def close(self) -> None:
+        if self.notifier is not None and self._started:
+            await self.notifier.close()
+            self._started = False
+
+    def get(self, token: str) -> Optional[User]:
+        entry = self._cache.get(_token_key(token))
+        if entry is None:
+            token_cache_requests.inc(result="miss")
+            return None
+        token_cache_requests.inc(result="hit")
+        return detached_user(entry[1])
+
+    def set(self, token: str, user: User, ttl: float, generation: int) -> None:
+        if ttl <= 0 or generation != self.generation:
+            return
+        snapshot = {
+            attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs
+        }
+        self._cache.set(_token_key(token), (user.id, snapshot), ttl)
+
+    async def invalidate_token(self, token: str) -> None:
+        key = _token_key(token)
+        self._drop_token(key)
+        await self._publish(f"token:{key}")
+
+    async def invalidate_user(self, user_id: int) -> None:
+        self._drop_user(user_id)
+        await self._publish(f"user:{user_id}")
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._cache.clear()
+
+    def _drop_token(self, key: str) -> None:
+        self.generation += 1
+        self._cache.pop(key)
+
+    def _drop_user(self, user_id: int) -> None:
+        self.generation += 1
+        for key, (owner_id, _) in self._cache.items():
+            if owner_id == user_id:
+                self._cache.pop(key)
+
+    async def _publish(self, payload: str) -> None:
+        if self.notifier is None:
+            return
+        try:
+            await self.notifier.publish(INVALIDATION_CHANNEL, payload)
+        except Exception:
+            log.exception("Failed to broadcast token cache invalidation %r", payload)
+
+    def _on_remote(self, payload: str) -> None:
+        kind, _, value = payload.partition(":")
+        if kind == "token":
+            self._drop_token(value)
+        elif kind == "user":
+            self._drop_user(int(value))
+
+
+token_cache = TokenCache(
+    max_size=settings.access_token.cache_size,
+    ttl=settings.access_token.cache_ttl,
+    notifier=(
+        PgNotifier(db_helper.engine)
+        if settings.access_token.cache_invalidation == "postgres"
+        else None
+    ),
+)
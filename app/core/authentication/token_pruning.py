@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.db.database import db_helper
+from app.db.maintenance import (
+    delete_in_batches,
+    drop_daily_partitions_before,
+    ensure_daily_partitions,
+    is_partitioned,
+)
+from app.db.models import AccessToken
+
+log = logging.getLogger(__name__)
+
+# Сколько дневных партиций держать созданными заранее
+PARTITIONS_AHEAD = 7
+
+
+async def _maintain_partitions(cutoff: datetime) -> None:
+    """Создать партиции на ближайшие дни и удалить истекшие
+
+    Ошибки только пишутся в лог: чистка пачками DELETE должна пройти
+    и без обслуживания партиций. Каждый шаг - своя транзакция, чтобы
+    сбой удаления не откатывал созданные партиции.
+    """
+    table = AccessToken.__tablename__
+    async with db_helper.session_factory() as session:
+        if not await is_partitioned(session, table):
+            return
+
+    try:
+        async with db_helper.session_factory() as session:
+            await ensure_daily_partitions(
+                session,
+                table,
+                start=datetime.now(timezone.utc).date(),
+                days=PARTITIONS_AHEAD,
+            )
+            await session.commit()
+    except Exception:
+        log.exception("Failed to create access token partitions")
+
+    try:
+        async with db_helper.session_factory() as session:
+            dropped = await drop_daily_partitions_before(session, table, cutoff)
+            await session.commit()
+    except Exception:
+        log.exception("Failed to drop expired access token partitions")
+        return
+    if dropped:
+        log.info("Dropped access token partitions: %s", ", ".join(dropped))
+
+
+async def prune_access_tokens() -> int:
+    """Удалить истекшие access-токены
+
+    Если таблица разбита на дневные партиции (миграция с
+    -x partition_access_tokens=true), истекшие дни удаляются целиком и
+    заранее создаются партиции на ближайшие дни. Остаток (текущие сутки,
+    партиция по умолчанию) чистится пачками DELETE.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(
+        seconds=settings.access_token.lifetime_seconds
+    )
+    await _maintain_partitions(cutoff)
+
+    deleted = await delete_in_batches(
+        db_helper.session_factory,
+        AccessToken.token,
+        AccessToken.created_at < cutoff,
+        batch_size=settings.access_token.prune_batch_size,
+    )
+    if deleted:
+        log.info("Pruned %s expired access tokens", deleted)
+    return deleted
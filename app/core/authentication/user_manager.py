@@ -1,21 +1,86 @@
 import logging
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
-from fastapi_users import BaseUserManager, IntegerIDMixin
+from fastapi_users import BaseUserManager, IntegerIDMixin, exceptions, schemas
 
 from app.db.models import User
 from app.db.types import UserIdType
 from app.core.config import settings
+from app.core.authentication.password import AsyncPasswordHelper
+from app.core.authentication.token_cache import token_cache
 
 log = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
     from fastapi import Request
+    from fastapi.security import OAuth2PasswordRequestForm
 
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, UserIdType]):
     reset_password_token_secret = settings.access_token.reset_password_token_secret
     verification_token_secret = settings.access_token.verification_token_secret
+    password_helper: AsyncPasswordHelper
+
+    # Вход, регистрация и смена пароля повторяют BaseUserManager, но считают
+    # хеши в пуле password_helper, а не в цикле событий
+    async def authenticate(
+        self, credentials: "OAuth2PasswordRequestForm"
+    ) -> Optional[User]:
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Хешируем впустую, чтобы время ответа не выдавало наличие email
+            await self.password_helper.hash_async(credentials.password)
+            return None
+
+        verified, updated_password_hash = (
+            await self.password_helper.verify_and_update_async(
+                credentials.password, user.hashed_password
+            )
+        )
+        if not verified:
+            return None
+        # Хеш старым алгоритмом или с другой стоимостью пересчитываем сразу
+        if updated_password_hash is not None:
+            await self.user_db.update(user, {"hashed_password": updated_password_hash})
+
+        return user
+
+    async def create(
+        self,
+        user_create: schemas.UC,
+        safe: bool = False,
+        request: "Optional[Request]" = None,
+    ) -> User:
+        await self.validate_password(user_create.password, user_create)
+
+        existing_user = await self.user_db.get_by_email(user_create.email)
+        if existing_user is not None:
+            raise exceptions.UserAlreadyExists()
+
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        password = user_dict.pop("password")
+        user_dict["hashed_password"] = await self.password_helper.hash_async(password)
+
+        created_user = await self.user_db.create(user_dict)
+
+        await self.on_after_register(created_user, request)
+
+        return created_user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        update_dict = dict(update_dict)
+        password = update_dict.pop("password", None)
+        if password is not None:
+            await self.validate_password(password, user)
+            update_dict["hashed_password"] = await self.password_helper.hash_async(
+                password
+            )
+        return await super()._update(user, update_dict)
 
     async def on_after_register(self, user: User, request: "Optional[Request]" = None):
         log.warning("User %r has registered.", user.id)
@@ -33,3 +98,23 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, UserIdType]):
         log.warning(
             "Verification requested for user %r. Verification token: %r", user.id, token
         )
+
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: Dict[str, Any],
+        request: "Optional[Request]" = None,
+    ):
+        # Снимки в кеше токенов устарели (в том числе is_active)
+        await token_cache.invalidate_user(user.id)
+
+    async def on_after_verify(self, user: User, request: "Optional[Request]" = None):
+        await token_cache.invalidate_user(user.id)
+
+    async def on_after_reset_password(
+        self, user: User, request: "Optional[Request]" = None
+    ):
+        await token_cache.invalidate_user(user.id)
+
+    async def on_after_delete(self, user: User, request: "Optional[Request]" = None):
+        await token_cache.invalidate_user(user.id)
@@ -1,10 +1,13 @@
-from pydantic import Field
+from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional, List
+from typing import Literal, Optional, List, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Значение по умолчанию из примеров: подписывать им токены нельзя
+DEFAULT_SECRET_KEY = "your-secret-key-here"
+
 
 class DatabaseSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="DB_")
@@ -16,13 +19,40 @@ class DatabaseSettings(BaseSettings):
     password: str = Field(default="password")
     pool_size: int = Field(default=10)
     max_overflow: int = Field(default=25)
+    # Общий лимит соединений на все воркеры процесса запуска; 0 - без лимита,
+    # каждый воркер берет pool_size + max_overflow
+    max_connections: int = Field(default=0)
     echo: bool = Field(default=False)
     echo_pool: bool = Field(default=False)
+    # Реплики для GET-запросов (полные URL); пул у каждой как у основной базы
+    replica_urls: List[str] = Field(default=[])
+    replica_routing: Literal["round_robin", "least_connections"] = Field(
+        default="round_robin"
+    )
+    replica_health_interval: float = Field(default=5.0)
+    replica_health_timeout: float = Field(default=1.0)
+    # Сколько секунд после своего коммита клиент читает с основной базы
+    read_your_writes_window: float = Field(default=5.0)
+    # Запросы дольше порога (секунды) пишутся в лог вместе с параметрами; 0 - выключено
+    slow_query_threshold: float = Field(default=0.0)
 
     @property
     def url(self) -> str:
         return f"postgresql+asyncpg://{self.user}:{self.password}@{self.host}:{self.port}/{self.name}"
 
+    def pool_limits(self, workers: int) -> Tuple[int, int]:
+        """pool_size и max_overflow одного воркера с учетом max_connections"""
+        if not self.max_connections:
+            return self.pool_size, self.max_overflow
+        if workers > self.max_connections:
+            raise ValueError(
+                f"DB_MAX_CONNECTIONS={self.max_connections} is less than "
+                f"{workers} workers: each worker needs at least one connection"
+            )
+        per_worker = self.max_connections // max(1, workers)
+        pool_size = min(self.pool_size, per_worker)
+        return pool_size, min(self.max_overflow, per_worker - pool_size)
+
 
 class APISettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="API_")
@@ -33,6 +63,28 @@ class APISettings(BaseSettings):
     description: str = Field(default="FastAPI application")
     debug: bool = Field(default=False)
     allowed_hosts: List[str] = Field(default=["*"])
+    # Сжатие ответов по Accept-Encoding: gzip, brotli - если установлен пакет brotli
+    compression_enabled: bool = Field(default=True)
+    compression_minimum_size: int = Field(default=1024)
+    compression_gzip_level: int = Field(default=6)
+    compression_brotli_quality: int = Field(default=4)
+
+
+class ServerSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="SERVER_")
+
+    host: str = Field(default="0.0.0.0")
+    port: int = Field(default=8000)
+    # 0 - по числу ядер; лаунчер передает воркерам уже вычисленное число
+    workers: int = Field(default=0)
+    # auto - uvloop и httptools, если установлены
+    loop: Literal["auto", "uvloop", "asyncio"] = Field(default="auto")
+    http: Literal["auto", "httptools", "h11"] = Field(default="auto")
+    backlog: int = Field(default=2048)
+    keep_alive: int = Field(default=5)
+    # Применить миграции один раз перед запуском воркеров
+    migrate: bool = Field(default=True)
+    log_level: str = Field(default="info")
 
 
 class GPTSettings(BaseSettings):
@@ -40,16 +92,121 @@ class GPTSettings(BaseSettings):
 
     folder_id: str = Field(default="")
     api_key: str = Field(default="")
+    # Сколько запросов к модели одновременно в полете на процесс
+    max_in_flight: int = Field(default=16)
+    request_timeout: float = Field(default=60.0)
+    # Локальный агент без обращения к API (разработка и тесты)
+    fake: bool = Field(default=False)
+    fake_latency: float = Field(default=0.5)
+    fake_token_delay: float = Field(default=0.05)
+    # История чата, которая передается модели вместе с новым сообщением
+    system_prompt: str = Field(default="")
+    context_window_messages: int = Field(default=50)
+    context_token_budget: int = Field(default=4000)
+    context_chars_per_token: float = Field(default=3.0)
+    context_cache_chats: int = Field(default=1000)
+    context_cache_ttl: float = Field(default=300.0)
+    # Как часто сохранять частичный ответ при потоковой генерации
+    stream_flush_chars: int = Field(default=200)
+    stream_flush_interval: float = Field(default=1.0)
+    # Кеш ответов на одинаковые запросы; database - общий для всех процессов
+    cache_enabled: bool = Field(default=False)
+    cache_backend: Literal["memory", "database"] = Field(default="memory")
+    cache_size: int = Field(default=10000)
+    cache_ttl: float = Field(default=3600.0)
+    # Удаление просроченных ответов из таблицы (бэкенд database)
+    cache_prune_interval: float = Field(default=600.0)
+    cache_prune_batch_size: int = Field(default=1000)
+
+
+class ChatSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="CHAT_")
+
+    # Названия, которые клиент ставит новому чату до генерации настоящего
+    default_titles: List[str] = Field(default=["Новый чат", "New chat", ""])
+
+
+class RealtimeSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="REALTIME_")
+
+    # local - события видят только WebSocket-клиенты этого процесса,
+    # postgres - рассылка между воркерами через LISTEN/NOTIFY
+    backend: Literal["local", "postgres"] = Field(default="local")
+    # Событий в очереди одного соединения; при переполнении клиент получает resync
+    queue_size: int = Field(default=100)
+
+
+class SyncSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="SYNC_")
+
+    # Изменений сообщений в одном ответе /sync
+    page_size: int = Field(default=500)
+    # Токен последней страницы отстает от now() на столько секунд: транзакции,
+    # начатые раньше, но закоммиченные позже ответа, попадут в следующий sync
+    overlap_seconds: float = Field(default=5.0)
+    # Сколько хранятся следы удалений; более старый токен получает 410
+    tombstone_retention_days: int = Field(default=30)
+    prune_interval: float = Field(default=3600.0)
+    prune_batch_size: int = Field(default=1000)
+
+
+class JobQueueSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="JOBS_")
+
+    # memory - очередь в процессе, database - таблица jobs (несколько процессов)
+    backend: Literal["memory", "database"] = Field(default="memory")
+    concurrency: int = Field(default=4)
+    max_size: int = Field(default=1000)
+    enqueue_timeout: float = Field(default=1.0)
+    max_retries: int = Field(default=3)
+    backoff_base: float = Field(default=0.5)
+    backoff_max: float = Field(default=30.0)
+    poll_interval: float = Field(default=0.5)
+    visibility_timeout: float = Field(default=300.0)
+    # Сколько ждать незавершенные задачи при остановке приложения
+    shutdown_timeout: float = Field(default=30.0)
 
 
 class AccessTokenSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="ACCESS_TOKEN_")
 
+    # database - непрозрачные токены в таблице access_tokens; jwt - подписанный
+    # короткоживущий access-токен без обращения к базе и refresh-токен в
+    # таблице refresh_tokens для продления и отзыва
+    strategy: Literal["database", "jwt"] = Field(default="database")
     lifetime_seconds: int = Field(default=3600)
+    jwt_secret: str = Field(default="")
+    jwt_lifetime_seconds: int = Field(default=900)
+    refresh_lifetime_seconds: int = Field(default=30 * 24 * 3600)
+    # Удаление истекших токенов фоновой задачей
+    prune_interval: float = Field(default=3600.0)
+    prune_batch_size: int = Field(default=1000)
+    # Кеш проверенных токенов в памяти процесса; postgres - рассылать сброс
+    # кеша остальным процессам через LISTEN/NOTIFY
+    cache_enabled: bool = Field(default=False)
+    cache_size: int = Field(default=10000)
+    cache_ttl: float = Field(default=60.0)
+    cache_invalidation: Literal["local", "postgres"] = Field(default="local")
     reset_password_token_secret: str = Field(default="")
     verification_token_secret: str = Field(default="")
 
 
+class PasswordSettings(BaseSettings):
+    model_config = SettingsConfigDict(env_prefix="PASSWORD_")
+
+    # Алгоритм новых хешей; хеши другим алгоритмом или с другой стоимостью
+    # пересчитываются при следующем успешном входе
+    algorithm: Literal["argon2", "bcrypt"] = Field(default="argon2")
+    argon2_time_cost: int = Field(default=3)
+    argon2_memory_cost: int = Field(default=65536)
+    argon2_parallelism: int = Field(default=4)
+    bcrypt_rounds: int = Field(default=12)
+    # Где считать хеши: thread/process - пул из max_workers (0 - по числу
+    # ядер, не больше 4), inline - прямо в цикле событий
+    executor: Literal["inline", "thread", "process"] = Field(default="thread")
+    max_workers: int = Field(default=0)
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(
         env_file=".env", env_file_encoding="utf-8", case_sensitive=False, extra="ignore"
@@ -57,10 +214,35 @@ class Settings(BaseSettings):
 
     db: DatabaseSettings = DatabaseSettings()
     api: APISettings = APISettings()
+    server: ServerSettings = ServerSettings()
     gpt: GPTSettings = GPTSettings()
+    chat: ChatSettings = ChatSettings()
+    jobs: JobQueueSettings = JobQueueSettings()
+    realtime: RealtimeSettings = RealtimeSettings()
+    sync: SyncSettings = SyncSettings()
     access_token: AccessTokenSettings = AccessTokenSettings()
+    password: PasswordSettings = PasswordSettings()
     environment: str = Field(default="development")
-    secret_key: str = Field(default="your-secret-key-here")
+    secret_key: str = Field(default=DEFAULT_SECRET_KEY)
+
+    @model_validator(mode="after")
+    def check_jwt_secret(self) -> "Settings":
+        # В JWT лежат is_active/is_superuser: с известным секретом их подделает кто угодно
+        if self.access_token.strategy == "jwt" and not self.jwt_secret:
+            raise ValueError(
+                "ACCESS_TOKEN_STRATEGY=jwt requires ACCESS_TOKEN_JWT_SECRET "
+                "or a non-default SECRET_KEY"
+            )
+        return self
+
+    @property
+    def jwt_secret(self) -> str:
+        """Секрет подписи JWT; пустая строка, если настоящий секрет не задан"""
+        if self.access_token.jwt_secret:
+            return self.access_token.jwt_secret
+        if self.secret_key and self.secret_key != DEFAULT_SECRET_KEY:
+            return self.secret_key
+        return ""
 
 
 settings = Settings()
@@ -0,0 +1,29 @@
+from app.core.config import settings
+from app.db.database import db_helper
+from app.utils.job_queue import (
+    DatabaseJobBackend,
+    InMemoryJobBackend,
+    JobBackend,
+    JobQueue,
+)
+
+
+def create_job_backend() -> JobBackend:
+    if settings.jobs.backend == "database":
+        return DatabaseJobBackend(
+            db_helper.session_factory,
+            max_size=settings.jobs.max_size,
+            poll_interval=settings.jobs.poll_interval,
+            visibility_timeout=settings.jobs.visibility_timeout,
+        )
+    return InMemoryJobBackend(max_size=settings.jobs.max_size)
+
+
+job_queue = JobQueue(
+    backend=create_job_backend(),
+    concurrency=settings.jobs.concurrency,
+    max_retries=settings.jobs.max_retries,
+    backoff_base=settings.jobs.backoff_base,
+    backoff_max=settings.jobs.backoff_max,
+    enqueue_timeout=settings.jobs.enqueue_timeout,
+)
@@ -0,0 +1,131 @@
+import functools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List
+
+from fastapi import FastAPI
+
+from app.core.authentication.password import password_helper
+from app.core.authentication.refresh_tokens import refresh_token_store
+from app.core.authentication.token_cache import token_cache
+from app.core.authentication.token_pruning import prune_access_tokens
+from app.core.config import settings
+from app.core.jobs import job_queue
+from app.db.database import db_helper
+from app.services.MessageService import message_service
+from app.services.RealtimeService import realtime_service
+from app.services.SyncService import sync_service
+from app.utils.periodic import PeriodicTask
+from app.utils.yandex_gpt.ResponseCache import DatabaseResponseCache
+
+log = logging.getLogger(__name__)
+
+
+def maintenance_tasks() -> List[PeriodicTask]:
+    # access_tokens чистим и в режиме jwt: там могли остаться токены до переключения
+    tasks = [
+        PeriodicTask(
+            "prune-access-tokens",
+            settings.access_token.prune_interval,
+            prune_access_tokens,
+        ),
+        PeriodicTask(
+            "prune-tombstones",
+            settings.sync.prune_interval,
+            sync_service.prune_tombstones,
+        ),
+    ]
+    if settings.access_token.strategy == "jwt":
+        tasks.append(
+            PeriodicTask(
+                "prune-refresh-tokens",
+                settings.access_token.prune_interval,
+                refresh_token_store.prune,
+            )
+        )
+    if settings.gpt.cache_enabled and settings.gpt.cache_backend == "database":
+        response_cache = DatabaseResponseCache(db_helper.session_factory)
+        tasks.append(
+            PeriodicTask(
+                "prune-response-cache",
+                settings.gpt.cache_prune_interval,
+                functools.partial(
+                    response_cache.prune, batch_size=settings.gpt.cache_prune_batch_size
+                ),
+            )
+        )
+    if db_helper.replicas:
+        tasks.append(
+            PeriodicTask(
+                "check-read-replicas",
+                settings.db.replica_health_interval,
+                db_helper.replicas.check,
+            )
+        )
+    return tasks
+
+
+class _Phases:
+    """Замеряет этапы запуска или остановки и пишет их длительность в лог"""
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+        self.timings: Dict[str, float] = {}
+        self._started = time.perf_counter()
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    def report(self) -> None:
+        total = time.perf_counter() - self._started
+        details = ", ".join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.timings.items()
+        )
+        log.info("%s took %.0f ms: %s", self.stage, total * 1000, details)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup = _Phases("Startup")
+    async with startup.phase("db ping"):
+        await db_helper.ping()
+    async with startup.phase("pool warm-up"):
+        await db_helper.warm_up(db_helper.engine.pool.size())
+    async with startup.phase("llm client"):
+        message_service.agent
+    async with startup.phase("realtime hub"):
+        await realtime_service.start()
+    # Воркеры нужны сразу: очередь в базе могла накопить задачи и зависшие RUNNING
+    async with startup.phase("job queue"):
+        await job_queue.start()
+    tasks = maintenance_tasks()
+    async with startup.phase("maintenance tasks"):
+        for task in tasks:
+            task.start()
+    startup.report()
+
+    try:
+        yield
+    finally:
+        shutdown = _Phases("Shutdown")
+        async with shutdown.phase("maintenance tasks"):
+            for task in tasks:
+                await task.stop()
+        # Ответы, которые уже генерируются, дописываем до закрытия пула
+        async with shutdown.phase("job queue drain"):
+            await job_queue.stop(timeout=settings.jobs.shutdown_timeout)
+        async with shutdown.phase("realtime hub"):
+            await realtime_service.close()
+        async with shutdown.phase("password pool"):
+            password_helper.shutdown()
+        async with shutdown.phase("token cache"):
+            await token_cache.close()
+        async with shutdown.phase("db dispose"):
+            await db_helper.dispose()
+        shutdown.report()
@@ -0,0 +1,237 @@
+import math
+import time
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.db.instrumentation import StatementStats, count_statements
+from app.db.replicas import LAST_WRITE_COOKIE, LAST_WRITE_HEADER
+from app.utils.compression import choose_encoding, new_compressor
+from app.utils.metrics import metrics
+
+DB_STATEMENTS_HEADER = "X-DB-Statements"
+
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency until the response body is sent",
+    labelnames=("method", "route", "status"),
+)
+http_request_db_statements = metrics.histogram(
+    "http_request_db_statements",
+    "SQL statements executed per HTTP request",
+    labelnames=("method", "route"),
+    buckets=STATEMENT_BUCKETS,
+)
+http_request_db_duration = metrics.histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL statements per HTTP request",
+    labelnames=("method", "route"),
+)
+
+
+def route_template(scope: Scope) -> str:
+    """Шаблон пути (/chats/{chat_id}), чтобы метки не плодились по id"""
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RequestMetricsMiddleware:
+    """Длительность запроса и время в базе по маршрутам
+
+    Чистый ASGI, без BaseHTTPMiddleware: потоковые ответы не буферизуются,
+    а время считается до отправки последнего фрагмента тела. С debug_headers
+    ответ несет число запросов к базе и их время на момент отправки заголовков.
+    """
+
+    def __init__(self, app: ASGIApp, debug_headers: bool = False) -> None:
+        self.app = app
+        self.debug_headers = debug_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+        with count_statements() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if self.debug_headers:
+                        headers = MutableHeaders(scope=message)
+                        headers[DB_STATEMENTS_HEADER] = str(stats.statements)
+                        headers["Server-Timing"] = f"db;dur={stats.duration * 1000:.1f}"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._observe(scope, status, time.perf_counter() - started, stats)
+
+    @staticmethod
+    def _observe(
+        scope: Scope, status: int, elapsed: float, stats: StatementStats
+    ) -> None:
+        method, route = scope["method"], route_template(scope)
+        http_request_duration.observe(
+            elapsed, method=method, route=route, status=str(status)
+        )
+        http_request_db_statements.observe(stats.statements, method=method, route=route)
+        http_request_db_duration.observe(stats.duration, method=method, route=route)
+
+
+# Уже сжатые форматы и поток событий (его фрагменты должны уходить сразу) не жмем
+COMPRESSIBLE_TYPES = (
+    "text/plain",
+    "text/html",
+    "text/csv",
+    "application/json",
+    "application/x-ndjson",
+    "application/msgpack",
+)
+
+
+class CompressionMiddleware:
+    """Сжатие ответов gzip или brotli по Accept-Encoding
+
+    Ответ целиком сжимается, если он не меньше minimum_size. Потоковый ответ
+    сжимается по фрагментам со сбросом после каждого, без буферизации.
+    Сжимаемые ответы и 304 получают Vary: Accept-Encoding. Если клиент
+    принимает сжатие, их сильный ETag становится слабым, даже когда ответ
+    короче minimum_size: 304 не знает размера полного ответа, а должен
+    нести тот же ETag. If-None-Match сравнивается без учета W/.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+
+            async def send_identity(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    self._prepare_headers(message, weak=False)
+                await send(message)
+
+            await self.app(scope, receive, send_identity)
+            return
+
+        start: Optional[Message] = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                if start is not None:
+                    await send(start)
+                    start = None
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if compressor is None:
+                compressible = self._prepare_headers(start, weak=True)
+                if not compressible or (not more_body and len(body) < self.minimum_size):
+                    passthrough = True
+                    await send(start)
+                    start = None
+                    await send(message)
+                    return
+
+                compressor = new_compressor(
+                    encoding, self.gzip_level, self.brotli_quality
+                )
+                body = compressor.compress(body, final=not more_body)
+                headers = MutableHeaders(scope=start)
+                headers["Content-Encoding"] = encoding
+                if more_body:
+                    del headers["content-length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                await send(start)
+                start = None
+            else:
+                body = compressor.compress(body, final=not more_body)
+            await send(
+                {"type": "http.response.body", "body": body, "more_body": more_body}
+            )
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _prepare_headers(self, start: Message, weak: bool) -> bool:
+        """Vary и ETag сжимаемого ответа или 304; вернуть, можно ли сжимать тело"""
+        headers = MutableHeaders(scope=start)
+        compressible = self._compressible(start["status"], headers)
+        if not compressible and start["status"] != 304:
+            return False
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if weak and etag is not None and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag
+        return compressible
+
+    @staticmethod
+    def _compressible(status: int, headers: MutableHeaders) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in COMPRESSIBLE_TYPES
+
+
+class ReadYourWritesMiddleware:
+    """Отдает клиенту время его последней записи
+
+    Сессия запроса после коммита кладет время в request.state.last_write;
+    ответ несет его в X-Last-Write и в cookie на window секунд. Клиент
+    возвращает значение заголовком или cookie, и чтения в это окно идут
+    на основную базу, какой бы воркер их ни обработал.
+    """
+
+    def __init__(self, app: ASGIApp, window: float = 5.0) -> None:
+        self.app = app
+        self.max_age = max(1, math.ceil(window))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                last_write = scope.get("state", {}).get("last_write")
+                if last_write is not None:
+                    value = f"{last_write:.6f}"
+                    headers = MutableHeaders(scope=message)
+                    headers[LAST_WRITE_HEADER] = value
+                    headers.append(
+                        "Set-Cookie",
+                        f"{LAST_WRITE_COOKIE}={value}; Max-Age={self.max_age}; "
+                        "Path=/; HttpOnly; SameSite=Lax",
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
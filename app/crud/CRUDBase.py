@@ -1,6 +1,7 @@
 from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
 from app.db.models import Base
@@ -14,6 +15,10 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     def __init__(self, model: Type[ModelType]) -> None:
         self.model = model
 
+    def columns_for(self, schema: Type[BaseModel]) -> List[InstrumentedAttribute]:
+        """Колонки модели для полей схемы, в порядке полей (как в JSON ответа)"""
+        return [getattr(self.model, name) for name in schema.model_fields]
+
     async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
         result = await db.execute(select(self.model).filter(self.model.id == id))
         return result.scalar_one_or_none()
@@ -1,13 +1,31 @@
-from typing import List, Optional
-from sqlalchemy import select, desc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from sqlalchemy import Row, func, select, desc, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import InstrumentedAttribute, joinedload
 from app.crud.CRUDBase import CRUDBase
-from app.db.models import Chat
+from app.crud.CRUDTombstone import crud_tombstone
+from app.db.models import Chat, Tombstone
 from app.schemas.chat import ChatCreate, ChatUpdate
 
 
+# Вызывается после коммита: (чат, удален ли он)
+ChatListener = Callable[[Chat, bool], None]
+
+
 class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
+    def __init__(self, model: type[Chat]) -> None:
+        super().__init__(model)
+        self._listeners: List[ChatListener] = []
+
+    def add_listener(self, listener: ChatListener) -> None:
+        """Подписаться на изменение и удаление чатов"""
+        self._listeners.append(listener)
+
+    def _notify(self, chat: Chat, deleted: bool = False) -> None:
+        for listener in self._listeners:
+            listener(chat, deleted)
+
     async def get_by_user_id(
         self, db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
     ) -> List[Chat]:
@@ -20,6 +38,68 @@ class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
         )
         return list(result.scalars().all())
 
+    async def get_rows_by_user_id(
+        self,
+        db: AsyncSession,
+        user_id: int,
+        columns: List[InstrumentedAttribute],
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[Row]:
+        """Чаты пользователя как строки из колонок columns, без сущностей ORM"""
+        result = await db.execute(
+            select(*columns)
+            .filter(self.model.user_id == user_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return list(result.all())
+
+    async def get_list_version(
+        self, db: AsyncSession, user_id: int
+    ) -> Tuple[int, Optional[datetime]]:
+        """Версия списка чатов пользователя: (число чатов, последнее изменение)
+
+        Удаление чата видно по его следу в tombstones. Читаются только
+        индексы, без загрузки строк.
+        """
+        last_deleted = (
+            select(func.max(Tombstone.deleted_at))
+            .where(Tombstone.user_id == user_id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(func.count(), func.max(self.model.updated_at), last_deleted).where(
+                self.model.user_id == user_id
+            )
+        )
+        count, last_updated, last_deleted = result.one()
+        changes = [value for value in (last_updated, last_deleted) if value is not None]
+        return count, max(changes, default=None)
+
+    async def get_version(
+        self, db: AsyncSession, chat_id: int
+    ) -> Optional[Tuple[int, datetime]]:
+        """Владелец и время изменения чата, без загрузки строки в ORM"""
+        result = await db.execute(
+            select(self.model.user_id, self.model.updated_at).filter(
+                self.model.id == chat_id
+            )
+        )
+        row = result.one_or_none()
+        return None if row is None else (row[0], row[1])
+
+    async def get_changed_since(
+        self, db: AsyncSession, user_id: int, since: datetime
+    ) -> List[Chat]:
+        """Чаты пользователя, измененные начиная с since (включительно)"""
+        result = await db.execute(
+            select(self.model)
+            .filter(self.model.user_id == user_id, self.model.updated_at >= since)
+            .order_by(self.model.updated_at, self.model.id)
+        )
+        return list(result.scalars().all())
+
     async def get_with_messages(self, db: AsyncSession, chat_id: int) -> Optional[Chat]:
         """Получить чат с сообщениями (асинхронно)"""
         result = await db.execute(
@@ -57,5 +137,104 @@ class CRUDChat(CRUDBase[Chat, ChatCreate, ChatUpdate]):
         )
         return result.scalar_one_or_none()
 
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: Chat,
+        obj_in: Union[ChatUpdate, Dict[str, Any]],
+    ) -> Chat:
+        chat = await super().update(db, db_obj=db_obj, obj_in=obj_in)
+        self._notify(chat)
+        return chat
+
+    async def get_owner_id(self, db: AsyncSession, chat_id: int) -> Optional[int]:
+        """Получить id владельца чата (асинхронно)"""
+        result = await db.execute(
+            select(self.model.user_id).filter(self.model.id == chat_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_message_count(
+        self, db: AsyncSession, chat_id: int, user_id: int
+    ) -> Optional[int]:
+        """Количество сообщений из счетчика чата; None, если чат не найден или чужой"""
+        result = await db.execute(
+            select(self.model.message_count).filter(
+                self.model.id == chat_id, self.model.user_id == user_id
+            )
+        )
+        return result.scalar_one_or_none()
+
+    async def update_owned(
+        self,
+        db: AsyncSession,
+        *,
+        chat_id: int,
+        user_id: int,
+        obj_in: Union[ChatUpdate, Dict[str, Any]],
+    ) -> Optional[Chat]:
+        """Обновить чат пользователя одним UPDATE ... RETURNING (асинхронно)
+
+        None - чата нет или он чужой, различить можно через get_owner_id.
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
+        values = {field: value for field, value in update_data.items() if value is not None}
+
+        scope = (self.model.id == chat_id, self.model.user_id == user_id)
+        if not values:
+            result = await db.execute(select(self.model).where(*scope))
+            return result.scalar_one_or_none()
+
+        result = await db.execute(
+            update(self.model)
+            .where(*scope)
+            .values(**values)
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        chat = result.scalar_one_or_none()
+        await db.commit()
+        if chat is not None:
+            self._notify(chat)
+        return chat
+
+    async def remove_owned(
+        self, db: AsyncSession, *, chat_id: int, user_id: int
+    ) -> Optional[Chat]:
+        """Удалить чат пользователя вместе с сообщениями (асинхронно)
+
+        Сообщения удаляет каскад ORM, поэтому чат читается, но уже с
+        фильтром по владельцу. None - чата нет или он чужой.
+        """
+        result = await db.execute(
+            select(self.model).filter(
+                self.model.id == chat_id, self.model.user_id == user_id
+            )
+        )
+        chat = result.scalar_one_or_none()
+        if chat is None:
+            return None
+
+        await db.delete(chat)
+        await crud_tombstone.add_chat(db, chat=chat)
+        await db.commit()
+        self._notify(chat, deleted=True)
+        return chat
+
+    async def remove(self, db: AsyncSession, *, id: int) -> Optional[Chat]:
+        chat = await self.get(db, id)
+        if chat is None:
+            return None
+
+        await db.delete(chat)
+        await crud_tombstone.add_chat(db, chat=chat)
+        await db.commit()
+        self._notify(chat, deleted=True)
+        return chat
+
 
 crud_chat = CRUDChat(Chat)
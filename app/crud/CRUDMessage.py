@@ -1,18 +1,63 @@
-from typing import List, Optional
-from sqlalchemy import select, desc
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+from sqlalchemy import Row, Select, delete, exists, func, select, desc, tuple_, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import InstrumentedAttribute, joinedload
 from app.crud.CRUDBase import CRUDBase
+from app.crud.CRUDTombstone import crud_tombstone
 from app.db.models import Message, Chat
+from app.utils.pagination import Cursor
 from app.schemas.message import (
     MessageCreate,
     MessageSender,
     MessageStatus,
     MessageUpdate,
+    SortOrder,
 )
 
 
+# Вызывается после коммита: (сообщение, удалено ли оно)
+MessageListener = Callable[[Message, bool], None]
+
+
 class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
+    def __init__(self, model: type[Message]) -> None:
+        super().__init__(model)
+        self._listeners: List[MessageListener] = []
+
+    def add_listener(self, listener: MessageListener) -> None:
+        """Подписаться на сохранение и удаление сообщений (кеши, уведомления)"""
+        self._listeners.append(listener)
+
+    def _notify(self, message: Message, deleted: bool = False) -> None:
+        for listener in self._listeners:
+            listener(message, deleted)
+
+    def _owned_by(self, user_id: int):
+        """Условие "сообщение лежит в чате пользователя" для WHERE одного запроса"""
+        return self.model.chat_id.in_(select(Chat.id).where(Chat.user_id == user_id))
+
+    async def get_with_owner(
+        self, db: AsyncSession, message_id: int
+    ) -> Optional[Tuple[Message, int]]:
+        """Получить сообщение и владельца его чата одним запросом (асинхронно)"""
+        result = await db.execute(
+            select(self.model, Chat.user_id)
+            .join(self.model.chat)
+            .filter(self.model.id == message_id)
+        )
+        row = result.one_or_none()
+        return None if row is None else (row[0], row[1])
+
+    async def get_owner_id(self, db: AsyncSession, message_id: int) -> Optional[int]:
+        """Получить id владельца чата, в котором лежит сообщение (асинхронно)"""
+        result = await db.execute(
+            select(Chat.user_id)
+            .join(self.model, self.model.chat_id == Chat.id)
+            .filter(self.model.id == message_id)
+        )
+        return result.scalar_one_or_none()
+
     async def get_by_chat_id(
         self, db: AsyncSession, chat_id: int, skip: int = 0, limit: int = 100
     ) -> List[Message]:
@@ -40,6 +85,41 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
         )
         return list(result.scalars().all())
 
+    def _history_order(self, order: SortOrder):
+        if order == SortOrder.ASC:
+            return self.model.created_at.asc(), self.model.id.asc()
+        return self.model.created_at.desc(), self.model.id.desc()
+
+    def _history_page(
+        self,
+        query: Select,
+        chat_id: int,
+        user_id: int,
+        skip: int,
+        limit: int,
+        order: SortOrder,
+        before: Optional[Cursor],
+        after: Optional[Cursor],
+    ) -> Tuple[Select, SortOrder]:
+        """Запрос страницы истории и направление, в котором она читается"""
+        query = query.join(self.model.chat).filter(
+            self.model.chat_id == chat_id,
+            Chat.user_id == user_id,  # Проверяем, что чат принадлежит пользователю
+        )
+        position = tuple_(self.model.created_at, self.model.id)
+
+        if after is not None:
+            scan = SortOrder.ASC
+            query = query.filter(position > tuple(after))
+        elif before is not None:
+            scan = SortOrder.DESC
+            query = query.filter(position < tuple(before))
+        else:
+            scan = order
+            query = query.offset(skip)
+
+        return query.order_by(*self._history_order(scan)).limit(limit), scan
+
     async def get_by_chat_id_and_user(
         self,
         db: AsyncSession,
@@ -47,36 +127,159 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
         user_id: int,
         skip: int = 0,
         limit: int = 100,
+        order: SortOrder = SortOrder.DESC,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+    ) -> List[Message]:
+        """Получить сообщения чата с проверкой владельца чата (асинхронно)
+
+        Без курсора работает через offset, с курсором before/after читает
+        страницу по индексу (chat_id, created_at, id) без пропуска строк.
+        Индекс читается в обе стороны, так что asc и desc одинаково дешевы.
+        """
+        query, scan = self._history_page(
+            select(self.model), chat_id, user_id, skip, limit, order, before, after
+        )
+        result = await db.execute(query)
+        messages = list(result.scalars().all())
+        # Курсор задает направление чтения, порядок ответа задает order
+        if scan != order:
+            messages.reverse()
+        return messages
+
+    async def get_rows_by_chat_id_and_user(
+        self,
+        db: AsyncSession,
+        chat_id: int,
+        user_id: int,
+        columns: List[InstrumentedAttribute],
+        skip: int = 0,
+        limit: int = 100,
+        order: SortOrder = SortOrder.DESC,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+    ) -> List[Row]:
+        """Та же страница истории, но только колонки columns, без сущностей ORM
+
+        Для columns нужны created_at и id: по ним строится курсор.
+        """
+        query, scan = self._history_page(
+            select(*columns), chat_id, user_id, skip, limit, order, before, after
+        )
+        result = await db.execute(query)
+        rows = list(result.all())
+        if scan != order:
+            rows.reverse()
+        return rows
+
+    async def get_chat_version(
+        self, db: AsyncSession, chat_id: int, user_id: int
+    ) -> Optional[Tuple[int, datetime]]:
+        """Версия истории чата: (число сообщений, последнее изменение)
+
+        Добавление и удаление сообщения обновляют чат, правка - только само
+        сообщение; максимум updated_at берется из индекса. None - чата нет
+        или он чужой.
+        """
+        last_edited = (
+            select(func.max(self.model.updated_at))
+            .where(self.model.chat_id == chat_id)
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(Chat.message_count, Chat.updated_at, last_edited).where(
+                Chat.id == chat_id, Chat.user_id == user_id
+            )
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+        count, chat_updated, last_edited = row
+        if last_edited is None:
+            return count, chat_updated
+        return count, max(chat_updated, last_edited)
+
+    async def get_changed_since(
+        self, db: AsyncSession, user_id: int, after: Cursor, limit: int
     ) -> List[Message]:
-        """Получить сообщения чата с проверкой владельца чата (асинхронно)"""
+        """Сообщения из чатов пользователя, измененные после позиции after
+
+        Позиция - (updated_at, id); страница идет по индексу
+        (user_id, updated_at, id) в порядке изменения, без соединения с чатами.
+        """
         result = await db.execute(
             select(self.model)
-            .join(self.model.chat)
             .filter(
-                self.model.chat_id == chat_id,
-                Chat.user_id == user_id,  # Проверяем, что чат принадлежит пользователю
+                self.model.user_id == user_id,
+                tuple_(self.model.updated_at, self.model.id) > tuple(after),
             )
-            .order_by(desc(self.model.created_at))
-            .offset(skip)
+            .order_by(self.model.updated_at, self.model.id)
             .limit(limit)
         )
         return list(result.scalars().all())
 
+    async def stream_by_chat_id(
+        self,
+        db: AsyncSession,
+        chat_id: int,
+        order: SortOrder = SortOrder.ASC,
+        batch_size: int = 500,
+    ) -> AsyncIterator[Message]:
+        """Построчно отдать всю историю чата, не загружая ее в память (асинхронно)"""
+        result = await db.stream_scalars(
+            select(self.model)
+            .filter(self.model.chat_id == chat_id)
+            .order_by(*self._history_order(order))
+            .execution_options(yield_per=batch_size)
+        )
+        async for message in result:
+            yield message
+
+    async def _on_message_added(
+        self, db: AsyncSession, chat_id: int, user_id: Optional[int] = None
+    ) -> bool:
+        """Обновить счетчики чата; с user_id это же и проверка владельца"""
+        query = update(Chat).where(Chat.id == chat_id)
+        if user_id is not None:
+            query = query.where(Chat.user_id == user_id)
+        # created_at нового сообщения тоже now(), внутри транзакции значения совпадают
+        result = await db.execute(
+            query.values(
+                message_count=Chat.message_count + 1,
+                last_message_at=func.now(),
+            ).execution_options(synchronize_session=False)
+        )
+        return result.rowcount > 0
+
+    async def _on_message_removed(self, db: AsyncSession, chat_id: int) -> None:
+        last_message_at = (
+            select(func.max(self.model.created_at))
+            .where(self.model.chat_id == chat_id)
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(
+                message_count=Chat.message_count - 1,
+                last_message_at=last_message_at,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
     async def create_with_chat_check(
         self, db: AsyncSession, *, obj_in: MessageCreate, user_id: int
     ) -> Optional[Message]:
         """Создать сообщение с проверкой, что чат принадлежит пользователю (асинхронно)"""
-        chat_result = await db.execute(
-            select(Chat).filter(Chat.id == obj_in.chat_id, Chat.user_id == user_id)
-        )
-        chat = chat_result.scalar_one_or_none()
-
-        if not chat:
+        # Обновление счетчиков с фильтром по владельцу заменяет отдельный SELECT чата
+        if not await self._on_message_added(db, obj_in.chat_id, user_id=user_id):
+            await db.rollback()
             return None
 
         db_obj = Message(
             text=obj_in.text,
             chat_id=obj_in.chat_id,
+            user_id=user_id,
             status=MessageStatus.DELIVERED,
             sender=MessageSender.USER,
         )
@@ -84,8 +287,124 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        self._notify(db_obj)
         return db_obj
 
+    async def create_bot_message(
+        self,
+        db: AsyncSession,
+        *,
+        chat_id: int,
+        user_id: int,
+        text: str,
+        status: MessageStatus,
+    ) -> Message:
+        """Создать сообщение от имени бота в чате пользователя user_id (асинхронно)"""
+        db_obj = Message(
+            text=text,
+            chat_id=chat_id,
+            user_id=user_id,
+            status=status,
+            sender=MessageSender.BOT,
+        )
+
+        db.add(db_obj)
+        await self._on_message_added(db, chat_id)
+        await db.commit()
+        await db.refresh(db_obj)
+        self._notify(db_obj)
+        return db_obj
+
+    async def remove(self, db: AsyncSession, *, id: int) -> Optional[Message]:
+        """Удалить сообщение и обновить счетчики чата (асинхронно)"""
+        db_obj = await self.get(db, id)
+        if not db_obj:
+            return None
+
+        await db.delete(db_obj)
+        await db.flush()
+        await self._on_message_removed(db, db_obj.chat_id)
+        await crud_tombstone.add_message(
+            db, message_id=db_obj.id, chat_id=db_obj.chat_id
+        )
+        await db.commit()
+        self._notify(db_obj, deleted=True)
+        return db_obj
+
+    async def remove_owned(
+        self, db: AsyncSession, *, message_id: int, user_id: int
+    ) -> Optional[Message]:
+        """Удалить сообщение из чата пользователя одним DELETE ... RETURNING (асинхронно)
+
+        None - сообщения нет или чат чужой, различить можно через get_owner_id.
+        """
+        result = await db.execute(
+            delete(self.model)
+            .where(self.model.id == message_id, self._owned_by(user_id))
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        db_obj = result.scalar_one_or_none()
+        if db_obj is None:
+            await db.rollback()
+            return None
+
+        await self._on_message_removed(db, db_obj.chat_id)
+        await crud_tombstone.add_message(
+            db, message_id=db_obj.id, chat_id=db_obj.chat_id, user_id=user_id
+        )
+        await db.commit()
+        self._notify(db_obj, deleted=True)
+        return db_obj
+
+    async def update(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: Message,
+        obj_in: Union[MessageUpdate, Dict[str, Any]],
+    ) -> Message:
+        message = await super().update(db, db_obj=db_obj, obj_in=obj_in)
+        self._notify(message)
+        return message
+
+    async def update_owned(
+        self,
+        db: AsyncSession,
+        *,
+        message_id: int,
+        user_id: int,
+        obj_in: Union[MessageUpdate, Dict[str, Any]],
+    ) -> Optional[Message]:
+        """Обновить сообщение в чате пользователя одним UPDATE ... RETURNING (асинхронно)
+
+        None - сообщения нет или чат чужой, различить можно через get_owner_id.
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.model_dump(exclude_unset=True)
+        # Как в CRUDBase.update: None не затирает значение
+        values = {field: value for field, value in update_data.items() if value is not None}
+
+        scope = (self.model.id == message_id, self._owned_by(user_id))
+        if not values:
+            result = await db.execute(select(self.model).where(*scope))
+            return result.scalar_one_or_none()
+
+        result = await db.execute(
+            update(self.model)
+            .where(*scope)
+            .values(**values)
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        message = result.scalar_one_or_none()
+        await db.commit()
+        if message is not None:
+            self._notify(message)
+        return message
+
     async def update_status(
         self, db: AsyncSession, *, message_id: int, status: str
     ) -> Optional[Message]:
@@ -97,6 +416,31 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
         # Используем базовый метод update для изменения статуса
         return await self.update(db, db_obj=message, obj_in={"status": status})
 
+    async def update_text(
+        self,
+        db: AsyncSession,
+        *,
+        message_id: int,
+        text: str,
+        status: Optional[MessageStatus] = None,
+    ) -> Optional[Message]:
+        """Обновить текст (и статус) сообщения одним UPDATE без чтения строки"""
+        values = {"text": text}
+        if status is not None:
+            values["status"] = status
+        result = await db.execute(
+            update(self.model)
+            .where(self.model.id == message_id)
+            .values(**values)
+            .returning(self.model)
+            .execution_options(synchronize_session=False)
+        )
+        message = result.scalar_one_or_none()
+        await db.commit()
+        if message is not None:
+            self._notify(message)
+        return message
+
     async def get_latest_by_chat_id(
         self, db: AsyncSession, chat_id: int, limit: int = 10
     ) -> List[Message]:
@@ -109,12 +453,42 @@ class CRUDMessage(CRUDBase[Message, MessageCreate, MessageUpdate]):
         )
         return list(result.scalars().all())
 
+    async def get_latest_by_chat_id_and_user(
+        self, db: AsyncSession, chat_id: int, user_id: int, limit: int = 10
+    ) -> List[Message]:
+        """Получить последние сообщения чата с проверкой владельца чата (асинхронно)"""
+        result = await db.execute(
+            select(self.model)
+            .join(self.model.chat)
+            .filter(self.model.chat_id == chat_id, Chat.user_id == user_id)
+            .order_by(*self._history_order(SortOrder.DESC))
+            .limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def has_user_messages_before(
+        self, db: AsyncSession, chat_id: int, message_id: int
+    ) -> bool:
+        """Есть ли в чате сообщения пользователя раньше указанного (асинхронно)"""
+        result = await db.execute(
+            select(
+                exists().where(
+                    self.model.chat_id == chat_id,
+                    self.model.sender == MessageSender.USER,
+                    self.model.id < message_id,
+                )
+            )
+        )
+        return result.scalar_one()
+
     async def get_count_by_chat_id(self, db: AsyncSession, chat_id: int) -> int:
         """Получить количество сообщений в чате (асинхронно)"""
         result = await db.execute(
-            select(self.model).filter(self.model.chat_id == chat_id)
+            select(func.count())
+            .select_from(self.model)
+            .filter(self.model.chat_id == chat_id)
         )
-        return len(result.scalars().all())
+        return result.scalar_one()
 
 
 crud_message = CRUDMessage(Message)
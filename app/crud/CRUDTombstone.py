@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy import insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import Chat, Tombstone
+from app.db.models.tombstone import TombstoneEntity
+
+
+class CRUDTombstone:
+    def __init__(self, model: type[Tombstone]) -> None:
+        self.model = model
+
+    async def add_chat(self, db: AsyncSession, *, chat: Chat) -> None:
+        """Записать удаление чата в текущую транзакцию; сообщения чата входят в него"""
+        await db.execute(
+            insert(self.model).values(
+                user_id=chat.user_id,
+                entity=TombstoneEntity.CHAT,
+                entity_id=chat.id,
+                chat_id=chat.id,
+            )
+        )
+
+    async def add_message(
+        self,
+        db: AsyncSession,
+        *,
+        message_id: int,
+        chat_id: int,
+        user_id: Optional[int] = None,
+    ) -> None:
+        """Записать удаление сообщения; без user_id владелец берется из чата"""
+        if user_id is not None:
+            await db.execute(
+                insert(self.model).values(
+                    user_id=user_id,
+                    entity=TombstoneEntity.MESSAGE,
+                    entity_id=message_id,
+                    chat_id=chat_id,
+                )
+            )
+            return
+        await db.execute(
+            insert(self.model).from_select(
+                ["user_id", "entity", "entity_id", "chat_id"],
+                select(
+                    Chat.user_id,
+                    literal(TombstoneEntity.MESSAGE.value),
+                    literal(message_id),
+                    literal(chat_id),
+                ).where(Chat.id == chat_id),
+            )
+        )
+
+    async def get_since(
+        self, db: AsyncSession, *, user_id: int, since: datetime
+    ) -> List[Tombstone]:
+        """Удаления пользователя начиная с since (включительно)"""
+        result = await db.execute(
+            select(self.model).filter(
+                self.model.user_id == user_id, self.model.deleted_at >= since
+            )
+        )
+        return list(result.scalars().all())
+
+
+crud_tombstone = CRUDTombstone(Tombstone)
@@ -1,5 +1,10 @@
-from typing import AsyncGenerator
+import asyncio
+import time
+from typing import AsyncGenerator, Sequence
 
+from fastapi import Request
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     AsyncEngine,
@@ -8,6 +13,15 @@ from sqlalchemy.ext.asyncio import (
 )
 
 from app.core.config import settings
+from app.db.instrumentation import TimedQueuePool, instrument_engine
+from app.db.replicas import (
+    LAST_WRITE_COOKIE,
+    LAST_WRITE_HEADER,
+    Replica,
+    ReplicaRouter,
+    Routing,
+    last_write_at,
+)
 
 
 class DatabaseHelper:
@@ -18,33 +32,125 @@ class DatabaseHelper:
         echo_pool: bool = False,
         pool_size: int = 5,
         max_overflow: int = 10,
+        replica_urls: Sequence[str] = (),
+        replica_routing: Routing = "round_robin",
+        read_your_writes_window: float = 5.0,
+        replica_health_timeout: float = 1.0,
+        slow_query_threshold: float = 0.0,
     ) -> None:
-        self.engine: AsyncEngine = create_async_engine(
-            url=url,
+        engine_kwargs = dict(
             echo=echo,
             echo_pool=echo_pool,
             pool_size=pool_size,
             max_overflow=max_overflow,
+            poolclass=TimedQueuePool,
         )
+        self.engine: AsyncEngine = create_async_engine(url=url, **engine_kwargs)
         self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
             bind=self.engine,
             autoflush=False,
             autocommit=False,
             expire_on_commit=False,
         )
+        self.replicas = ReplicaRouter(
+            [Replica(replica_url, **engine_kwargs) for replica_url in replica_urls],
+            routing=replica_routing,
+            window=read_your_writes_window,
+            health_timeout=replica_health_timeout,
+        )
+        for engine in [self.engine, *(r.engine for r in self.replicas.replicas)]:
+            instrument_engine(engine.sync_engine, slow_query_threshold)
+
+    async def ping(self) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def warm_up(self, connections: int) -> None:
+        """Открыть connections соединений сразу, чтобы первые запросы не ждали подключения"""
+        # Все соединения держатся одновременно, иначе пул отдаст одно и то же
+        conns = await asyncio.gather(
+            *(self.engine.connect() for _ in range(connections))
+        )
+        try:
+            await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+        finally:
+            await asyncio.gather(*(conn.close() for conn in conns))
 
     async def dispose(self) -> None:
+        await self.replicas.dispose()
         await self.engine.dispose()
 
-    async def session_getter(self) -> AsyncGenerator[AsyncSession, None]:
+    async def session_getter(
+        self, request: Request
+    ) -> AsyncGenerator[AsyncSession, None]:
         async with self.session_factory() as session:
+            if self.replicas:
+                # Коммит запроса открывает клиенту окно чтения с основной базы;
+                # время уходит клиенту в ответе (ReadYourWritesMiddleware)
+                event.listen(
+                    session.sync_session,
+                    "after_commit",
+                    lambda _: setattr(request.state, "last_write", time.time()),
+                )
             yield session
 
+    async def read_session_getter(
+        self, request: Request
+    ) -> AsyncGenerator[AsyncSession, None]:
+        """Сессия только для чтения: реплика, если она есть и клиент недавно не писал
+
+        Соединение с репликой берется до эндпоинта: если она не отвечает, она
+        выводится из ротации, а запрос читает с основной базы. Ошибка
+        соединения уже во время запроса выводит реплику и уходит клиенту.
+        """
+        replica = self.replicas.pick(
+            last_write_at(
+                request.headers.get(LAST_WRITE_HEADER),
+                request.cookies.get(LAST_WRITE_COOKIE),
+            )
+        )
+        if replica is not None:
+            replica.in_use += 1
+            try:
+                async with replica.session_factory() as session:
+                    if await self._checkout(replica, session):
+                        yield session
+                        return
+            except DBAPIError as error:
+                if error.connection_invalidated or isinstance(error.orig, OSError):
+                    self.replicas.mark_down(replica)
+                raise
+            except OSError:
+                self.replicas.mark_down(replica)
+                raise
+            finally:
+                replica.in_use -= 1
+
+        async with self.session_factory() as session:
+            yield session
+
+    async def _checkout(self, replica: Replica, session: AsyncSession) -> bool:
+        """Взять соединение реплики для сессии; False - реплика недоступна"""
+        try:
+            await session.connection()
+        except (DBAPIError, OSError):
+            self.replicas.mark_down(replica)
+            return False
+        return True
+
+
+# Без лаунчера SERVER_WORKERS не задан, процесс считается единственным
+pool_size, max_overflow = settings.db.pool_limits(settings.server.workers or 1)
 
 db_helper = DatabaseHelper(
     url=str(settings.db.url),
     echo=settings.db.echo,
     echo_pool=settings.db.echo_pool,
-    pool_size=settings.db.pool_size,
-    max_overflow=settings.db.max_overflow,
+    pool_size=pool_size,
+    max_overflow=max_overflow,
+    replica_urls=settings.db.replica_urls,
+    replica_routing=settings.db.replica_routing,
+    read_your_writes_window=settings.db.read_your_writes_window,
+    replica_health_timeout=settings.db.replica_health_timeout,
+    slow_query_threshold=settings.db.slow_query_threshold,
 )
@@ -0,0 +1,156 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.utils.metrics import metrics
+
+slow_query_log = logging.getLogger("app.db.slow_query")
+
+db_statement_duration = metrics.histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing a single SQL statement",
+)
+db_pool_checkout_wait = metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection, including opening a new one",
+)
+
+
+budget_log = logging.getLogger("app.db.statement_budget")
+
+
+@dataclass
+class StatementStats:
+    """Запросы к базе внутри блока count_statements"""
+
+    statements: int = 0
+    duration: float = 0.0
+    # Задачи, запущенные внутри блока, наследуют контекст и переживают его;
+    # их запросы после выхода из блока не считаются
+    active: bool = True
+
+
+# Вложенные счетчики: запрос к базе засчитывается каждому открытому
+_active_stats: ContextVar[Tuple[StatementStats, ...]] = ContextVar(
+    "active_db_stats", default=()
+)
+
+
+@contextmanager
+def count_statements() -> Iterator[StatementStats]:
+    """Посчитать запросы к базе, выполненные в этом контексте (задаче)
+
+        with count_statements() as stats:
+            await chat_service.get_user_chats(db, user_id)
+        assert stats.statements == 1
+    """
+    stats = StatementStats()
+    token = _active_stats.set(_active_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        stats.active = False
+        _active_stats.reset(token)
+
+
+@dataclass
+class BudgetExceeded:
+    endpoint: str
+    budget: int
+    statements: int
+
+
+# Кому сообщать о превышении бюджета, кроме лога (плагин pytest)
+budget_listeners: List[Callable[[BudgetExceeded], None]] = []
+
+
+def _report_exceeded(exceeded: BudgetExceeded) -> None:
+    budget_log.warning(
+        "%s executed %s SQL statements, budget is %s",
+        exceeded.endpoint,
+        exceeded.statements,
+        exceeded.budget,
+    )
+    for listener in budget_listeners:
+        listener(exceeded)
+
+
+def statement_budget(budget: int):
+    """Объявить, сколько запросов к базе может сделать эндпоинт
+
+    Ставится под декоратором маршрута. Считаются запросы самой функции
+    эндпоинта, без зависимостей (проверка токена зависит от режима
+    авторизации) и без тела потокового ответа. Превышение пишется в лог
+    и передается budget_listeners.
+    """
+
+    def decorator(endpoint):
+        name = f"{endpoint.__module__}.{endpoint.__qualname__}"
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            # Ответ с ошибкой (HTTPException) тоже укладывается в бюджет
+            with count_statements() as stats:
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    if stats.statements > budget:
+                        _report_exceeded(BudgetExceeded(name, budget, stats.statements))
+
+        wrapper.statement_budget = budget
+        return wrapper
+
+    return decorator
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, который замеряет, сколько ждали соединение"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - started)
+
+
+def instrument_engine(engine: Engine, slow_query_threshold: float = 0.0) -> None:
+    """Считать запросы и их время; запросы дольше порога писать в лог с параметрами
+
+    Принимает синхронный движок (AsyncEngine.sync_engine).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_statement_duration.observe(elapsed)
+        for stats in _active_stats.get():
+            if not stats.active:
+                continue
+            stats.statements += 1
+            stats.duration += elapsed
+        if slow_query_threshold and elapsed >= slow_query_threshold:
+            slow_query_log.warning(
+                "Slow query (%.0f ms): %s; parameters: %r",
+                elapsed * 1000,
+                statement,
+                parameters,
+            )
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
@@ -0,0 +1,99 @@
+import logging
+import re
+from datetime import date, datetime, time, timedelta, timezone
+from typing import List
+
+from sqlalchemy import ColumnElement, delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import InstrumentedAttribute
+
+log = logging.getLogger(__name__)
+
+
+async def delete_in_batches(
+    session_factory: async_sessionmaker[AsyncSession],
+    key: InstrumentedAttribute,
+    condition: ColumnElement[bool],
+    batch_size: int = 1000,
+) -> int:
+    """Удалить строки по условию пачками, каждая пачка в своей транзакции
+
+    Короткие транзакции не держат блокировки и не раздувают WAL одним
+    огромным DELETE. key - первичный ключ, по нему выбирается пачка.
+    """
+    table = key.class_
+    total = 0
+    while True:
+        batch = select(key).where(condition).limit(batch_size)
+        async with session_factory() as session:
+            result = await session.execute(delete(table).where(key.in_(batch)))
+            await session.commit()
+        total += result.rowcount
+        if result.rowcount < batch_size:
+            return total
+
+
+def daily_partition_name(table: str, day: date) -> str:
+    return f"{table}_p{day:%Y%m%d}"
+
+
+def _utc_midnight(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+async def is_partitioned(session: AsyncSession, table: str) -> bool:
+    result = await session.execute(
+        text(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table p "
+            "JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table)"
+        ),
+        {"table": table},
+    )
+    return result.scalar_one()
+
+
+async def ensure_daily_partitions(
+    session: AsyncSession, table: str, start: date, days: int
+) -> None:
+    """Создать недостающие дневные партиции (по UTC) на days дней от start"""
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        lower, upper = _utc_midnight(day), _utc_midnight(day + timedelta(days=1))
+        await session.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS "{daily_partition_name(table, day)}" '
+                f'PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+
+
+async def drop_daily_partitions_before(
+    session: AsyncSession, table: str, cutoff: datetime
+) -> List[str]:
+    """Удалить дневные партиции, целиком лежащие раньше cutoff
+
+    Берутся только имена вида <table>_pYYYYMMDD; партиции с другими именами
+    (и с невозможной датой) не трогаются.
+    """
+    result = await session.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table AND c.relname ~ :pattern"
+        ),
+        # В LIKE "_" - любой символ, поэтому точное регулярное выражение
+        {"table": table, "pattern": rf"^{re.escape(table)}_p\d{{8}}$"},
+    )
+    dropped = []
+    for name in result.scalars():
+        try:
+            day = datetime.strptime(name[len(table) + 2:], "%Y%m%d").date()
+        except ValueError:
+            log.warning("Skipping partition %r: no date in its name", name)
+            continue
+        if _utc_midnight(day + timedelta(days=1)) <= cutoff:
+            await session.execute(text(f'DROP TABLE "{name}"'))
+            dropped.append(name)
+    return dropped
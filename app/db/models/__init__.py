@@ -1,6 +1,10 @@
-__all__ = ["Base", "User", "AccessToken", "Chat", "Message"]
+__all__ = ["Base", "User", "AccessToken", "Chat", "Message", "Job", "CachedResponse", "RefreshToken", "Tombstone"]
 from .base import Base
 from .user import User
 from .chat import Chat
 from .message import Message
 from .access_token import AccessToken
+from .job import Job
+from .cached_response import CachedResponse
+from .refresh_token import RefreshToken
+from .tombstone import Tombstone
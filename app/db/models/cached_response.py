@@ -0,0 +1,13 @@
+from datetime import datetime
+from sqlalchemy import String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.models import Base
+
+
+class CachedResponse(Base):
+    """Общий для всех процессов кеш ответов модели"""
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    response: Mapped[str] = mapped_column(nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
+    created_at: Mapped[datetime] = mapped_column(default=func.now(), nullable=False)
@@ -1,5 +1,6 @@
-from typing import TYPE_CHECKING
-from sqlalchemy import ForeignKey
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.models import Base
 from app.db.mixins import IDMixin, TimestampMixin
@@ -11,8 +12,17 @@ if TYPE_CHECKING:
 class Chat(Base, IDMixin, TimestampMixin):
     title: Mapped[str] = mapped_column(nullable=False)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    # Денормализованные счетчики, их поддерживает CRUDMessage в той же транзакции
+    message_count: Mapped[int] = mapped_column(
+        default=0, server_default="0", nullable=False
+    )
+    last_message_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
 
     user: Mapped["User"] = relationship("User", back_populates="chats")
     messages: Mapped[list["Message"]] = relationship(
         "Message", back_populates="chat", cascade="all, delete-orphan"
     )
+
+
+# Изменения чатов пользователя для /sync
+Index("ix_chats_user_id_updated_at", Chat.user_id, Chat.updated_at)
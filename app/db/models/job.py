@@ -0,0 +1,30 @@
+import enum
+from datetime import datetime
+from typing import Any, Optional
+from sqlalchemy import JSON, Enum, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.models import Base
+from app.db.mixins import IDMixin, TimestampMixin
+
+
+class JobStatus(enum.Enum):
+    PENDING = "PENDING"
+    RUNNING = "RUNNING"
+    FAILED = "FAILED"
+
+
+class Job(Base, IDMixin, TimestampMixin):
+    kind: Mapped[str] = mapped_column(nullable=False)
+    # Задачи с одинаковым ключом выполняются строго по порядку
+    key: Mapped[Optional[str]] = mapped_column(nullable=True)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSON, nullable=False)
+    status: Mapped[JobStatus] = mapped_column(
+        Enum(JobStatus), default=JobStatus.PENDING, nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(default=0, nullable=False)
+    last_error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+
+
+Index("ix_jobs_status_id", Job.status, Job.id)
+Index("ix_jobs_key_id", Job.key, Job.id)
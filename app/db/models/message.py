@@ -1,5 +1,5 @@
 from typing import TYPE_CHECKING
-from sqlalchemy import Enum, ForeignKey
+from sqlalchemy import Enum, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from app.db.models import Base
 from app.db.mixins import IDMixin, TimestampMixin
@@ -26,6 +26,33 @@ class Message(Base, IDMixin, TimestampMixin):
     status: Mapped[MessageStatus] = mapped_column(Enum(MessageStatus), nullable=False)
     sender: Mapped[MessageSender] = mapped_column(Enum(MessageSender), nullable=False)
     chat_id: Mapped[int] = mapped_column(ForeignKey("chats.id"), nullable=False)
+    # Владелец чата, денормализован для /sync: чат не меняет владельца
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
 
     # Relationship
     chat: Mapped["Chat"] = relationship("Chat", back_populates="messages")
+
+
+# История чата листается по (created_at, id), индекс покрывает keyset-пагинацию
+Index(
+    "ix_messages_chat_id_created_at_id",
+    Message.chat_id,
+    Message.created_at.desc(),
+    Message.id.desc(),
+)
+
+# Последнее изменение в чате (версия для ETag) берется из индекса
+Index(
+    "ix_messages_chat_id_updated_at_id",
+    Message.chat_id,
+    Message.updated_at,
+    Message.id,
+)
+
+# Изменения сообщений для /sync: по пользователю в порядке (updated_at, id)
+Index(
+    "ix_messages_user_id_updated_at_id",
+    Message.user_id,
+    Message.updated_at,
+    Message.id,
+)
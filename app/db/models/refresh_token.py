@@ -0,0 +1,15 @@
+from datetime import datetime
+from sqlalchemy import ForeignKey, Integer, String, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.models import Base
+from app.db.types.user_id import UserIdType
+
+
+class RefreshToken(Base):
+    # В базе только sha256 токена: утечка таблицы не дает готовых токенов
+    token_hash: Mapped[str] = mapped_column(String(64), primary_key=True)
+    user_id: Mapped[UserIdType] = mapped_column(
+        Integer, ForeignKey("users.id", ondelete="cascade"), nullable=False, index=True
+    )
+    created_at: Mapped[datetime] = mapped_column(default=func.now(), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
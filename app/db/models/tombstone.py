@@ -0,0 +1,30 @@
+import enum
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Enum, ForeignKey, Index, func
+from sqlalchemy.orm import Mapped, mapped_column
+from app.db.models import Base
+from app.db.mixins import IDMixin
+
+
+class TombstoneEntity(enum.Enum):
+    CHAT = "CHAT"
+    MESSAGE = "MESSAGE"
+
+
+class Tombstone(Base, IDMixin):
+    """След удаленного чата или сообщения для /sync; чистится по сроку хранения"""
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("users.id", ondelete="cascade"), nullable=False
+    )
+    entity: Mapped[TombstoneEntity] = mapped_column(
+        Enum(TombstoneEntity), nullable=False
+    )
+    entity_id: Mapped[int] = mapped_column(nullable=False)
+    chat_id: Mapped[Optional[int]] = mapped_column(nullable=True)
+    deleted_at: Mapped[datetime] = mapped_column(default=func.now(), nullable=False)
+
+
+Index("ix_tombstones_user_id_deleted_at", Tombstone.user_id, Tombstone.deleted_at)
+Index("ix_tombstones_deleted_at", Tombstone.deleted_at)
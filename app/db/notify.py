@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+log = logging.getLogger(__name__)
+
+# NOTIFY принимает полезную нагрузку короче 8000 байт (по умолчанию)
+MAX_PAYLOAD_BYTES = 7999
+
+NotifyCallback = Callable[[str], None]
+ReconnectCallback = Callable[[], None]
+
+
+class PgNotifier:
+    """Рассылка коротких событий между процессами через LISTEN/NOTIFY PostgreSQL
+
+    Для прослушивания держит одно выделенное соединение из пула движка
+    (драйвер asyncpg). Колбэки вызываются в цикле событий и не должны
+    блокировать его.
+
+    Потерю соединения замечает слушатель закрытия asyncpg, а молча
+    оборванное - проверка SELECT 1 раз в health_interval секунд. Тогда
+    соединение открывается заново с повторами, каналы снова слушаются, и
+    вызываются колбэки on_reconnect: уведомления за время разрыва потеряны.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        health_interval: float = 10.0,
+        health_timeout: float = 5.0,
+        max_reconnect_delay: float = 30.0,
+    ) -> None:
+        self.engine = engine
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_reconnect_delay = max_reconnect_delay
+        self._callbacks: Dict[str, List[NotifyCallback]] = defaultdict(list)
+        self._reconnect_callbacks: List[ReconnectCallback] = []
+        self._conn: Optional[AsyncConnection] = None
+        self._lost = asyncio.Event()
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def publish(self, channel: str, payload: str) -> None:
+        async with self.engine.connect() as conn:
+            await conn.execute(
+                text("SELECT pg_notify(:channel, :payload)"),
+                {"channel": channel, "payload": payload},
+            )
+            await conn.commit()
+
+    async def subscribe(self, channel: str, callback: NotifyCallback) -> None:
+        first = channel not in self._callbacks
+        self._callbacks[channel].append(callback)
+        if not first:
+            return
+        driver = await self._listener()
+        await driver.add_listener(channel, self._dispatch)
+
+    def on_reconnect(self, callback: ReconnectCallback) -> None:
+        """Вызвать callback после восстановления соединения для LISTEN"""
+        self._reconnect_callbacks.append(callback)
+
+    async def close(self) -> None:
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        await self._disconnect()
+        self._callbacks.clear()
+        self._reconnect_callbacks.clear()
+
+    async def _listener(self):
+        if self._conn is None:
+            await self._connect()
+            self._watcher = asyncio.create_task(self._watch(), name="pg-notify-watch")
+        return await self._driver()
+
+    async def _driver(self):
+        raw = await self._conn.get_raw_connection()
+        return raw.driver_connection
+
+    async def _connect(self) -> None:
+        self._conn = await self.engine.connect()
+        self._lost.clear()
+        driver = await self._driver()
+        driver.add_termination_listener(lambda connection: self._lost.set())
+        for channel in self._callbacks:
+            await driver.add_listener(channel, self._dispatch)
+
+    async def _disconnect(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            # Соединение могло умереть: в пул его не возвращаем
+            await conn.invalidate()
+            await conn.close()
+        except Exception:
+            log.debug("Failed to close the LISTEN connection", exc_info=True)
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._lost.wait(), self.health_interval)
+            except TimeoutError:
+                if await self._healthy():
+                    continue
+            log.warning("LISTEN connection lost, reconnecting")
+            await self._reconnect()
+
+    async def _healthy(self) -> bool:
+        try:
+            driver = await self._driver()
+            # Напрямую через asyncpg: без транзакции, в которой уведомления не приходят
+            await asyncio.wait_for(driver.fetchval("SELECT 1"), self.health_timeout)
+        except Exception:
+            return False
+        return True
+
+    async def _reconnect(self) -> None:
+        delay = 1.0
+        while True:
+            await self._disconnect()
+            try:
+                await self._connect()
+                break
+            except Exception:
+                log.warning(
+                    "Failed to reconnect LISTEN connection, retrying in %.0f s",
+                    delay,
+                    exc_info=True,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        log.info("LISTEN connection restored")
+        for callback in self._reconnect_callbacks:
+            try:
+                callback()
+            except Exception:
+                log.exception("Reconnect handler failed")
+
+    def _dispatch(self, connection, pid: int, channel: str, payload: str) -> None:
+        for callback in self._callbacks.get(channel, ()):
+            try:
+                callback(payload)
+            except Exception:
+                log.exception("Notification handler for %r failed", channel)
@@ -0,0 +1,117 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import List, Literal, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+log = logging.getLogger(__name__)
+
+Routing = Literal["round_robin", "least_connections"]
+
+
+# Время последней записи клиента (unix-время сервера): ответ на запрос, который
+# что-то закоммитил, несет его в заголовке и cookie, клиент возвращает любым
+# из двух. Состояние у клиента, поэтому окно работает между воркерами и не
+# зависит от смены токена.
+LAST_WRITE_HEADER = "X-Last-Write"
+LAST_WRITE_COOKIE = "last_write"
+
+
+def last_write_at(header: Optional[str], cookie: Optional[str]) -> Optional[float]:
+    """Время последней записи из заголовка или cookie; None, если его нет или оно битое"""
+    for value in (header, cookie):
+        if not value:
+            continue
+        try:
+            return float(value)
+        except ValueError:
+            continue
+    return None
+
+
+class Replica:
+    def __init__(self, url: str, **engine_kwargs) -> None:
+        self.engine: AsyncEngine = create_async_engine(url=url, **engine_kwargs)
+        self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
+            bind=self.engine,
+            autoflush=False,
+            autocommit=False,
+            expire_on_commit=False,
+        )
+        self.name = self.engine.url.render_as_string(hide_password=True)
+        self.healthy = True
+        # Сессии, выданные сейчас; по ним выбирает least_connections
+        self.in_use = 0
+
+
+class ReplicaRouter:
+    """Выбор реплики для чтения
+
+    Реплики, не ответившие на проверку или упавшие на соединении, выводятся
+    из ротации до следующей успешной проверки; если здоровых не осталось,
+    читаем с основной базы. Клиент, который недавно писал, читает с основной
+    базы window секунд, чтобы увидеть свои изменения несмотря на отставание
+    реплик.
+    """
+
+    def __init__(
+        self,
+        replicas: Sequence[Replica],
+        routing: Routing = "round_robin",
+        window: float = 5.0,
+        health_timeout: float = 1.0,
+    ) -> None:
+        self.replicas: List[Replica] = list(replicas)
+        self.routing = routing
+        self.health_timeout = health_timeout
+        self.window = window
+        self._counter = itertools.count()
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self, last_write: Optional[float] = None) -> Optional[Replica]:
+        """Реплика для чтения или None, если читать нужно с основной базы"""
+        if last_write is not None:
+            age = time.time() - last_write
+            # Время из будущего - подделка или чужие часы, его не учитываем
+            if -1.0 <= age < self.window:
+                return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.routing == "least_connections":
+            return min(healthy, key=lambda replica: replica.in_use)
+        return healthy[next(self._counter) % len(healthy)]
+
+    def mark_down(self, replica: Replica) -> None:
+        if replica.healthy:
+            log.warning("Read replica %s is unavailable, routing reads elsewhere", replica.name)
+        replica.healthy = False
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica) -> None:
+        try:
+            async with asyncio.timeout(self.health_timeout):
+                async with replica.engine.connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+        except (DBAPIError, OSError, TimeoutError):
+            self.mark_down(replica)
+            return
+        if not replica.healthy:
+            log.info("Read replica %s is back", replica.name)
+        replica.healthy = True
+
+    async def dispose(self) -> None:
+        await asyncio.gather(*(replica.engine.dispose() for replica in self.replicas))
@@ -0,0 +1,90 @@
+"""Запуск приложения в проде: миграции один раз, затем N воркеров uvicorn.
+
+    python -m app.launcher
+
+Все параметры берутся из настроек (SERVER_*, DB_*), см. ServerSettings.
+"""
+
+import importlib.util
+import logging
+import os
+
+import uvicorn
+from alembic import command
+from alembic.config import Config
+
+from app.core.config import settings
+
+log = logging.getLogger("app.launcher")
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic.ini")
+
+
+def resolve_workers() -> int:
+    workers = settings.server.workers or os.cpu_count() or 1
+    max_connections = settings.db.max_connections
+    if max_connections and workers > max_connections:
+        # Каждому воркеру нужно хотя бы одно соединение
+        log.warning(
+            "%s workers do not fit into DB_MAX_CONNECTIONS=%s, starting %s",
+            workers,
+            max_connections,
+            max_connections,
+        )
+        return max_connections
+    return workers
+
+
+def resolve_implementation(requested: str, fast: str, fallback: str) -> str:
+    """auto выбирает быструю реализацию, только если пакет установлен"""
+    if requested != "auto":
+        return requested
+    return fast if importlib.util.find_spec(fast) else fallback
+
+
+def run_migrations() -> None:
+    # env.py берет адрес базы из DB_URL, по умолчанию тот же, что у приложения
+    os.environ.setdefault("DB_URL", settings.db.url)
+    config = Config(ALEMBIC_INI)
+    # Логирование уже настроено, fileConfig из env.py его бы заменил
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head")
+
+
+def main() -> None:
+    logging.basicConfig(level=settings.server.log_level.upper())
+    workers = resolve_workers()
+    # Воркеры заново читают настройки из окружения: так они знают свое число
+    # и делят между собой DB_MAX_CONNECTIONS
+    os.environ["SERVER_WORKERS"] = str(workers)
+
+    if settings.server.migrate:
+        log.info("Applying migrations")
+        run_migrations()
+
+    loop = resolve_implementation(settings.server.loop, "uvloop", "asyncio")
+    http = resolve_implementation(settings.server.http, "httptools", "h11")
+    pool_size, max_overflow = settings.db.pool_limits(workers)
+    log.info(
+        "Starting %s workers (loop=%s, http=%s), DB pool %s+%s per worker",
+        workers,
+        loop,
+        http,
+        pool_size,
+        max_overflow,
+    )
+    uvicorn.run(
+        "main:app",
+        host=settings.server.host,
+        port=settings.server.port,
+        workers=workers,
+        loop=loop,
+        http=http,
+        backlog=settings.server.backlog,
+        timeout_keep_alive=settings.server.keep_alive,
+        log_level=settings.server.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -20,6 +20,8 @@ class ChatUpdate(BaseModel):
 class ChatInDBBase(ChatBase):
     id: int
     user_id: int
+    message_count: int = 0
+    last_message_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
 
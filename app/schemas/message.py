@@ -7,6 +7,11 @@ from enum import Enum
 from app.db.models.message import MessageSender, MessageStatus
 
 
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+
 class MessageBase(BaseModel):
     text: str
     chat_id: int
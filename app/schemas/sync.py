@@ -0,0 +1,16 @@
+from typing import List
+from pydantic import BaseModel
+from app.schemas.chat import ChatRead
+from app.schemas.message import MessageRead
+
+
+class SyncResponse(BaseModel):
+    """Изменения с прошлого sync; next_token передается в следующий запрос"""
+
+    chats: List[ChatRead] = []
+    messages: List[MessageRead] = []
+    deleted_chat_ids: List[int] = []
+    deleted_message_ids: List[int] = []
+    next_token: str
+    # Есть еще изменения сообщений: сразу запросить sync с next_token
+    has_more: bool = False
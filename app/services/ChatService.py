@@ -1,7 +1,9 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import Chat
-from app.schemas.chat import ChatCreate, ChatUpdate
+from app.schemas.chat import ChatCreate, ChatRead, ChatUpdate
 from app.crud.CRUDChat import crud_chat
 
 
@@ -14,10 +16,35 @@ class ChatService:
             db, user_id=user_id, skip=skip, limit=limit
         )
 
+    @staticmethod
+    async def get_user_chat_rows(
+        db: AsyncSession, user_id: int, skip: int = 0, limit: int = 100
+    ) -> List[Row]:
+        """Чаты пользователя строками с полями ChatRead, для ответа без валидации"""
+        return await crud_chat.get_rows_by_user_id(
+            db,
+            user_id=user_id,
+            columns=crud_chat.columns_for(ChatRead),
+            skip=skip,
+            limit=limit,
+        )
+
     @staticmethod
     async def get_chat(db: AsyncSession, chat_id: int) -> Optional[Chat]:
         return await crud_chat.get(db, chat_id)
 
+    @staticmethod
+    async def get_user_chats_version(
+        db: AsyncSession, user_id: int
+    ) -> Tuple[int, Optional[datetime]]:
+        return await crud_chat.get_list_version(db, user_id=user_id)
+
+    @staticmethod
+    async def get_chat_version(
+        db: AsyncSession, chat_id: int
+    ) -> Optional[Tuple[int, datetime]]:
+        return await crud_chat.get_version(db, chat_id)
+
     @staticmethod
     async def create_chat(db: AsyncSession, chat_create: ChatCreate) -> Chat:
         return await crud_chat.create_with_user(db, obj_in=chat_create)
@@ -35,6 +62,24 @@ class ChatService:
     async def delete_chat(db: AsyncSession, chat_id: int) -> Optional[Chat]:
         return await crud_chat.remove(db, id=chat_id)
 
+    @staticmethod
+    async def get_chat_owner_id(db: AsyncSession, chat_id: int) -> Optional[int]:
+        return await crud_chat.get_owner_id(db, chat_id)
+
+    @staticmethod
+    async def update_user_chat(
+        db: AsyncSession, chat_id: int, user_id: int, chat_update: ChatUpdate
+    ) -> Optional[Chat]:
+        return await crud_chat.update_owned(
+            db, chat_id=chat_id, user_id=user_id, obj_in=chat_update
+        )
+
+    @staticmethod
+    async def delete_user_chat(
+        db: AsyncSession, chat_id: int, user_id: int
+    ) -> Optional[Chat]:
+        return await crud_chat.remove_owned(db, chat_id=chat_id, user_id=user_id)
+
     @staticmethod
     async def get_chat_with_messages(db: AsyncSession, chat_id: int) -> Optional[Chat]:
         return await crud_chat.get_with_messages(db, chat_id)
@@ -1,22 +1,90 @@
 # app/services/MessageService.py
-from typing import List, Optional
+import json
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+import anyio
+from sqlalchemy import Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import Message
+from app.core.config import settings
+from app.core.jobs import job_queue
+from app.db.database import db_helper
+from app.db.models import Chat, Message
 from app.schemas.message import (
     MessageCreate,
+    MessageRead,
+    MessageSender,
     MessageUpdate,
     MessageStatus,
-    MessageSender,
+    SortOrder,
 )
 from app.crud.CRUDMessage import crud_message
+from app.utils.yandex_gpt.ContextBuilder import (
+    ContextBuilder,
+    ContextEntry,
+    estimate_tokens,
+)
+from app.utils.cache import TTLCache
+from app.utils.yandex_gpt.FakeAgent import FakeAgent
+from app.utils.yandex_gpt.ResponseCache import CachingAgent, DatabaseResponseCache
 from app.utils.yandex_gpt.YandexAgent import YandexAgent
 from app.crud.CRUDChat import crud_chat
 from app.schemas.chat import ChatUpdate
+from app.utils.job_queue import JobQueueFull
+from app.utils.metrics import metrics
+from app.utils.pagination import Cursor
+
+
+log = logging.getLogger(__name__)
+
+AI_ERROR_TEXT = "Извините, произошла ошибка при генерации ответа"
+
+title_generation_skipped = metrics.counter(
+    "chat_title_generation_skipped_total",
+    "Chat title LLM calls skipped because the chat already has a title",
+)
 
 
 class MessageService:
     def __init__(self):
-        self.agent = YandexAgent()
+        self._agent = None
+        self.context = ContextBuilder(
+            loader=self._load_context_window,
+            window_size=settings.gpt.context_window_messages,
+            token_budget=settings.gpt.context_token_budget,
+            max_chats=settings.gpt.context_cache_chats,
+            ttl=settings.gpt.context_cache_ttl,
+            system_prompt=settings.gpt.system_prompt,
+        )
+        crud_message.add_listener(self._on_message_saved)
+        job_queue.register(
+            "generate_reply", self._generate_reply_job, on_failure=self._fail_reply_job
+        )
+        job_queue.register("update_chat_title", self._update_chat_title_job)
+
+    @property
+    def agent(self):
+        """Клиент модели создается при первом обращении, а не при импорте"""
+        if self._agent is None:
+            self._agent = self._create_agent()
+        return self._agent
+
+    @staticmethod
+    def _create_agent():
+        agent = FakeAgent() if settings.gpt.fake else YandexAgent()
+        if settings.gpt.cache_enabled:
+            shared = (
+                DatabaseResponseCache(db_helper.session_factory)
+                if settings.gpt.cache_backend == "database"
+                else None
+            )
+            agent = CachingAgent(
+                agent,
+                local=TTLCache(settings.gpt.cache_size, settings.gpt.cache_ttl),
+                shared=shared,
+            )
+        return agent
 
     async def get_chat_messages(
         self, db: AsyncSession, chat_id: int, skip: int = 0, limit: int = 100
@@ -32,14 +100,71 @@ class MessageService:
         user_id: int,
         skip: int = 0,
         limit: int = 100,
+        order: SortOrder = SortOrder.DESC,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
     ) -> List[Message]:
         return await crud_message.get_by_chat_id_and_user(
-            db, chat_id=chat_id, user_id=user_id, skip=skip, limit=limit
+            db,
+            chat_id=chat_id,
+            user_id=user_id,
+            skip=skip,
+            limit=limit,
+            order=order,
+            before=before,
+            after=after,
         )
 
+    async def get_user_chat_message_rows(
+        self,
+        db: AsyncSession,
+        chat_id: int,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        order: SortOrder = SortOrder.DESC,
+        before: Optional[Cursor] = None,
+        after: Optional[Cursor] = None,
+    ) -> List[Row]:
+        """Страница истории строками с полями MessageRead, для ответа без валидации"""
+        return await crud_message.get_rows_by_chat_id_and_user(
+            db,
+            chat_id=chat_id,
+            user_id=user_id,
+            columns=crud_message.columns_for(MessageRead),
+            skip=skip,
+            limit=limit,
+            order=order,
+            before=before,
+            after=after,
+        )
+
+    async def get_user_chat_messages_version(
+        self, db: AsyncSession, chat_id: int, user_id: int
+    ) -> Optional[Tuple[int, datetime]]:
+        return await crud_message.get_chat_version(db, chat_id=chat_id, user_id=user_id)
+
+    async def stream_chat_messages(
+        self, db: AsyncSession, chat_id: int, order: SortOrder = SortOrder.ASC
+    ) -> AsyncIterator[Message]:
+        async for message in crud_message.stream_by_chat_id(
+            db, chat_id=chat_id, order=order
+        ):
+            yield message
+
     async def get_message(self, db: AsyncSession, message_id: int) -> Optional[Message]:
         return await crud_message.get(db, message_id)
 
+    async def get_message_with_owner(
+        self, db: AsyncSession, message_id: int
+    ) -> Optional[Tuple[Message, int]]:
+        return await crud_message.get_with_owner(db, message_id)
+
+    async def get_message_owner_id(
+        self, db: AsyncSession, message_id: int
+    ) -> Optional[int]:
+        return await crud_message.get_owner_id(db, message_id)
+
     async def create_message(
         self, db: AsyncSession, message_create: MessageCreate, user_id: int
     ) -> Optional[Message]:
@@ -50,63 +175,233 @@ class MessageService:
         if not user_message:
             return None
 
-        # Try update chat title based on user's new message (best-effort)
-        await self._update_chat_title(db, chat_id=message_create.chat_id, user_text=message_create.text)
-
-        await self._generate_ai_response(
-            db, message_create.text, message_create.chat_id
+        # Ответ бота появится позже: сразу отдаем заготовку в статусе SENDING
+        bot_message = await crud_message.create_bot_message(
+            db,
+            chat_id=message_create.chat_id,
+            user_id=user_id,
+            text="",
+            status=MessageStatus.SENDING,
         )
 
+        try:
+            await job_queue.enqueue(
+                "generate_reply",
+                {
+                    "chat_id": message_create.chat_id,
+                    "user_message_id": user_message.id,
+                    "bot_message_id": bot_message.id,
+                },
+                key=f"chat:{message_create.chat_id}",
+            )
+        except JobQueueFull:
+            log.warning("Job queue is full, reply for chat %s dropped", message_create.chat_id)
+            await crud_message.update_text(
+                db,
+                message_id=bot_message.id,
+                text=AI_ERROR_TEXT,
+                status=MessageStatus.ERROR,
+            )
+            return user_message
+
+        await self._enqueue_title_update(user_message)
         return user_message
 
-    async def _generate_ai_response(
-        self, db: AsyncSession, user_message: str, chat_id: int
-    ) -> Optional[Message]:
-        """Генерирует ответ от нейросети и сохраняет в базу"""
-        try:
-            ai_response_text = await self.agent.async_call(user_message)
+    @staticmethod
+    def _to_context_entry(message: Message) -> Optional[ContextEntry]:
+        # Заготовки и ошибки бота модели не показываем
+        if message.status not in (MessageStatus.DELIVERED, MessageStatus.SENT):
+            return None
+        return ContextEntry(
+            id=message.id,
+            role="user" if message.sender == MessageSender.USER else "assistant",
+            text=message.text,
+            tokens=estimate_tokens(message.text, settings.gpt.context_chars_per_token),
+        )
 
-            ai_message = Message(
-                text=ai_response_text,
-                chat_id=chat_id,
-                status=MessageStatus.DELIVERED,
-                sender=MessageSender.BOT,
+    async def _load_context_window(self, chat_id: int, limit: int) -> List[ContextEntry]:
+        async with db_helper.session_factory() as session:
+            messages = await crud_message.get_latest_by_chat_id(
+                session, chat_id=chat_id, limit=limit
             )
+        entries = (self._to_context_entry(message) for message in reversed(messages))
+        return [entry for entry in entries if entry is not None]
 
-            db.add(ai_message)
-            await db.commit()
-            await db.refresh(ai_message)
-            return ai_message
+    def _on_message_saved(self, message: Message, deleted: bool) -> None:
+        if deleted:
+            self.context.invalidate(message.chat_id)
+        else:
+            self.context.apply(
+                message.chat_id, message.id, self._to_context_entry(message)
+            )
 
-        except Exception as e:
-            # Логируем ошибку
-            print(f"Error generating AI response: {e}")
+    async def _generate_reply_job(
+        self, chat_id: int, user_message_id: int, bot_message_id: int
+    ) -> None:
+        """Задача очереди: получить ответ нейросети и записать его в заготовку бота"""
+        context = await self.context.build(chat_id, up_to_id=user_message_id)
+        ai_response_text = await self.agent.async_call(context)
+
+        async with db_helper.session_factory() as session:
+            await crud_message.update_text(
+                session,
+                message_id=bot_message_id,
+                text=ai_response_text,
+                status=MessageStatus.DELIVERED,
+            )
 
-            # Создаем сообщение об ошибке
-            error_message = Message(
-                text="Извините, произошла ошибка при генерации ответа",
-                chat_id=chat_id,
+    async def _fail_reply_job(
+        self, chat_id: int, user_message_id: int, bot_message_id: int
+    ) -> None:
+        """Все попытки исчерпаны: помечаем ответ бота ошибкой"""
+        async with db_helper.session_factory() as session:
+            await crud_message.update_text(
+                session,
+                message_id=bot_message_id,
+                text=AI_ERROR_TEXT,
                 status=MessageStatus.ERROR,
-                sender=MessageSender.BOT,
             )
 
-            db.add(error_message)
-            await db.commit()
-            await db.refresh(error_message)
-            return error_message
+    async def _enqueue_title_update(self, user_message: Message) -> None:
+        # Свой ключ: название генерируется параллельно с ответом, а не после него
+        try:
+            await job_queue.enqueue(
+                "update_chat_title",
+                {
+                    "chat_id": user_message.chat_id,
+                    "user_message_id": user_message.id,
+                    "user_text": user_message.text,
+                },
+                key=f"chat-title:{user_message.chat_id}",
+            )
+        except JobQueueFull:
+            log.warning("Job queue is full, title update for chat %s skipped", user_message.chat_id)
+
+    async def _update_chat_title_job(
+        self, chat_id: int, user_message_id: int, user_text: str
+    ) -> None:
+        """Задача очереди: название генерируется только по первому сообщению
+        или пока у чата стоит название по умолчанию"""
+        async with db_helper.session_factory() as session:
+            chat = await crud_chat.get(session, chat_id)
+            if not chat:
+                return
+
+            if chat.title not in settings.chat.default_titles and (
+                await crud_message.has_user_messages_before(
+                    session, chat_id=chat_id, message_id=user_message_id
+                )
+            ):
+                title_generation_skipped.inc()
+                return
+
+            await self._update_chat_title(session, chat=chat, user_text=user_text)
+
+    async def start_stream(
+        self, db: AsyncSession, message_create: MessageCreate, user_id: int
+    ) -> Optional[Tuple[Message, Message]]:
+        """Сохранить сообщение пользователя и заготовку ответа бота в статусе SENDING"""
+        user_message = await crud_message.create_with_chat_check(
+            db, obj_in=message_create, user_id=user_id
+        )
+
+        if not user_message:
+            return None
+
+        bot_message = await crud_message.create_bot_message(
+            db,
+            chat_id=message_create.chat_id,
+            user_id=user_id,
+            text="",
+            status=MessageStatus.SENDING,
+        )
+
+        await self._enqueue_title_update(user_message)
+        return user_message, bot_message
+
+    async def stream_ai_response(
+        self, bot_message: Message, user_message: Message
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """Потоковая генерация ответа: отдает пары (событие, JSON) для SSE
+
+        Частичный текст периодически сохраняется в сообщение бота, в конце
+        статус меняется на DELIVERED или ERROR. Если клиент отключился,
+        сохраняется то, что успели сгенерировать. Если сообщение бота удалили,
+        генерация останавливается и стрим заканчивается событием error.
+        """
+        flush_chars = settings.gpt.stream_flush_chars
+        flush_interval = settings.gpt.stream_flush_interval
+
+        text = ""
+        status = MessageStatus.ERROR
+        try:
+            async with db_helper.session_factory() as session:
+                flushed = 0
+                last_flush = time.monotonic()
+                context = await self.context.build(
+                    bot_message.chat_id, up_to_id=user_message.id
+                )
+                async for delta in self.agent.async_stream(context):
+                    text += delta
+                    yield "token", json.dumps(
+                        {"id": bot_message.id, "text": delta}, ensure_ascii=False
+                    )
+
+                    if (
+                        len(text) - flushed >= flush_chars
+                        or time.monotonic() - last_flush >= flush_interval
+                    ):
+                        if not await crud_message.update_text(
+                            session, message_id=bot_message.id, text=text
+                        ):
+                            # Сообщение удалили во время генерации: сохранять некуда
+                            break
+                        flushed = len(text)
+                        last_flush = time.monotonic()
+            status = MessageStatus.DELIVERED
+        except Exception:
+            log.exception("Error streaming AI response for chat %s", bot_message.chat_id)
+        finally:
+            # Ошибка или отключение клиента (отмена, закрытие генератора): сессия
+            # стрима могла остаться в сломанной транзакции или закрываться,
+            # поэтому итог пишется в новой сессии и не прерывается отменой
+            if status == MessageStatus.ERROR:
+                text = text or AI_ERROR_TEXT
+            with anyio.CancelScope(shield=True):
+                async with db_helper.session_factory() as session:
+                    message = await crud_message.update_text(
+                        session, message_id=bot_message.id, text=text, status=status
+                    )
+
+        if message is None:
+            yield "error", json.dumps(
+                {
+                    "id": bot_message.id,
+                    "chat_id": bot_message.chat_id,
+                    "detail": "Message was deleted",
+                }
+            )
+            return
+        event = "done" if status == MessageStatus.DELIVERED else "error"
+        yield event, MessageRead.model_validate(message).model_dump_json()
 
     async def update_message(
-        self, db: AsyncSession, message_id: int, message_update: MessageUpdate
+        self,
+        db: AsyncSession,
+        message_id: int,
+        user_id: int,
+        message_update: MessageUpdate,
     ) -> Optional[Message]:
-        message = await crud_message.get(db, message_id)
-        if message:
-            return await crud_message.update(db, db_obj=message, obj_in=message_update)
-        return None
+        return await crud_message.update_owned(
+            db, message_id=message_id, user_id=user_id, obj_in=message_update
+        )
 
     async def delete_message(
-        self, db: AsyncSession, message_id: int
+        self, db: AsyncSession, message_id: int, user_id: int
     ) -> Optional[Message]:
-        return await crud_message.remove(db, id=message_id)
+        return await crud_message.remove_owned(
+            db, message_id=message_id, user_id=user_id
+        )
 
     async def update_message_status(
         self, db: AsyncSession, message_id: int, status: MessageStatus
@@ -116,16 +411,18 @@ class MessageService:
         )
 
     async def get_latest_messages(
-        self, db: AsyncSession, chat_id: int, limit: int = 10
+        self, db: AsyncSession, chat_id: int, user_id: int, limit: int = 10
     ) -> List[Message]:
-        return await crud_message.get_latest_by_chat_id(
-            db, chat_id=chat_id, limit=limit
+        return await crud_message.get_latest_by_chat_id_and_user(
+            db, chat_id=chat_id, user_id=user_id, limit=limit
         )
 
-    async def get_message_count(self, db: AsyncSession, chat_id: int) -> int:
-        return await crud_message.get_count_by_chat_id(db, chat_id=chat_id)
+    async def get_message_count(
+        self, db: AsyncSession, chat_id: int, user_id: int
+    ) -> Optional[int]:
+        return await crud_chat.get_message_count(db, chat_id=chat_id, user_id=user_id)
 
-    async def _update_chat_title(self, db: AsyncSession, chat_id: int, user_text: str) -> None:
+    async def _update_chat_title(self, db: AsyncSession, chat: Chat, user_text: str) -> None:
         """Generate a concise chat title from the user's message and update the chat.
 
         Best-effort: swallow errors to not block message creation.
@@ -145,10 +442,10 @@ class MessageService:
             if len(title) > max_len:
                 title = title[:max_len].rstrip()
 
-            await crud_chat.update(db, db_obj=await crud_chat.get(db, chat_id), obj_in=ChatUpdate(title=title))
+            await crud_chat.update(db, db_obj=chat, obj_in=ChatUpdate(title=title))
         except Exception as e:
             # Best-effort: log and continue
-            print(f"Error updating chat title for chat {chat_id}: {e}")
+            print(f"Error updating chat title for chat {chat.id}: {e}")
 
 
 message_service = MessageService()
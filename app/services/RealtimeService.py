@@ -0,0 +1,94 @@
+import json
+
+from app.core.config import settings
+from app.crud.CRUDChat import crud_chat
+from app.crud.CRUDMessage import crud_message
+from app.db.database import db_helper
+from app.db.models import Chat, Message
+from app.db.notify import PgNotifier
+from app.schemas.chat import ChatRead
+from app.schemas.message import MessageRead
+from app.utils.pubsub import (
+    LocalPubSubBackend,
+    PostgresPubSubBackend,
+    PubSubHub,
+    Subscription,
+)
+
+# Запас под обертку события до лимита NOTIFY в 8000 байт; размер считается
+# уже в обертке, где событие - строка JSON и кавычки экранируются второй раз
+MAX_EVENT_BYTES = 7000
+
+
+def chat_topic(chat_id: int) -> str:
+    return f"chat:{chat_id}"
+
+
+class RealtimeService:
+    """События чатов для WebSocket-клиентов
+
+    Сохраненные (уже закоммиченные) сообщения и изменения чатов приходят из
+    слушателей CRUD и раздаются подписчикам темы чата. События:
+    message (новое сообщение или смена текста/статуса), message_deleted,
+    chat (изменение названия), chat_deleted и resync.
+    """
+
+    def __init__(self, hub: PubSubHub) -> None:
+        self.hub = hub
+        crud_message.add_listener(self._on_message_saved)
+        crud_chat.add_listener(self._on_chat_saved)
+
+    async def start(self) -> None:
+        await self.hub.start()
+
+    async def close(self) -> None:
+        await self.hub.close()
+
+    def subscribe(self, chat_id: int) -> Subscription:
+        return self.hub.subscribe(chat_topic(chat_id))
+
+    @staticmethod
+    def message_event(message: Message) -> str:
+        data = MessageRead.model_validate(message).model_dump(mode="json")
+        event = json.dumps({"type": "message", "message": data}, ensure_ascii=False)
+        if len(json.dumps(event, ensure_ascii=False).encode()) <= MAX_EVENT_BYTES:
+            return event
+        # Длинный текст клиент дочитает через GET /messages/{id}
+        data["text"] = None
+        return json.dumps(
+            {"type": "message", "message": data, "truncated": True}, ensure_ascii=False
+        )
+
+    def _on_message_saved(self, message: Message, deleted: bool) -> None:
+        topic = chat_topic(message.chat_id)
+        if not self.hub.wants(topic):
+            return
+        if deleted:
+            event = json.dumps(
+                {"type": "message_deleted", "id": message.id, "chat_id": message.chat_id}
+            )
+        else:
+            event = self.message_event(message)
+        self.hub.publish(topic, event)
+
+    def _on_chat_saved(self, chat: Chat, deleted: bool) -> None:
+        topic = chat_topic(chat.id)
+        if not self.hub.wants(topic):
+            return
+        if deleted:
+            event = json.dumps({"type": "chat_deleted", "id": chat.id})
+        else:
+            data = ChatRead.model_validate(chat).model_dump(mode="json")
+            event = json.dumps({"type": "chat", "chat": data}, ensure_ascii=False)
+        self.hub.publish(topic, event)
+
+
+def create_pubsub_backend():
+    if settings.realtime.backend == "postgres":
+        return PostgresPubSubBackend(PgNotifier(db_helper.engine))
+    return LocalPubSubBackend()
+
+
+realtime_service = RealtimeService(
+    PubSubHub(backend=create_pubsub_backend(), queue_size=settings.realtime.queue_size)
+)
@@ -0,0 +1,126 @@
+import logging
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.crud.CRUDChat import crud_chat
+from app.crud.CRUDMessage import crud_message
+from app.crud.CRUDTombstone import crud_tombstone
+from app.db.database import db_helper
+from app.db.maintenance import delete_in_batches
+from app.db.models import Message, Tombstone
+from app.db.models.tombstone import TombstoneEntity
+from app.schemas.sync import SyncResponse
+from app.utils.pagination import Cursor, SyncToken, encode_sync_token
+
+
+log = logging.getLogger(__name__)
+
+
+class SyncService:
+    """Инкрементальная синхронизация клиента: что изменилось с прошлого токена
+
+    Токен хранит watermark - момент (по часам базы, с перекрытием), с
+    которого начнется следующий sync, и у страниц с has_more позицию
+    (updated_at, id) в изменениях сообщений. Изменения отдаются начиная с
+    watermark включительно, поэтому повторы возможны, а пропуски нет:
+    клиент применяет изменения по id.
+    """
+
+    def __init__(
+        self, page_size: int, overlap_seconds: float, retention_days: int
+    ) -> None:
+        self.page_size = page_size
+        self.overlap = timedelta(seconds=overlap_seconds)
+        self.retention = timedelta(days=retention_days)
+
+    async def get_changes(
+        self, db: AsyncSession, user_id: int, since: Optional[SyncToken] = None
+    ) -> Optional[SyncResponse]:
+        """Изменения пользователя после since; без since - полная выгрузка
+
+        None - токен старше срока хранения следов удалений, нужна полная
+        синхронизация.
+        """
+        if since is not None and since.position is not None:
+            return await self._next_page(db, user_id, since)
+
+        # Часы базы, а не процесса: с ними сравниваются updated_at строк.
+        # Транзакция, начатая до now, может закоммитить строку с updated_at
+        # меньше now уже после ответа; перекрытие ловит ее следующим sync
+        now = (await db.execute(select(func.localtimestamp()))).scalar_one()
+        watermark = now - self.overlap
+        full = since is None
+        start = datetime.min if full else since.watermark
+        if not full and start < now - self.retention:
+            return None
+
+        messages, next_token, has_more = await self._messages_page(
+            db, user_id, Cursor(created_at=start, id=0), watermark
+        )
+        # Чаты и удаления не листаются: они отдаются на первой странице, а
+        # изменения за время листания придут в следующий sync от watermark
+        chats = await crud_chat.get_changed_since(db, user_id, start)
+        response = SyncResponse(
+            chats=chats, messages=messages, next_token=next_token, has_more=has_more
+        )
+        if full:
+            # Клиенту без состояния удалять нечего
+            return response
+
+        for tombstone in await crud_tombstone.get_since(
+            db, user_id=user_id, since=start
+        ):
+            if tombstone.entity == TombstoneEntity.CHAT:
+                response.deleted_chat_ids.append(tombstone.entity_id)
+            else:
+                response.deleted_message_ids.append(tombstone.entity_id)
+        return response
+
+    async def _next_page(
+        self, db: AsyncSession, user_id: int, token: SyncToken
+    ) -> SyncResponse:
+        """Следующая страница сообщений той же синхронизации
+
+        Срок хранения здесь не проверяется: листание полной выгрузки идет по
+        старым сообщениям, а watermark проверит следующий sync.
+        """
+        messages, next_token, has_more = await self._messages_page(
+            db, user_id, token.position, token.watermark
+        )
+        return SyncResponse(messages=messages, next_token=next_token, has_more=has_more)
+
+    async def _messages_page(
+        self, db: AsyncSession, user_id: int, after: Cursor, watermark: datetime
+    ) -> Tuple[List[Message], str, bool]:
+        """Страница изменений сообщений после after и токен следующей"""
+        messages = await crud_message.get_changed_since(
+            db, user_id, after=after, limit=self.page_size + 1
+        )
+        has_more = len(messages) > self.page_size
+        messages = messages[: self.page_size]
+        position = None
+        if has_more:
+            position = Cursor(created_at=messages[-1].updated_at, id=messages[-1].id)
+        return messages, encode_sync_token(SyncToken(watermark, position)), has_more
+
+    async def prune_tombstones(self) -> int:
+        """Удалить следы удалений старше срока хранения"""
+        cutoff = func.localtimestamp() - self.retention
+        deleted = await delete_in_batches(
+            db_helper.session_factory,
+            Tombstone.id,
+            Tombstone.deleted_at < cutoff,
+            batch_size=settings.sync.prune_batch_size,
+        )
+        if deleted:
+            log.info("Pruned %s expired tombstones", deleted)
+        return deleted
+
+
+sync_service = SyncService(
+    page_size=settings.sync.page_size,
+    overlap_seconds=settings.sync.overlap_seconds,
+    retention_days=settings.sync.tombstone_retention_days,
+)
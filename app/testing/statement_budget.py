@@ -0,0 +1,44 @@
+"""Плагин pytest: тест падает, если эндпоинт превысил бюджет запросов к базе
+
+Подключение: ``pytest -p app.testing.statement_budget`` или
+``pytest_plugins = ["app.testing.statement_budget"]`` в conftest.py.
+Бюджеты объявляются декоратором statement_budget на маршрутах.
+Фикстура statement_counter считает запросы внутри блока теста:
+
+    def test_list(statement_counter):
+        with statement_counter() as stats:
+            ...
+        assert stats.statements <= 2
+"""
+
+from typing import List
+
+import pytest
+
+from app.db.instrumentation import BudgetExceeded, budget_listeners, count_statements
+
+
+@pytest.fixture
+def statement_counter():
+    return count_statements
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    exceeded: List[BudgetExceeded] = []
+    listener = exceeded.append
+    budget_listeners.append(listener)
+    try:
+        result = yield
+    finally:
+        budget_listeners.remove(listener)
+    if exceeded:
+        pytest.fail(
+            "SQL statement budget exceeded:\n"
+            + "\n".join(
+                f"  {entry.endpoint}: {entry.statements} statements, budget {entry.budget}"
+                for entry in exceeded
+            ),
+            pytrace=False,
+        )
+    return result
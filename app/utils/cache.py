@@ -0,0 +1,56 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, List, Optional, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """LRU-кеш в памяти процесса с ограничением размера и временем жизни записей"""
+
+    def __init__(self, max_size: int = 1000, ttl: float = 300.0) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[K, Tuple[float, V]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: K) -> Optional[V]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None) -> None:
+        """Сохранить значение; ttl меньше стандартного сокращает жизнь записи"""
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        self._data[key] = (time.monotonic() + lifetime, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K) -> Optional[V]:
+        item = self._data.pop(key, None)
+        return None if item is None else item[1]
+
+    def items(self) -> List[Tuple[K, V]]:
+        """Живые записи (снимок, кеш можно менять во время обхода)"""
+        now = time.monotonic()
+        return [
+            (key, value)
+            for key, (expires_at, value) in list(self._data.items())
+            if expires_at > now
+        ]
+
+    def clear(self) -> None:
+        self._data.clear()
@@ -0,0 +1,45 @@
+import importlib.util
+import zlib
+from typing import Optional, Tuple
+
+from app.utils.negotiation import negotiate
+
+# brotli - необязательная зависимость; без него сжимаем только gzip
+if importlib.util.find_spec("brotli"):
+    import brotli
+
+    ENCODINGS: Tuple[str, ...] = ("br", "gzip")
+else:
+    ENCODINGS = ("gzip",)
+
+
+class GzipCompressor:
+    def __init__(self, level: int) -> None:
+        # wbits 31 - формат gzip (заголовок и контрольная сумма)
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        """Сжать фрагмент; не final - сбросить сжатое, чтобы клиент получил его сразу"""
+        mode = zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH
+        return self._compressor.compress(data) + self._compressor.flush(mode)
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int) -> None:
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        chunk = self._compressor.process(data)
+        if final:
+            return chunk + self._compressor.finish()
+        return chunk + self._compressor.flush()
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    return negotiate(accept_encoding, ENCODINGS)
+
+
+def new_compressor(encoding: str, gzip_level: int, brotli_quality: int):
+    if encoding == "br":
+        return BrotliCompressor(brotli_quality)
+    return GzipCompressor(gzip_level)
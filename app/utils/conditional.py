@@ -0,0 +1,71 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Optional, Sequence
+
+from fastapi import Request, Response, status
+
+
+def make_etag(*parts: Any) -> str:
+    """Сильный ETag из версии данных и параметров запроса"""
+    raw = "|".join("" if part is None else str(part) for part in parts)
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # В базе время без зоны, now() пишет его в UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(_as_utc(value).replace(microsecond=0), usegmt=True)
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime] = None
+) -> bool:
+    """Можно ли ответить 304 по If-None-Match / If-Modified-Since
+
+    If-Modified-Since учитывается, только если If-None-Match нет (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    # Дата в заголовке с точностью до секунды
+    return _as_utc(last_modified).replace(microsecond=0) <= since
+
+
+def set_validators(
+    response: Response, etag: str, last_modified: Optional[datetime] = None
+) -> None:
+    response.headers["ETag"] = etag
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified(
+    etag: str, last_modified: Optional[datetime] = None, vary: Sequence[str] = ()
+) -> Response:
+    """Ответ 304 с теми же валидаторами и Vary, что у полного ответа
+
+    Vary по Accept-Encoding и слабый ETag при сжатии добавляет
+    CompressionMiddleware, как и полному ответу.
+    """
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    set_validators(response, etag, last_modified)
+    for header in vary:
+        response.headers.add_vary_header(header)
+    return response
@@ -0,0 +1,199 @@
+import asyncio
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import delete, exists, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import aliased
+
+from app.db.models import Job as JobRow
+from app.db.models.job import JobStatus
+
+
+class JobQueueFull(Exception):
+    """Очередь переполнена и не освободилась за отведенное время"""
+
+
+@dataclass
+class Job:
+    kind: str
+    payload: Dict[str, Any]
+    key: Optional[str] = None
+    id: Optional[int] = None
+    attempts: int = field(default=0, compare=False)
+
+
+class JobBackend(ABC):
+    """Хранилище задач, из которого JobQueue раздает работу воркерам"""
+
+    # Переживают ли задачи рестарт процесса (тогда при остановке их не дожидаемся)
+    durable: bool = False
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def put(self, job: Job, timeout: Optional[float] = None) -> None:
+        """Положить задачу, JobQueueFull если места нет дольше timeout"""
+
+    @abstractmethod
+    async def get(self) -> Job:
+        """Дождаться следующей задачи"""
+
+    @abstractmethod
+    async def ack(self, job: Job) -> None:
+        """Задача выполнена"""
+
+    @abstractmethod
+    async def fail(self, job: Job, error: str) -> None:
+        """Задача окончательно упала после всех попыток"""
+
+    @abstractmethod
+    def qsize(self) -> int:
+        """Сколько задач ждет выполнения (для durable - приблизительно)"""
+
+
+class InMemoryJobBackend(JobBackend):
+    def __init__(self, max_size: int = 1000) -> None:
+        self._queue: asyncio.Queue[Job] = asyncio.Queue(maxsize=max_size)
+
+    async def put(self, job: Job, timeout: Optional[float] = None) -> None:
+        try:
+            await asyncio.wait_for(self._queue.put(job), timeout)
+        except asyncio.TimeoutError:
+            raise JobQueueFull(f"Job queue is full ({self._queue.maxsize} jobs)")
+
+    async def get(self) -> Job:
+        return await self._queue.get()
+
+    async def ack(self, job: Job) -> None:
+        self._queue.task_done()
+
+    async def fail(self, job: Job, error: str) -> None:
+        self._queue.task_done()
+
+    def qsize(self) -> int:
+        return self._queue.qsize()
+
+
+class DatabaseJobBackend(JobBackend):
+    """Очередь в таблице jobs: воркеры разных процессов разбирают ее через SKIP LOCKED"""
+
+    durable = True
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        max_size: int = 1000,
+        poll_interval: float = 0.5,
+        visibility_timeout: float = 300.0,
+    ) -> None:
+        self.session_factory = session_factory
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self._pending = 0
+
+    async def start(self) -> None:
+        # Задачи, захваченные упавшим процессом, возвращаем в очередь
+        async with self.session_factory() as session:
+            await session.execute(
+                update(JobRow)
+                .where(
+                    JobRow.status == JobStatus.RUNNING,
+                    JobRow.locked_at
+                    < func.now() - timedelta(seconds=self.visibility_timeout),
+                )
+                .values(status=JobStatus.PENDING, locked_at=None)
+            )
+            await session.commit()
+
+    async def put(self, job: Job, timeout: Optional[float] = None) -> None:
+        async with self.session_factory() as session:
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + (timeout or 0)
+            while True:
+                self._pending = (
+                    await session.execute(
+                        select(func.count())
+                        .select_from(JobRow)
+                        .where(JobRow.status == JobStatus.PENDING)
+                    )
+                ).scalar_one()
+                if self._pending < self.max_size:
+                    break
+                if loop.time() >= deadline:
+                    raise JobQueueFull(f"Job queue is full ({self.max_size} jobs)")
+                await session.rollback()
+                await asyncio.sleep(self.poll_interval)
+
+            row = JobRow(kind=job.kind, key=job.key, payload=job.payload)
+            session.add(row)
+            await session.commit()
+            job.id = row.id
+
+    def _claim_statement(self):
+        earlier = aliased(JobRow)
+        # Более ранняя незавершенная задача с тем же ключом блокирует следующие
+        blocked = exists().where(
+            earlier.key == JobRow.key,
+            earlier.id < JobRow.id,
+            earlier.status.in_([JobStatus.PENDING, JobStatus.RUNNING]),
+        )
+        candidate = (
+            select(JobRow.id)
+            .where(JobRow.status == JobStatus.PENDING, ~blocked)
+            .order_by(JobRow.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        return (
+            update(JobRow)
+            .where(JobRow.id == candidate)
+            .values(
+                status=JobStatus.RUNNING,
+                locked_at=func.now(),
+                attempts=JobRow.attempts + 1,
+            )
+            .returning(JobRow.id, JobRow.kind, JobRow.key, JobRow.payload, JobRow.attempts)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def get(self) -> Job:
+        statement = self._claim_statement()
+        while True:
+            async with self.session_factory() as session:
+                row = (await session.execute(statement)).one_or_none()
+                await session.commit()
+            if row is not None:
+                return Job(
+                    kind=row.kind,
+                    payload=row.payload,
+                    key=row.key,
+                    id=row.id,
+                    attempts=row.attempts,
+                )
+            await asyncio.sleep(self.poll_interval)
+
+    async def ack(self, job: Job) -> None:
+        async with self.session_factory() as session:
+            await session.execute(delete(JobRow).where(JobRow.id == job.id))
+            await session.commit()
+
+    async def fail(self, job: Job, error: str) -> None:
+        async with self.session_factory() as session:
+            await session.execute(
+                update(JobRow)
+                .where(JobRow.id == job.id)
+                .values(status=JobStatus.FAILED, last_error=error, locked_at=None)
+            )
+            await session.commit()
+
+    def qsize(self) -> int:
+        return self._pending
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from app.utils.job_queue.JobBackends import Job, JobBackend
+
+log = logging.getLogger(__name__)
+
+JobHandler = Callable[..., Awaitable[Any]]
+
+
+class JobQueue:
+    """Фоновая очередь задач с пулом воркеров
+
+    Задачи с одним ключом (например, один чат) выполняются строго по
+    очереди, разные ключи - параллельно в пределах concurrency. Пока задача
+    ключа выполняется или ждет повтора, следующие задачи ключа ждут в его
+    очереди, не занимая воркеров. Упавшая задача повторяется с
+    экспоненциальной задержкой и джиттером: на время задержки воркер
+    свободен, а ключ остается занятым, чтобы не нарушить порядок.
+    """
+
+    def __init__(
+        self,
+        backend: JobBackend,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        enqueue_timeout: Optional[float] = 1.0,
+    ) -> None:
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.enqueue_timeout = enqueue_timeout
+        self._handlers: Dict[str, JobHandler] = {}
+        self._failure_handlers: Dict[str, JobHandler] = {}
+        self._workers: List[asyncio.Task] = []
+        # start/stop из параллельных задач не должны поднять два набора воркеров
+        self._lifecycle_lock = asyncio.Lock()
+        # Занятые ключи и задачи, ждущие своей очереди по ключу
+        self._waiting: Dict[str, Deque[Job]] = {}
+        # Выполнение задач, включая повторы после задержки
+        self._slots = asyncio.Semaphore(concurrency)
+        self._retries: Set[asyncio.Task] = set()
+        # Задачи, взятые из хранилища и еще не выполненные окончательно
+        self._in_flight = 0
+
+    def register(
+        self,
+        kind: str,
+        handler: JobHandler,
+        on_failure: Optional[JobHandler] = None,
+    ) -> None:
+        """Зарегистрировать обработчик; on_failure вызывается после последней попытки"""
+        self._handlers[kind] = handler
+        if on_failure is not None:
+            self._failure_handlers[kind] = on_failure
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def start(self) -> None:
+        """Запустить воркеров; приложение вызывает при старте, enqueue - если забыли"""
+        async with self._lifecycle_lock:
+            if self._workers:
+                return
+            await self.backend.start()
+            self._workers = [
+                asyncio.create_task(self._worker(), name=f"job-worker-{idx}")
+                for idx in range(self.concurrency)
+            ]
+
+    async def stop(self, timeout: Optional[float] = None) -> None:
+        """Дождаться выполнения задач (не дольше timeout) и остановить воркеров"""
+        async with self._lifecycle_lock:
+            await self._stop(timeout)
+
+    async def _stop(self, timeout: Optional[float]) -> None:
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._drain(), timeout)
+        except asyncio.TimeoutError:
+            log.warning(
+                "Job queue stopped with %s jobs in flight and %s queued",
+                self._in_flight,
+                self.backend.qsize(),
+            )
+        tasks = [*self._workers, *self._retries]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._waiting.clear()
+        self._in_flight = 0
+        await self.backend.close()
+
+    async def enqueue(
+        self, kind: str, payload: Dict[str, Any], key: Optional[str] = None
+    ) -> Job:
+        """Поставить задачу в очередь; JobQueueFull, если очередь не освободилась вовремя"""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind!r}")
+        await self.start()
+        job = Job(kind=kind, payload=payload, key=key)
+        await self.backend.put(job, timeout=self.enqueue_timeout)
+        return job
+
+    async def _drain(self) -> None:
+        while self._in_flight or (not self.backend.durable and self.backend.qsize()):
+            await asyncio.sleep(0.05)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.backend.get()
+            self._in_flight += 1
+            if job.key is not None:
+                if job.key in self._waiting:
+                    # Ключ занят: задача дождется предыдущей, воркер свободен
+                    self._waiting[job.key].append(job)
+                    continue
+                self._waiting[job.key] = deque()
+            async with self._slots:
+                await self._process(job, attempt=0)
+
+    async def _process(self, job: Job, attempt: int) -> None:
+        """Выполнить задачу и следующие за ней по ключу, пока ни одна не ушла на повтор"""
+        while job is not None:
+            try:
+                if await self._attempt(job, attempt):
+                    return
+            except Exception:
+                log.exception("Job %s (%s) crashed the worker loop", job.id, job.kind)
+            job, attempt = self._next_for_key(job.key), 0
+
+    def _next_for_key(self, key: Optional[str]) -> Optional[Job]:
+        if key is None:
+            return None
+        waiting = self._waiting[key]
+        if waiting:
+            return waiting.popleft()
+        del self._waiting[key]
+        return None
+
+    async def _attempt(self, job: Job, attempt: int) -> bool:
+        """Одна попытка задачи; True - задача отложена на повтор"""
+        finished = True
+        try:
+            try:
+                await self._handlers[job.kind](**job.payload)
+            except Exception as e:
+                if attempt < self.max_retries:
+                    delay = self._backoff(attempt)
+                    log.warning(
+                        "Job %s (%s) failed, retry %s/%s in %.2fs: %s",
+                        job.id,
+                        job.kind,
+                        attempt + 1,
+                        self.max_retries,
+                        delay,
+                        e,
+                    )
+                    retry = asyncio.create_task(
+                        self._retry(job, attempt + 1, delay),
+                        name=f"job-retry-{job.id}",
+                    )
+                    self._retries.add(retry)
+                    retry.add_done_callback(self._retries.discard)
+                    finished = False
+                    return True
+
+                log.exception("Job %s (%s) failed permanently", job.id, job.kind)
+                await self.backend.fail(job, repr(e))
+                on_failure = self._failure_handlers.get(job.kind)
+                if on_failure is not None:
+                    await on_failure(**job.payload)
+                return False
+
+            await self.backend.ack(job)
+            return False
+        finally:
+            if finished:
+                self._in_flight -= 1
+
+    async def _retry(self, job: Job, attempt: int, delay: float) -> None:
+        await asyncio.sleep(delay)
+        async with self._slots:
+            await self._process(job, attempt)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Equal jitter": половина задержки фиксирована, половина случайна
+        cap = min(self.backoff_max, self.backoff_base * 2**attempt)
+        return cap / 2 + random.uniform(0, cap / 2)
@@ -0,0 +1,8 @@
+from .JobBackends import (
+    DatabaseJobBackend,
+    InMemoryJobBackend,
+    Job,
+    JobBackend,
+    JobQueueFull,
+)
+from .JobQueue import JobQueue
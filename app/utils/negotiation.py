@@ -0,0 +1,47 @@
+from typing import Dict, Optional, Sequence
+
+
+def parse_qualities(header: str) -> Dict[str, float]:
+    """Разобрать Accept / Accept-Encoding: значение -> q"""
+    qualities: Dict[str, float] = {}
+    for item in header.split(","):
+        value, *params = [part.strip() for part in item.split(";")]
+        if not value:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, raw = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(raw)
+                except ValueError:
+                    quality = 0.0
+        qualities[value.lower()] = quality
+    return qualities
+
+
+def _quality(qualities: Dict[str, float], offer: str) -> float:
+    if offer in qualities:
+        return qualities[offer]
+    if "/" in offer:
+        wildcard = offer.split("/", 1)[0] + "/*"
+        if wildcard in qualities:
+            return qualities[wildcard]
+        return qualities.get("*/*", 0.0)
+    return qualities.get("*", 0.0)
+
+
+def negotiate(header: Optional[str], offers: Sequence[str]) -> Optional[str]:
+    """Лучший из offers по заголовку клиента; при равном q - раньше в offers
+
+    None - заголовка нет или ни один вариант не принят.
+    """
+    if not header:
+        return None
+    qualities = parse_qualities(header)
+    best, best_quality = None, 0.0
+    for offer in offers:
+        quality = _quality(qualities, offer)
+        if quality > best_quality:
+            best, best_quality = offer, quality
+    return best
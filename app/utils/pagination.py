@@ -0,0 +1,63 @@
+import base64
+import binascii
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+
+class Cursor(NamedTuple):
+    """Позиция в ленте сообщений: (created_at, id) последней отданной записи"""
+
+    created_at: datetime
+    id: int
+
+
+def encode_cursor(cursor: Cursor) -> str:
+    raw = f"{cursor.created_at.isoformat()}|{cursor.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value: str) -> Cursor:
+    """Разобрать непрозрачный курсор, ValueError если он поврежден"""
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, id_ = raw.rsplit("|", 1)
+        return Cursor(created_at=datetime.fromisoformat(created_at), id=int(id_))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {value!r}") from e
+
+
+class SyncToken(NamedTuple):
+    """Токен /sync: с какого момента начнется следующая синхронизация
+
+    position есть у страниц одной синхронизации: докуда отданы изменения
+    сообщений; watermark при этом остается тем, что был на ее первой странице.
+    """
+
+    watermark: datetime
+    position: Optional[Cursor] = None
+
+
+def encode_sync_token(token: SyncToken) -> str:
+    raw = token.watermark.isoformat()
+    if token.position is not None:
+        raw += f"|{token.position.created_at.isoformat()}|{token.position.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_sync_token(value: str) -> SyncToken:
+    """Разобрать токен синхронизации, ValueError если он поврежден"""
+    try:
+        padded = value + "=" * (-len(value) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        parts = raw.split("|")
+        watermark = datetime.fromisoformat(parts[0])
+        if len(parts) == 1:
+            return SyncToken(watermark=watermark)
+        created_at, id_ = parts[1:]
+        return SyncToken(
+            watermark=watermark,
+            position=Cursor(created_at=datetime.fromisoformat(created_at), id=int(id_)),
+        )
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid sync token: {value!r}") from e
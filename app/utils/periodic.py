@@ -0,0 +1,43 @@
+import asyncio
+import logging
+import random
+from typing import Any, Awaitable, Callable, Optional
+
+log = logging.getLogger(__name__)
+
+
+class PeriodicTask:
+    """Фоновая корутина, которая вызывается раз в interval секунд
+
+    Первый запуск сдвинут на случайную долю интервала, чтобы воркеры,
+    стартовавшие одновременно, не приходили в базу все сразу. Ошибка
+    вызова логируется и не останавливает задачу.
+    """
+
+    def __init__(
+        self, name: str, interval: float, func: Callable[[], Awaitable[Any]]
+    ) -> None:
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self) -> None:
+        await asyncio.sleep(random.uniform(0, self.interval))
+        while True:
+            try:
+                await self.func()
+            except Exception:
+                log.exception("Periodic task %s failed", self.name)
+            await asyncio.sleep(self.interval)
@@ -0,0 +1,111 @@
+import asyncio
+import json
+import logging
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+from app.db.notify import MAX_PAYLOAD_BYTES, PgNotifier
+
+log = logging.getLogger(__name__)
+
+# Отдается подписчику вместо пропущенных событий
+RESYNC = '{"type": "resync"}'
+
+# (тема, данные) из другого процесса
+RemoteHandler = Callable[[str, str], None]
+# События других процессов могли потеряться
+ResyncHandler = Callable[[], None]
+
+
+class PubSubBackend(ABC):
+    """Доставка событий хаба остальным процессам"""
+
+    # Уходят ли события в другие процессы (тогда публикуем и без своих подписчиков)
+    remote: bool = True
+
+    async def start(self, handler: RemoteHandler, resync: ResyncHandler) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    def publish(self, topic: str, data: str) -> None:
+        """Отправить событие без ожидания; порядок событий сохраняется"""
+
+
+class LocalPubSubBackend(PubSubBackend):
+    """Один процесс: события никуда не уходят"""
+
+    remote = False
+
+    def publish(self, topic: str, data: str) -> None:
+        pass
+
+
+class PostgresPubSubBackend(PubSubBackend):
+    """События между процессами через LISTEN/NOTIFY
+
+    NOTIFY отправляет одна задача по очереди, так что процессы видят события
+    в порядке публикации. Свои же уведомления процесс пропускает, их хаб
+    уже доставил локально. Полезная нагрузка NOTIFY ограничена 8000 байт:
+    событие, которое в обертке не влезает, другие процессы получают как
+    resync.
+    После переподключения LISTEN подписчики получают resync: уведомления
+    за время разрыва не доставлены.
+    """
+
+    channel = "realtime_events"
+
+    def __init__(self, notifier: PgNotifier, max_pending: int = 10000) -> None:
+        self.notifier = notifier
+        self.origin = uuid.uuid4().hex
+        self._outbox: asyncio.Queue[str] = asyncio.Queue(max_pending)
+        self._sender: Optional[asyncio.Task] = None
+        self._handler: Optional[RemoteHandler] = None
+
+    async def start(self, handler: RemoteHandler, resync: ResyncHandler) -> None:
+        self._handler = handler
+        self.notifier.on_reconnect(resync)
+        await self.notifier.subscribe(self.channel, self._on_notify)
+        self._sender = asyncio.create_task(self._send_loop(), name="pubsub-notify")
+
+    async def close(self) -> None:
+        if self._sender is not None:
+            self._sender.cancel()
+            await asyncio.gather(self._sender, return_exceptions=True)
+            self._sender = None
+        await self.notifier.close()
+
+    def publish(self, topic: str, data: str) -> None:
+        if self._sender is None:
+            return
+        payload = self._wrap(topic, data)
+        if len(payload.encode()) > MAX_PAYLOAD_BYTES:
+            log.warning(
+                "Pub/sub event for %s is too large for NOTIFY, sending resync", topic
+            )
+            payload = self._wrap(topic, RESYNC)
+        try:
+            self._outbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            log.warning("Pub/sub outbox is full, event for %s dropped", topic)
+
+    def _wrap(self, topic: str, data: str) -> str:
+        return json.dumps(
+            {"origin": self.origin, "topic": topic, "data": data}, ensure_ascii=False
+        )
+
+    async def _send_loop(self) -> None:
+        while True:
+            payload = await self._outbox.get()
+            try:
+                await self.notifier.publish(self.channel, payload)
+            except Exception:
+                log.exception("Failed to publish pub/sub event")
+
+    def _on_notify(self, payload: str) -> None:
+        event = json.loads(payload)
+        if event["origin"] != self.origin and self._handler is not None:
+            self._handler(event["topic"], event["data"])
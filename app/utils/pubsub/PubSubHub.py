@@ -0,0 +1,98 @@
+import asyncio
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from app.utils.metrics import metrics
+from app.utils.pubsub.PubSubBackends import RESYNC, LocalPubSubBackend, PubSubBackend
+
+pubsub_overflows = metrics.counter(
+    "pubsub_subscription_overflows_total",
+    "Subscriber queues that overflowed and were reset to a resync event",
+)
+
+
+class Subscription:
+    """Очередь событий одной темы для одного подписчика
+
+    Очередь ограничена: если подписчик не успевает ее разбирать, накопленные
+    события выбрасываются и вместо них приходит одно событие RESYNC -
+    подписчику нужно перечитать состояние целиком.
+    """
+
+    def __init__(self, hub: "PubSubHub", topic: str, max_size: int) -> None:
+        self.hub = hub
+        self.topic = topic
+        self._queue: asyncio.Queue[str] = asyncio.Queue(max_size)
+
+    async def get(self) -> str:
+        return await self._queue.get()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+    def __enter__(self) -> "Subscription":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _put(self, data: str) -> None:
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            pubsub_overflows.inc()
+            self._resync()
+
+    def _resync(self) -> None:
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(RESYNC)
+
+
+class PubSubHub:
+    """Раздача событий по темам подписчикам в процессе и через backend - в другие"""
+
+    def __init__(
+        self, backend: Optional[PubSubBackend] = None, queue_size: int = 100
+    ) -> None:
+        self.backend = backend or LocalPubSubBackend()
+        self.queue_size = queue_size
+        self._subscriptions: Dict[str, Set[Subscription]] = defaultdict(set)
+
+    async def start(self) -> None:
+        await self.backend.start(self._deliver, self.resync)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def subscribe(self, topic: str) -> Subscription:
+        subscription = Subscription(self, topic, self.queue_size)
+        self._subscriptions[topic].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscriptions.get(subscription.topic)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscriptions[subscription.topic]
+
+    def publish(self, topic: str, data: str) -> None:
+        """Опубликовать событие: локальным подписчикам сразу, остальным через backend"""
+        self._deliver(topic, data)
+        self.backend.publish(topic, data)
+
+    def resync(self) -> None:
+        """Всем подписчикам процесса: события могли потеряться, перечитайте состояние"""
+        for subscribers in list(self._subscriptions.values()):
+            for subscription in list(subscribers):
+                subscription._resync()
+
+    def wants(self, topic: str) -> bool:
+        """Есть ли кому доставлять событие темы (чтобы не готовить его зря)"""
+        return self.backend.remote or topic in self._subscriptions
+
+    def _deliver(self, topic: str, data: str) -> None:
+        for subscription in list(self._subscriptions.get(topic, ())):
+            subscription._put(data)
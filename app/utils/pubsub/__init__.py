@@ -0,0 +1,6 @@
+from .PubSubBackends import (
+    LocalPubSubBackend,
+    PostgresPubSubBackend,
+    PubSubBackend,
+)
+from .PubSubHub import RESYNC, PubSubHub, Subscription
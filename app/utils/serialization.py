@@ -0,0 +1,94 @@
+import enum
+import importlib.util
+from datetime import datetime
+from typing import Any, Iterable, List, Mapping, Optional
+
+import pydantic_core
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import Row
+
+from app.utils.negotiation import negotiate
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# orjson - необязательная зависимость; без него JSON кодирует ядро Pydantic
+if importlib.util.find_spec("orjson"):
+    import orjson
+
+    ENCODER = "orjson"
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content)
+
+else:
+    ENCODER = "pydantic_core"
+
+    def dumps(content: Any) -> bytes:
+        return pydantic_core.to_json(content)
+
+
+def rows_to_dicts(rows: Iterable[Row]) -> List[dict]:
+    return [row._asdict() for row in rows]
+
+
+class FastJSONResponse(JSONResponse):
+    """Ответ из уже готовых данных (строк базы): без jsonable_encoder и валидации
+
+    Даты и перечисления кодируются так же, как в схемах Pydantic, поэтому
+    response_model маршрута остается только для OpenAPI.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# msgpack - необязательная зависимость; без него Accept: application/msgpack
+# получает JSON
+if importlib.util.find_spec("msgpack"):
+    import msgpack
+
+    MEDIA_TYPES = (JSON_MEDIA_TYPE, MSGPACK_MEDIA_TYPE)
+else:
+    MEDIA_TYPES = (JSON_MEDIA_TYPE,)
+
+# Для OpenAPI маршрутов, которые умеют отвечать MessagePack
+MSGPACK_RESPONSES = {200: {"content": {MSGPACK_MEDIA_TYPE: {}}}}
+
+
+def _msgpack_default(value: Any) -> Any:
+    # Даты - строками ISO, как в JSON, чтобы клиенту не разбирать расширения
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Cannot serialize {type(value).__name__} to MessagePack")
+
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, default=_msgpack_default)
+
+
+def response_media_type(request: Request) -> str:
+    """Формат ответа по Accept: MessagePack, если клиент предпочитает его JSON"""
+    accept = request.headers.get("accept")
+    # application/x-msgpack - старое название того же формата
+    if accept and "application/x-msgpack" in accept:
+        accept = accept.replace("application/x-msgpack", MSGPACK_MEDIA_TYPE)
+    return negotiate(accept, MEDIA_TYPES) or JSON_MEDIA_TYPE
+
+
+def list_response(
+    media_type: str, content: Any, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """Ответ из готовых данных в выбранном формате; формат зависит от Accept"""
+    response_class = (
+        MsgPackResponse if media_type == MSGPACK_MEDIA_TYPE else FastJSONResponse
+    )
+    response = response_class(content, headers=headers)
+    response.headers.add_vary_header("Accept")
+    return response
@@ -0,0 +1,4 @@
+def format_sse(event: str, data: str) -> str:
+    """Сформировать событие Server-Sent Events"""
+    lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {event}\n{lines}\n"
@@ -0,0 +1,120 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class ContextEntry:
+    id: int
+    role: str
+    text: str
+    tokens: int
+
+
+# Загрузчик окна: последние limit сообщений чата в порядке от старых к новым
+WindowLoader = Callable[[int, int], Awaitable[Sequence[ContextEntry]]]
+
+
+def estimate_tokens(text: str, chars_per_token: float = 3.0) -> int:
+    """Грубая оценка числа токенов по длине текста, без настоящего токенизатора"""
+    return int(len(text) / chars_per_token) + 1
+
+
+class ContextBuilder:
+    """Собирает историю чата для модели в пределах бюджета токенов
+
+    Для каждого чата кешируется окно из последних window_size сообщений
+    (LRU на max_chats чатов с TTL). Новые сообщения дописываются в окно через
+    apply, правки и удаления сбрасывают его. Если в кеше нет нужного
+    сообщения (например, его записал другой процесс), окно перечитывается.
+    """
+
+    def __init__(
+        self,
+        loader: WindowLoader,
+        window_size: int = 50,
+        token_budget: int = 4000,
+        max_chats: int = 1000,
+        ttl: float = 300.0,
+        system_prompt: str = "",
+    ) -> None:
+        self.loader = loader
+        self.window_size = window_size
+        self.token_budget = token_budget
+        self.max_chats = max_chats
+        self.ttl = ttl
+        self.system_prompt = system_prompt
+        self._windows: "OrderedDict[int, Tuple[float, Tuple[ContextEntry, ...]]]" = (
+            OrderedDict()
+        )
+
+    def invalidate(self, chat_id: int) -> None:
+        self._windows.pop(chat_id, None)
+
+    def apply(
+        self, chat_id: int, message_id: int, entry: Optional[ContextEntry]
+    ) -> None:
+        """Учесть сохраненное сообщение; entry=None - сообщение не входит в контекст"""
+        cached = self._windows.get(chat_id)
+        if cached is None:
+            return
+        expires_at, window = cached
+
+        if entry is not None and (not window or entry.id > window[-1].id):
+            self._windows[chat_id] = (
+                expires_at,
+                (window + (entry,))[-self.window_size:],
+            )
+        elif entry is not None and entry.id >= window[0].id:
+            # Сообщение из середины окна (правка или запоздавший ответ бота)
+            self.invalidate(chat_id)
+        elif entry is None and any(item.id == message_id for item in window):
+            self.invalidate(chat_id)
+
+    def clear(self) -> None:
+        self._windows.clear()
+
+    async def _window(
+        self, chat_id: int, up_to_id: Optional[int]
+    ) -> Tuple[ContextEntry, ...]:
+        cached = self._windows.get(chat_id)
+        now = time.monotonic()
+        if cached is not None:
+            expires_at, window = cached
+            fresh = expires_at > now and (
+                up_to_id is None or (window and window[-1].id >= up_to_id)
+            )
+            if fresh:
+                self._windows.move_to_end(chat_id)
+                return window
+
+        window = tuple(await self.loader(chat_id, self.window_size))
+        self._windows[chat_id] = (now + self.ttl, window)
+        self._windows.move_to_end(chat_id)
+        while len(self._windows) > self.max_chats:
+            self._windows.popitem(last=False)
+        return window
+
+    async def build(
+        self, chat_id: int, up_to_id: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """История чата до сообщения up_to_id включительно в формате сообщений модели"""
+        window = await self._window(chat_id, up_to_id)
+
+        budget = self.token_budget
+        selected: List[ContextEntry] = []
+        for entry in reversed(window):
+            if up_to_id is not None and entry.id > up_to_id:
+                continue
+            # Последнее сообщение берем всегда, даже если оно одно не влезает
+            if selected and entry.tokens > budget:
+                break
+            budget -= entry.tokens
+            selected.append(entry)
+
+        messages = [{"role": "system", "text": self.system_prompt}] if self.system_prompt else []
+        messages.extend(
+            {"role": entry.role, "text": entry.text} for entry in reversed(selected)
+        )
+        return messages
@@ -0,0 +1,35 @@
+import asyncio
+from typing import AsyncIterator
+
+from app.core.config import settings
+from app.utils.yandex_gpt.YandexAgent import Prompt
+
+
+class FakeAgent:
+    """Локальная замена YandexAgent: отвечает эхом с искусственной задержкой"""
+
+    model_id = "fake"
+
+    def __init__(self) -> None:
+        self.settings = settings
+        self.latency = self.settings.gpt.fake_latency
+        self.token_delay = self.settings.gpt.fake_token_delay
+
+    @staticmethod
+    def _reply(message: Prompt) -> str:
+        if not isinstance(message, str):
+            message = message[-1]["text"] if message else ""
+        return f"Вы написали: {message}"
+
+    async def async_call(self, message: Prompt):
+        """Асинхронная версия вызова нейросети"""
+        await asyncio.sleep(self.latency)
+        return self._reply(message)
+
+    async def async_stream(self, message: Prompt) -> AsyncIterator[str]:
+        """Отдает ответ по словам, как потоковый режим модели"""
+        await asyncio.sleep(self.latency)
+        words = self._reply(message).split(" ")
+        for idx, word in enumerate(words):
+            await asyncio.sleep(self.token_delay)
+            yield word if idx == len(words) - 1 else word + " "
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import AsyncIterator, Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.maintenance import delete_in_batches
+from app.db.models import CachedResponse
+from app.utils.cache import TTLCache
+from app.utils.metrics import metrics
+from app.utils.yandex_gpt.YandexAgent import Prompt
+
+log = logging.getLogger(__name__)
+
+llm_cache_requests = metrics.counter(
+    "llm_cache_requests_total",
+    "LLM response cache lookups by result",
+    labelnames=("result",),
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Приводит текст к виду, в котором мелкие различия не влияют на ключ кеша"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+def _digest(value: object) -> str:
+    raw = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cache_key(model_id: str, message: Prompt) -> str:
+    """Ключ кеша: модель, хеш предшествующего контекста и нормализованный запрос"""
+    if isinstance(message, str):
+        history, prompt = [], normalize_text(message)
+    else:
+        history = [[item["role"], normalize_text(item["text"])] for item in message[:-1]]
+        prompt = normalize_text(message[-1]["text"]) if message else ""
+    return _digest([model_id, _digest(history), prompt])
+
+
+class SharedResponseCache(ABC):
+    """Общий для процессов уровень кеша; ошибки не должны ломать вызов модели"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def set(self, key: str, response: str, ttl: float) -> None: ...
+
+
+class DatabaseResponseCache(SharedResponseCache):
+    """Кеш ответов в таблице cached_responses"""
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
+        self.session_factory = session_factory
+
+    async def get(self, key: str) -> Optional[str]:
+        async with self.session_factory() as session:
+            return await session.scalar(
+                select(CachedResponse.response).where(
+                    CachedResponse.key == key,
+                    CachedResponse.expires_at > func.now(),
+                )
+            )
+
+    async def set(self, key: str, response: str, ttl: float) -> None:
+        expires_at = func.now() + timedelta(seconds=ttl)
+        stmt = insert(CachedResponse).values(
+            key=key, response=response, expires_at=expires_at, created_at=func.now()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CachedResponse.key],
+            set_={"response": stmt.excluded.response, "expires_at": expires_at},
+        )
+        async with self.session_factory() as session:
+            await session.execute(stmt)
+            await session.commit()
+
+    async def prune(self, batch_size: int = 1000) -> int:
+        """Удалить просроченные записи пачками, вернуть их количество"""
+        deleted = await delete_in_batches(
+            self.session_factory,
+            CachedResponse.key,
+            CachedResponse.expires_at <= func.now(),
+            batch_size=batch_size,
+        )
+        if deleted:
+            log.info("Pruned %s expired cached responses", deleted)
+        return deleted
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class CachingAgent:
+    """Обертка над агентом, которая кеширует ответы на одинаковые запросы
+
+    Первый уровень - LRU с TTL в памяти процесса, второй (необязательный) -
+    общий для всех процессов. Одновременные одинаковые запросы ждут один
+    вызов модели; он отменяется, только когда ушли все ожидающие.
+    """
+
+    def __init__(
+        self,
+        agent,
+        local: TTLCache[str, str],
+        shared: Optional[SharedResponseCache] = None,
+    ) -> None:
+        self.agent = agent
+        self.model_id = getattr(agent, "model_id", type(agent).__name__)
+        self.local = local
+        self.shared = shared
+        self._flights: Dict[str, _Flight] = {}
+
+    def key(self, message: Prompt) -> str:
+        return cache_key(self.model_id, message)
+
+    async def async_call(self, message: Prompt):
+        key = self.key(message)
+        cached = self.local.get(key)
+        if cached is not None:
+            llm_cache_requests.inc(result="hit")
+            return cached
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.create_task(self._load(key, message)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            llm_cache_requests.inc(result="coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    async def async_stream(self, message: Prompt) -> AsyncIterator[str]:
+        """Потоковый вызов: попадание в кеш отдается одним фрагментом
+
+        Промах не объединяется с другими запросами (каждый клиент получает
+        свой поток), но полный ответ сохраняется в кеш.
+        """
+        key = self.key(message)
+        cached = self.local.get(key)
+        if cached is not None:
+            llm_cache_requests.inc(result="hit")
+        elif self.shared is not None:
+            cached = await self._shared_get(key)
+            if cached is not None:
+                llm_cache_requests.inc(result="shared_hit")
+                self.local.set(key, cached)
+        if cached is not None:
+            yield cached
+            return
+
+        llm_cache_requests.inc(result="miss")
+        parts = []
+        async for delta in self.agent.async_stream(message):
+            parts.append(delta)
+            yield delta
+        await self._store(key, "".join(parts))
+
+    def _forget(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _load(self, key: str, message: Prompt) -> str:
+        if self.shared is not None:
+            cached = await self._shared_get(key)
+            if cached is not None:
+                llm_cache_requests.inc(result="shared_hit")
+                self.local.set(key, cached)
+                return cached
+
+        llm_cache_requests.inc(result="miss")
+        response = await self.agent.async_call(message)
+        await self._store(key, response)
+        return response
+
+    async def _store(self, key: str, response: str) -> None:
+        if not response:
+            return
+        self.local.set(key, response)
+        if self.shared is None:
+            return
+        try:
+            await self.shared.set(key, response, self.local.ttl)
+        except Exception:
+            log.warning("Failed to store LLM response in shared cache", exc_info=True)
+
+    async def _shared_get(self, key: str) -> Optional[str]:
+        try:
+            return await self.shared.get(key)
+        except Exception:
+            log.warning("Shared LLM response cache is unavailable", exc_info=True)
+            return None
@@ -1,37 +1,88 @@
-from app.core.config import settings
-from yandex_cloud_ml_sdk import YCloudML
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Union
+from app.core.config import settings
+from app.utils.metrics import metrics
+from yandex_cloud_ml_sdk import AsyncYCloudML
 
 
 MODEL_NAME = "yandexgpt-lite"
 MODEL_VERSION = "rc"
 
+# Строка или история в виде [{"role": "user" | "assistant" | "system", "text": ...}]
+Prompt = Union[str, List[Dict[str, str]]]
+
+llm_queue_wait = metrics.histogram(
+    "llm_queue_wait_seconds",
+    "Time an LLM call waited for a free in-flight slot",
+)
+llm_call_duration = metrics.histogram(
+    "llm_call_duration_seconds",
+    "LLM call latency once a slot was acquired",
+    labelnames=("operation", "outcome"),
+)
+
 
 class YandexAgent:
+    # Входит в ключ кеша ответов: смена модели не отдаст старые ответы
+    model_id = f"{MODEL_NAME}/{MODEL_VERSION}"
+
     def __init__(self) -> None:
         self.settings = settings
-        self.sdk = YCloudML(
+        # Нативный async-клиент: запросы не занимают потоки из общего executor
+        self.sdk = AsyncYCloudML(
             folder_id=self.settings.gpt.folder_id, auth=self.settings.gpt.api_key
         )
         self.model = self.sdk.models.completions(
             MODEL_NAME, model_version=MODEL_VERSION
         )
-        self.thread = None
+        self.timeout = self.settings.gpt.request_timeout
+        self._slots = asyncio.Semaphore(self.settings.gpt.max_in_flight)
 
-    def __get_thread(self):
-        if self.thread is None:
-            self.thread = self.sdk.threads.create(
-                ttl_days=1, expiration_policy="static"
-            )
-        return self.thread
+    @asynccontextmanager
+    async def _slot(self, operation: str):
+        """Ограничивает число запросов в полете и замеряет ожидание и длительность"""
+        queued_at = time.monotonic()
+        async with self._slots:
+            started_at = time.monotonic()
+            llm_queue_wait.observe(started_at - queued_at)
+            outcome = "error"
+            try:
+                yield
+                outcome = "ok"
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise
+            finally:
+                llm_call_duration.observe(
+                    time.monotonic() - started_at, operation=operation, outcome=outcome
+                )
 
-    def __call__(self, message: str):
-        response = self.model.run(message)
-        assistant_response = response.text
-        return assistant_response
+    async def async_call(self, message: Prompt):
+        """Асинхронная версия вызова нейросети
 
-    async def async_call(self, message: str):
-        """Асинхронная версия вызова нейросети"""
-        loop = asyncio.get_event_loop()
-        response = await loop.run_in_executor(None, self.model.run, message)
+        Отмена вызывающей корутины (например, клиент отключился) отменяет
+        и сам запрос к API.
+        """
+        async with self._slot("run"):
+            response = await asyncio.wait_for(
+                self.model.run(message, timeout=self.timeout), self.timeout
+            )
         return response.text
+
+    async def async_stream(self, message: Prompt) -> AsyncIterator[str]:
+        """Асинхронный потоковый вызов: отдает новые фрагменты текста по мере генерации"""
+        async with self._slot("run_stream"):
+            sent = ""
+            # timeout SDK - дедлайн всего gRPC-стрима, а не отдельного фрагмента
+            async for result in self.model.run_stream(message, timeout=self.timeout):
+                # Модель присылает накопленный текст целиком, отдаем только прирост
+                text = result.text
+                delta = text[len(sent):] if text.startswith(sent) else text
+                sent = text
+                if delta:
+                    yield delta
@@ -0,0 +1,260 @@
+"""Нагрузочный прогон API чатов и сообщений.
+
+Засевает базу (пользователи x чаты x сообщения), логинит пользователей и
+гоняет сценарии: список чатов, листание истории по курсору, счетчик
+сообщений и создание сообщений с фейковой моделью заданной задержки.
+Для каждого сценария - пропускная способность и p50/p95/p99; результаты
+сохраняются в JSON (benchmarks/results), сравнение - benchmarks.compare:
+
+    python -m benchmarks.api_load --users 50 --chats 20 --messages 500
+    python -m benchmarks.api_load --url http://localhost:8000 --scenarios list_chats
+
+Без --url запросы идут в приложение через ASGI, без сети. С --url
+нагружается уже запущенный сервер; фейковую модель ему включают через
+окружение (GPT_FAKE=1, GPT_FAKE_LATENCY). Нужна база с примененными
+миграциями (настройки берутся из .env).
+
+--accept и --accept-encoding задают формат и сжатие ответов; в результатах
+есть средний размер ответа на проводе (mean_bytes):
+
+    python -m benchmarks.api_load --accept application/msgpack --accept-encoding br
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from app.core.authentication.password import password_helper
+from app.core.config import settings
+from app.core.jobs import job_queue
+from app.db.database import db_helper
+from benchmarks.common import (
+    delete_users,
+    latency_summary,
+    save_results,
+    seed_chats,
+    seed_users,
+)
+
+PASSWORD = "benchmark-password"
+SCENARIOS = ("list_chats", "history", "count", "create_message")
+
+
+class Client:
+    """Залогиненный пользователь и его чаты"""
+
+    def __init__(self, headers: Dict[str, str], chat_ids: List[int]) -> None:
+        self.headers = headers
+        self.chat_ids = chat_ids
+
+
+Request = Callable[[httpx.AsyncClient, Client], Awaitable[List[httpx.Response]]]
+
+
+async def list_chats(http: httpx.AsyncClient, client: Client) -> List[httpx.Response]:
+    return [await http.get("/chats", params={"limit": 50}, headers=client.headers)]
+
+
+def history(pages: int, page_size: int) -> Request:
+    async def run(http: httpx.AsyncClient, client: Client) -> List[httpx.Response]:
+        chat_id = random.choice(client.chat_ids)
+        params = {"limit": page_size}
+        responses = []
+        for _ in range(pages):
+            response = await http.get(
+                f"/messages/chat/{chat_id}", params=params, headers=client.headers
+            )
+            responses.append(response)
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params = {"limit": page_size, "before": cursor}
+        return responses
+
+    return run
+
+
+async def count(http: httpx.AsyncClient, client: Client) -> List[httpx.Response]:
+    chat_id = random.choice(client.chat_ids)
+    return [
+        await http.get(f"/messages/chat/{chat_id}/count", headers=client.headers)
+    ]
+
+
+async def create_message(
+    http: httpx.AsyncClient, client: Client
+) -> List[httpx.Response]:
+    body = {
+        "chat_id": random.choice(client.chat_ids),
+        "text": "benchmark message",
+        "is_from_user": True,
+    }
+    return [await http.post("/messages", json=body, headers=client.headers)]
+
+
+async def login(http: httpx.AsyncClient, email: str) -> Dict[str, str]:
+    credentials = {"username": email, "password": PASSWORD}
+    response = await http.post("/auth/login", data=credentials)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_scenario(
+    http: httpx.AsyncClient,
+    clients: List[Client],
+    request: Request,
+    total: int,
+    concurrency: int,
+) -> dict:
+    """total итераций сценария в concurrency потоков
+
+    Задержка считается по каждому HTTP-запросу (страница истории - отдельный
+    запрос), пропускная способность - запросов в секунду за весь прогон.
+    """
+    timings: List[float] = []
+    sizes: List[int] = []
+    errors = 0
+    remaining = total
+
+    async def worker() -> None:
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            for response in await request(http, random.choice(clients)):
+                errors += response.is_error
+                timings.append(response.elapsed.total_seconds() * 1000)
+                # Байты на проводе, до распаковки gzip/brotli
+                sizes.append(response.num_bytes_downloaded)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    summary = latency_summary(timings, time.perf_counter() - started, errors)
+    if sizes:
+        summary["mean_bytes"] = round(statistics.fmean(sizes))
+    return summary
+
+
+def make_http_client(
+    url: Optional[str], concurrency: int, headers: Dict[str, str]
+) -> httpx.AsyncClient:
+    if url:
+        limits = httpx.Limits(max_connections=concurrency)
+        return httpx.AsyncClient(
+            base_url=url, limits=limits, timeout=60.0, headers=headers
+        )
+    from main import app
+
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://bench",
+        timeout=60.0,
+        headers=headers,
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    if not args.url:
+        settings.gpt.fake = True
+        settings.gpt.fake_latency = args.llm_latency
+        settings.gpt.fake_token_delay = 0.0
+
+    started = time.perf_counter()
+    users = await seed_users(args.users, password_helper.hash(PASSWORD))
+    user_ids = [user_id for user_id, _ in users]
+    results: Dict[str, dict] = {}
+    try:
+        chats = await seed_chats(user_ids, args.chats, args.messages)
+        seed_seconds = time.perf_counter() - started
+        print(
+            f"Seeded {args.users} users x {args.chats} chats x {args.messages} "
+            f"messages in {seed_seconds:.1f} s"
+        )
+
+        requests: Dict[str, Request] = {
+            "list_chats": list_chats,
+            "history": history(args.pages, args.page_size),
+            "count": count,
+            "create_message": create_message,
+        }
+        headers = {"Accept": args.accept, "Accept-Encoding": args.accept_encoding}
+        async with make_http_client(args.url, args.concurrency, headers) as http:
+            clients = [
+                Client(await login(http, email), chats[user_id])
+                for user_id, email in users
+            ]
+            for name in args.scenarios:
+                request = requests[name]
+                # Прогрев: соединения пула и кеши процесса
+                await run_scenario(
+                    http, clients, request, args.concurrency, args.concurrency
+                )
+                results[name] = await run_scenario(
+                    http, clients, request, args.requests, args.concurrency
+                )
+                summary = results[name]
+                print(
+                    f"{name:<15} {summary['throughput']:9.1f} req/s  "
+                    f"p50 {summary['p50_ms']:8.2f} ms  p95 {summary['p95_ms']:8.2f} ms  "
+                    f"p99 {summary['p99_ms']:8.2f} ms  {summary.get('mean_bytes', 0):9} B  "
+                    f"errors {summary['errors']}"
+                )
+    finally:
+        if not args.url:
+            # Ответы бота на созданные сообщения пишутся в засеянные чаты
+            await job_queue.stop(timeout=settings.jobs.shutdown_timeout)
+        if not args.keep:
+            await delete_users(user_ids)
+        await db_helper.dispose()
+
+    path = save_results(
+        "api_load",
+        {
+            "params": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+            "config": {
+                "transport": "http" if args.url else "asgi",
+                "access_token_strategy": settings.access_token.strategy,
+                "token_cache": settings.access_token.cache_enabled,
+                "db_pool_size": settings.db.pool_size,
+                "db_replicas": len(settings.db.replica_urls),
+                "accept": args.accept,
+                "accept_encoding": args.accept_encoding,
+            },
+            "scenarios": results,
+        },
+        args.output,
+    )
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--chats", type=int, default=10, help="Chats per user")
+    parser.add_argument("--messages", type=int, default=200, help="Messages per chat")
+    parser.add_argument("--requests", type=int, default=2000, help="Iterations per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--pages", type=int, default=5, help="History pages per iteration")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument(
+        "--llm-latency", type=float, default=0.5, help="Fake model latency, seconds"
+    )
+    parser.add_argument(
+        "--accept", default="application/json", help="Accept header, e.g. application/msgpack"
+    )
+    parser.add_argument(
+        "--accept-encoding", default="identity", help="Accept-Encoding header, e.g. br, gzip"
+    )
+    parser.add_argument("--url", help="Load a running server instead of the ASGI app")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/...)")
+    parser.add_argument("--keep", action="store_true", help="Do not delete seeded rows")
+    asyncio.run(main(parser.parse_args()))
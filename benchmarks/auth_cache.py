@@ -0,0 +1,80 @@
+"""Пропускная способность GET /chats с кешем токенов и без него.
+
+Создает пользователя с несколькими чатами и токеном, затем гоняет запросы
+через ASGI-приложение (без сети) в два режима стратегии авторизации:
+
+    python -m benchmarks.auth_cache --requests 5000 --concurrency 50
+
+Нужна база с примененными миграциями (настройки берутся из .env).
+"""
+
+import argparse
+import asyncio
+import secrets
+import time
+
+import httpx
+from sqlalchemy import insert
+
+from app.core.authentication.token_cache import token_cache
+from app.core.config import settings
+from app.db.database import db_helper
+from app.db.models import AccessToken, Chat
+from benchmarks.common import create_user, delete_users
+from main import app
+
+
+async def seed(chats: int) -> tuple[int, str]:
+    token = secrets.token_urlsafe()
+    user_id = await create_user()
+    async with db_helper.session_factory() as session:
+        await session.execute(
+            insert(Chat),
+            [{"title": f"chat {n}", "user_id": user_id} for n in range(chats)],
+        )
+        await session.execute(insert(AccessToken).values(token=token, user_id=user_id))
+        await session.commit()
+    return user_id, token
+
+
+async def run(token: str, total: int, concurrency: int) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        remaining = total
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                response = await client.get("/chats", headers=headers)
+                response.raise_for_status()
+
+        # Прогрев: соединения пула и (в режиме кеша) первая запись
+        await client.get("/chats", headers=headers)
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return total / (time.perf_counter() - started)
+
+
+async def main(total: int, concurrency: int, chats: int) -> None:
+    user_id, token = await seed(chats)
+    try:
+        for cached in (False, True):
+            settings.access_token.cache_enabled = cached
+            token_cache.clear()
+            rps = await run(token, total, concurrency)
+            label = "cached token strategy" if cached else "database strategy"
+            print(f"{label:<24} {rps:10.1f} req/s")
+    finally:
+        await delete_users([user_id])
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.chats))
@@ -0,0 +1,166 @@
+"""Общий код бенчмарков: пользователи, засев базы, статистика и результаты."""
+
+import json
+import os
+import statistics
+import subprocess
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import delete, insert, select, text
+
+from app.db.database import db_helper
+from app.db.models import Chat, Message, User
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def bench_email() -> str:
+    return f"bench-{uuid.uuid4().hex}@example.com"
+
+
+async def create_user(hashed_password: str = "-", email: Optional[str] = None) -> int:
+    async with db_helper.session_factory() as session:
+        user_id = (
+            await session.execute(
+                insert(User)
+                .values(
+                    email=email or bench_email(),
+                    hashed_password=hashed_password,
+                    is_active=True,
+                    is_superuser=False,
+                    is_verified=False,
+                )
+                .returning(User.id)
+            )
+        ).scalar_one()
+        await session.commit()
+    return user_id
+
+
+async def seed_users(count: int, hashed_password: str) -> List[tuple[int, str]]:
+    """count пользователей одним запросом; возвращает (id, email)"""
+    prefix = f"bench-{uuid.uuid4().hex[:12]}"
+    async with db_helper.session_factory() as session:
+        rows = await session.execute(
+            text(
+                "INSERT INTO users (email, hashed_password, is_active, is_superuser, is_verified) "
+                "SELECT :prefix || '-' || n || '@example.com', :hashed_password, "
+                "true, false, false "
+                "FROM generate_series(1, :count) AS n "
+                "RETURNING id, email"
+            ),
+            {"prefix": prefix, "hashed_password": hashed_password, "count": count},
+        )
+        users = [(row.id, row.email) for row in rows]
+        await session.commit()
+    return users
+
+
+async def seed_chats(
+    user_ids: List[int], chats_per_user: int, messages_per_chat: int
+) -> Dict[int, List[int]]:
+    """Чаты с сообщениями для каждого пользователя; строки генерирует сервер
+
+    Счетчики чатов заполняются сразу, как если бы сообщения шли через API.
+    Возвращает user_id -> id его чатов.
+    """
+    async with db_helper.session_factory() as session:
+        rows = await session.execute(
+            text(
+                "INSERT INTO chats (title, user_id, message_count, last_message_at, "
+                "created_at, updated_at) "
+                "SELECT 'chat ' || c, u.id, :messages, now(), now(), now() "
+                "FROM unnest(CAST(:user_ids AS integer[])) AS u(id) "
+                "CROSS JOIN generate_series(1, :chats) AS c "
+                "RETURNING id, user_id"
+            ),
+            {"user_ids": user_ids, "chats": chats_per_user, "messages": messages_per_chat},
+        )
+        chats: Dict[int, List[int]] = {user_id: [] for user_id in user_ids}
+        for row in rows:
+            chats[row.user_id].append(row.id)
+        await session.execute(
+            text(
+                "INSERT INTO messages (text, status, sender, chat_id, created_at, updated_at) "
+                "SELECT 'message ' || n, 'DELIVERED'::messagestatus, "
+                "CASE WHEN n % 2 = 0 THEN 'BOT' ELSE 'USER' END::messagesender, "
+                "c.id, now() - make_interval(secs => n), now() "
+                "FROM unnest(CAST(:chat_ids AS integer[])) AS c(id) "
+                "CROSS JOIN generate_series(1, :messages) AS n"
+            ),
+            {
+                "chat_ids": [chat_id for ids in chats.values() for chat_id in ids],
+                "messages": messages_per_chat,
+            },
+        )
+        await session.commit()
+        await session.execute(text("ANALYZE chats"))
+        await session.execute(text("ANALYZE messages"))
+        await session.commit()
+    return chats
+
+
+async def delete_users(user_ids: List[int]) -> None:
+    """Удалить пользователей вместе с их чатами и сообщениями"""
+    chat_ids = select(Chat.id).where(Chat.user_id.in_(user_ids))
+    async with db_helper.session_factory() as session:
+        await session.execute(delete(Message).where(Message.chat_id.in_(chat_ids)))
+        await session.execute(delete(Chat).where(Chat.user_id.in_(user_ids)))
+        await session.execute(delete(User).where(User.id.in_(user_ids)))
+        await session.commit()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def latency_summary(
+    timings: List[float], seconds: float, errors: int = 0
+) -> Dict[str, Any]:
+    """Пропускная способность и перцентили; timings в миллисекундах"""
+    if not timings:
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": len(timings),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput": round(len(timings) / seconds, 1),
+        "mean_ms": round(statistics.fmean(timings), 2),
+        "p50_ms": round(percentile(timings, 0.50), 2),
+        "p95_ms": round(percentile(timings, 0.95), 2),
+        "p99_ms": round(percentile(timings, 0.99), 2),
+        "max_ms": round(max(timings), 2),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(__file__),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name: str, data: Dict[str, Any], path: Optional[str] = None) -> str:
+    """Сохранить результаты прогона в JSON (по умолчанию benchmarks/results)"""
+    now = datetime.now(timezone.utc)
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{name}-{now:%Y%m%d-%H%M%S}.json")
+    document = {
+        "benchmark": name,
+        "started_at": now.isoformat(),
+        "git_revision": git_revision(),
+        **data,
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(document, file, ensure_ascii=False, indent=2)
+    return path
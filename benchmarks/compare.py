@@ -0,0 +1,50 @@
+"""Сравнение двух сохраненных прогонов бенчмарка по сценариям.
+
+    python -m benchmarks.compare benchmarks/results/api_load-A.json \
+        benchmarks/results/api_load-B.json
+
+Для каждой метрики печатается значение в базовом и новом прогоне и
+изменение в процентах.
+"""
+
+import argparse
+import json
+from typing import Any, Dict
+
+METRICS = ("throughput", "p50_ms", "p95_ms", "p99_ms", "errors")
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "     n/a"
+    return f"{(after - before) / before * 100:+7.1f}%"
+
+
+def main(base_path: str, new_path: str) -> None:
+    base, new = load(base_path), load(new_path)
+    print(f"base {base.get('git_revision')} ({base['started_at']})")
+    print(f"new  {new.get('git_revision')} ({new['started_at']})")
+    for scenario, after in new["scenarios"].items():
+        before = base["scenarios"].get(scenario)
+        if before is None:
+            continue
+        print(scenario)
+        for metric in METRICS:
+            if metric in before and metric in after:
+                print(
+                    f"  {metric:<11} {before[metric]:10.2f} -> {after[metric]:10.2f}  "
+                    f"{change(before[metric], after[metric])}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base")
+    parser.add_argument("new")
+    args = parser.parse_args()
+    main(args.base, args.new)
@@ -0,0 +1,96 @@
+"""Время сборки контекста для модели на большом чате.
+
+Чат из 100k сообщений держится в памяти, загрузчик отдает последние N
+сообщений так же, как запрос к базе по индексу истории. Замеряется сборка
+контекста с прогретым кешем окна и после каждого нового сообщения:
+
+    python -m benchmarks.context_assembly --messages 100000
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.utils.yandex_gpt.ContextBuilder import (
+    ContextBuilder,
+    ContextEntry,
+    estimate_tokens,
+)
+
+WORDS = "привет как дела расскажи подробнее про это спасибо понятно а если".split()
+
+
+def make_chat(size: int) -> list[ContextEntry]:
+    rng = random.Random(42)
+    chat = []
+    for idx in range(1, size + 1):
+        text = " ".join(rng.choices(WORDS, k=rng.randint(3, 120)))
+        chat.append(
+            ContextEntry(
+                id=idx,
+                role="user" if idx % 2 else "assistant",
+                text=text,
+                tokens=estimate_tokens(text),
+            )
+        )
+    return chat
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def report(name: str, timings: list[float]) -> None:
+    micros = [t * 1_000_000 for t in timings]
+    print(
+        f"{name:<28} mean {statistics.mean(micros):8.1f} us  "
+        f"p99 {percentile(micros, 0.99):8.1f} us  max {max(micros):8.1f} us"
+    )
+
+
+async def main(size: int, window: int, budget: int, rounds: int) -> None:
+    chat = make_chat(size)
+    loads = 0
+
+    async def loader(chat_id: int, limit: int):
+        nonlocal loads
+        loads += 1
+        return chat[-limit:]
+
+    builder = ContextBuilder(loader=loader, window_size=window, token_budget=budget)
+    await builder.build(1, up_to_id=chat[-1].id)
+
+    warm = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await builder.build(1, up_to_id=chat[-1].id)
+        warm.append(time.perf_counter() - started)
+
+    appended = []
+    for _ in range(rounds):
+        entry = ContextEntry(
+            id=chat[-1].id + 1, role="user", text="новое сообщение", tokens=5
+        )
+        chat.append(entry)
+        started = time.perf_counter()
+        builder.apply(1, entry.id, entry)
+        await builder.build(1, up_to_id=entry.id)
+        appended.append(time.perf_counter() - started)
+
+    print(f"chat of {size} messages, window {window}, budget {budget} tokens")
+    report("warm window", warm)
+    report("append + build", appended)
+    print(f"window loads from storage: {loads}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=4000)
+    parser.add_argument("--rounds", type=int, default=10_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.window, args.budget, args.rounds))
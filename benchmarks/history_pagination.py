@@ -0,0 +1,111 @@
+"""Сравнение offset- и keyset-пагинации истории чата.
+
+Заполняет один чат нужным количеством сообщений и замеряет время чтения
+страницы на заданной глубине обоими способами:
+
+    python -m benchmarks.history_pagination --depths 10000 1000000
+
+Нужна база с примененными миграциями (настройки берутся из .env).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from sqlalchemy import insert, select, text
+
+from app.crud.CRUDMessage import crud_message
+from app.db.database import db_helper
+from app.db.models import Chat, Message
+from app.utils.pagination import Cursor
+from benchmarks.common import create_user, delete_users, percentile
+
+
+async def seed_chat(rows: int) -> tuple[int, int]:
+    user_id = await create_user()
+    async with db_helper.session_factory() as session:
+        chat_id = (
+            await session.execute(
+                insert(Chat)
+                .values(title="pagination benchmark", user_id=user_id)
+                .returning(Chat.id)
+            )
+        ).scalar_one()
+        # Генерируем строки на стороне сервера, чтобы не гонять их по сети
+        await session.execute(
+            text(
+                "INSERT INTO messages (text, status, sender, chat_id, created_at, updated_at) "
+                "SELECT 'message ' || n, 'DELIVERED'::messagestatus, "
+                "CASE WHEN n % 2 = 0 THEN 'BOT' ELSE 'USER' END::messagesender, "
+                ":chat_id, now() - make_interval(secs => n), now() "
+                "FROM generate_series(1, :rows) AS n"
+            ),
+            {"chat_id": chat_id, "rows": rows},
+        )
+        await session.commit()
+        return user_id, chat_id
+
+
+async def cursor_at_depth(chat_id: int, depth: int) -> Cursor:
+    async with db_helper.session_factory() as session:
+        row = (
+            await session.execute(
+                select(Message.created_at, Message.id)
+                .where(Message.chat_id == chat_id)
+                .order_by(Message.created_at.desc(), Message.id.desc())
+                .offset(depth - 1)
+                .limit(1)
+            )
+        ).one()
+        return Cursor(created_at=row.created_at, id=row.id)
+
+
+async def measure(repeat: int, **kwargs) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        async with db_helper.session_factory() as session:
+            started = time.perf_counter()
+            await crud_message.get_by_chat_id_and_user(session, **kwargs)
+            timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summary(timings: list[float]) -> str:
+    return (
+        f"median {statistics.median(timings):8.2f} ms  "
+        f"p95 {percentile(timings, 0.95):8.2f} ms"
+    )
+
+
+async def main(depths: list[int], page_size: int, repeat: int, keep: bool) -> None:
+    rows = max(depths) + page_size
+    print(f"Seeding {rows} messages...")
+    user_id, chat_id = await seed_chat(rows)
+    try:
+        async with db_helper.session_factory() as session:
+            await session.execute(text("ANALYZE messages"))
+            await session.commit()
+
+        for depth in depths:
+            page = {"chat_id": chat_id, "user_id": user_id, "limit": page_size}
+            offset = await measure(repeat, skip=depth, **page)
+            keyset = await measure(
+                repeat, before=await cursor_at_depth(chat_id, depth), **page
+            )
+            print(f"depth {depth:>9}  offset  {summary(offset)}")
+            print(f"depth {depth:>9}  keyset  {summary(keyset)}")
+    finally:
+        if not keep:
+            await delete_users([user_id])
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--depths", type=int, nargs="+", default=[10_000, 1_000_000])
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Do not delete seeded rows")
+    args = parser.parse_args()
+    asyncio.run(main(args.depths, args.page_size, args.repeat, args.keep))
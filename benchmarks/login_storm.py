@@ -0,0 +1,92 @@
+"""Задержка GET /chats во время волны входов по паролю.
+
+Пока несколько клиентов без остановки логинятся, отдельный клиент
+замеряет задержку /chats. Прогон повторяется для хеширования в цикле
+событий (inline) и в пуле (thread, process):
+
+    python -m benchmarks.login_storm --seconds 10 --logins 20
+
+Нужна база с примененными миграциями (настройки берутся из .env).
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.core.authentication.password import password_helper
+from app.core.config import settings
+from app.db.database import db_helper
+from benchmarks.common import bench_email, create_user, delete_users, percentile
+from main import app
+
+PASSWORD = "benchmark-password"
+
+
+async def seed() -> tuple[int, str]:
+    email = bench_email()
+    return await create_user(password_helper.hash(PASSWORD), email), email
+
+
+async def run(email: str, seconds: float, logins: int) -> None:
+    credentials = {"username": email, "password": PASSWORD}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post("/auth/login", data=credentials)
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        deadline = time.perf_counter() + seconds
+        login_count = 0
+
+        async def login_loop() -> None:
+            nonlocal login_count
+            while time.perf_counter() < deadline:
+                response = await client.post("/auth/login", data=credentials)
+                response.raise_for_status()
+                login_count += 1
+
+        async def probe() -> list[float]:
+            timings = []
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get("/chats", headers=headers)
+                response.raise_for_status()
+                timings.append((time.perf_counter() - started) * 1000)
+                await asyncio.sleep(0.01)
+            return timings
+
+        *_, timings = await asyncio.gather(
+            *(login_loop() for _ in range(logins)), probe()
+        )
+
+    print(
+        f"{settings.password.executor:<8} logins/s {login_count / seconds:7.1f}  "
+        f"/chats p50 {statistics.median(timings):8.1f} ms  "
+        f"p99 {percentile(timings, 0.99):8.1f} ms  max {max(timings):8.1f} ms"
+    )
+
+
+async def main(seconds: float, logins: int, executors: list[str]) -> None:
+    user_id, email = await seed()
+    try:
+        for executor in executors:
+            password_helper.shutdown()
+            settings.password.executor = executor
+            await run(email, seconds, logins)
+    finally:
+        password_helper.shutdown()
+        await delete_users([user_id])
+        await db_helper.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--logins", type=int, default=20, help="Concurrent login clients")
+    parser.add_argument(
+        "--executors", nargs="+", default=["inline", "thread", "process"]
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.logins, args.executors))
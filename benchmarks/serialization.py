@@ -0,0 +1,146 @@
+"""Сериализация страницы истории: сущности ORM + response_model против строк.
+
+Страница сообщений читается из SQLite в памяти (без сервера базы) двумя
+путями и кодируется в JSON:
+
+- orm: select(Message) -> валидация List[MessageRead] с from_attributes ->
+  jsonable-данные -> json.dumps, как FastAPI делает с response_model;
+- rows: select(колонки MessageRead) -> dict -> FastJSONResponse (orjson,
+  если установлен, иначе ядро Pydantic).
+
+    python -m benchmarks.serialization --messages 1000 --rounds 200
+
+Результаты сохраняются в JSON (benchmarks/results).
+"""
+
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.crud.CRUDMessage import crud_message
+from app.db.models import Base, Chat, Message, User
+from app.db.models.message import MessageSender, MessageStatus
+from app.schemas.message import MessageRead
+from app.utils.serialization import ENCODER, FastJSONResponse, rows_to_dicts
+from benchmarks.common import percentile, save_results
+
+WORDS = "привет как дела расскажи подробнее про это спасибо понятно а если".split()
+
+
+def seed(session: Session, messages: int) -> int:
+    user = User(
+        email="bench@example.com",
+        hashed_password="-",
+        is_active=True,
+        is_superuser=False,
+        is_verified=False,
+    )
+    session.add(user)
+    session.flush()
+    chat = Chat(title="chat", user_id=user.id)
+    session.add(chat)
+    session.flush()
+    started = datetime(2025, 1, 1)
+    session.execute(
+        insert(Message),
+        [
+            {
+                "text": " ".join(WORDS[: 3 + n % len(WORDS)]) * (1 + n % 4),
+                "status": MessageStatus.DELIVERED,
+                "sender": MessageSender.USER if n % 2 else MessageSender.BOT,
+                "chat_id": chat.id,
+                "created_at": started + timedelta(seconds=n),
+                "updated_at": started + timedelta(seconds=n, microseconds=n),
+            }
+            for n in range(messages)
+        ],
+    )
+    session.commit()
+    return chat.id
+
+
+def measure(run: Callable[[], bytes], rounds: int) -> dict:
+    timings: List[float] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        run()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p50_ms": round(percentile(timings, 0.50), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        chat_id = seed(session, args.messages)
+
+    adapter = TypeAdapter(List[MessageRead])
+    entity_query = (
+        select(Message).where(Message.chat_id == chat_id).order_by(Message.id)
+    )
+    row_query = (
+        select(*crud_message.columns_for(MessageRead))
+        .where(Message.chat_id == chat_id)
+        .order_by(Message.id)
+    )
+
+    def orm_path() -> bytes:
+        with Session(engine) as session:
+            messages = session.scalars(entity_query).all()
+        value = adapter.validate_python(messages, from_attributes=True)
+        content = adapter.dump_python(value, mode="json")
+        return json.dumps(
+            content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode()
+
+    def rows_path() -> bytes:
+        with Session(engine) as session:
+            rows = session.execute(row_query).all()
+        return FastJSONResponse(rows_to_dicts(rows)).body
+
+    if json.loads(orm_path()) != json.loads(rows_path()):
+        raise SystemExit("Paths produce different JSON")
+
+    results = {}
+    for name, run in (("orm", orm_path), ("rows", rows_path)):
+        run()  # Прогрев
+        results[name] = measure(run, args.rounds)
+        summary = results[name]
+        print(
+            f"{name:<6} mean {summary['mean_ms']:8.3f} ms  "
+            f"p50 {summary['p50_ms']:8.3f} ms  p99 {summary['p99_ms']:8.3f} ms"
+        )
+    speedup = results["orm"]["mean_ms"] / results["rows"]["mean_ms"]
+    print(f"rows path is {speedup:.1f}x faster, encoder: {ENCODER}")
+
+    path = save_results(
+        "serialization",
+        {
+            "params": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+            "config": {"encoder": ENCODER},
+            "scenarios": results,
+        },
+        args.output,
+    )
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000, help="Messages per page")
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/...)")
+    main(parser.parse_args())
@@ -0,0 +1,128 @@
+"""Размер и время кодирования страницы истории в разных форматах.
+
+Страница сообщений (строки с полями MessageRead, как их отдает
+/messages/chat/{chat_id}) кодируется в JSON и MessagePack, без сжатия,
+gzip и brotli с уровнями из настроек API:
+
+    python -m benchmarks.wire_formats --messages 100 1000 --rounds 200
+
+Форматы, для которых не установлен пакет (msgpack, brotli), пропускаются.
+Результаты сохраняются в JSON (benchmarks/results).
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.db.models.message import MessageSender, MessageStatus
+from app.utils.compression import ENCODINGS, new_compressor
+from app.utils.serialization import (
+    MEDIA_TYPES,
+    MSGPACK_MEDIA_TYPE,
+    FastJSONResponse,
+    MsgPackResponse,
+)
+from benchmarks.common import percentile, save_results
+
+WORDS = "привет как дела расскажи подробнее про это спасибо понятно а если".split()
+
+
+def make_page(size: int) -> List[dict]:
+    rng = random.Random(42)
+    started = datetime(2025, 1, 1)
+    return [
+        {
+            "id": idx,
+            "text": " ".join(rng.choices(WORDS, k=rng.randint(3, 120))),
+            "status": MessageStatus.DELIVERED,
+            "sender": MessageSender.USER if idx % 2 else MessageSender.BOT,
+            "chat_id": 1,
+            "created_at": started + timedelta(seconds=idx),
+            "updated_at": started + timedelta(seconds=idx, microseconds=idx),
+        }
+        for idx in range(1, size + 1)
+    ]
+
+
+def encoder(media_type: str, encoding: Optional[str]) -> Callable[[list], bytes]:
+    response_class = (
+        MsgPackResponse if media_type == MSGPACK_MEDIA_TYPE else FastJSONResponse
+    )
+
+    def encode(page: list) -> bytes:
+        body = response_class(page).body
+        if encoding is None:
+            return body
+        compressor = new_compressor(
+            encoding,
+            settings.api.compression_gzip_level,
+            settings.api.compression_brotli_quality,
+        )
+        return compressor.compress(body, final=True)
+
+    return encode
+
+
+def measure(encode: Callable[[list], bytes], page: list, rounds: int) -> dict:
+    timings: List[float] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        body = encode(page)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        "bytes": len(body),
+        "encode_mean_ms": round(statistics.fmean(timings), 3),
+        "encode_p99_ms": round(percentile(timings, 0.99), 3),
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    results: Dict[str, Dict[str, dict]] = {}
+    for size in args.messages:
+        page = make_page(size)
+        results[str(size)] = {}
+        print(f"{size} messages")
+        for media_type in MEDIA_TYPES:
+            for encoding in (None, *ENCODINGS):
+                name = f"{media_type.split('/')[1]}+{encoding or 'identity'}"
+                encode = encoder(media_type, encoding)
+                encode(page)  # Прогрев
+                summary = measure(encode, page, args.rounds)
+                results[str(size)][name] = summary
+                print(
+                    f"  {name:<18} {summary['bytes']:>10} bytes  "
+                    f"encode {summary['encode_mean_ms']:8.3f} ms  "
+                    f"p99 {summary['encode_p99_ms']:8.3f} ms"
+                )
+
+    path = save_results(
+        "wire_formats",
+        {
+            "params": {
+                key: value for key, value in vars(args).items() if key != "output"
+            },
+            "config": {
+                "gzip_level": settings.api.compression_gzip_level,
+                "brotli_quality": settings.api.compression_brotli_quality,
+                "media_types": list(MEDIA_TYPES),
+                "encodings": list(ENCODINGS),
+            },
+            "scenarios": results,
+        },
+        args.output,
+    )
+    print(f"Results saved to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--messages", type=int, nargs="+", default=[100, 1000], help="Page sizes"
+    )
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/...)")
+    main(parser.parse_args())
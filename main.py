@@ -1,7 +1,27 @@
 from fastapi import FastAPI
 from app.api.routes import api_router
+from app.core.config import settings
+from app.core.lifespan import lifespan
+from app.core.middleware import (
+    CompressionMiddleware,
+    ReadYourWritesMiddleware,
+    RequestMetricsMiddleware,
+)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+if settings.db.replica_urls:
+    app.add_middleware(
+        ReadYourWritesMiddleware, window=settings.db.read_your_writes_window
+    )
+if settings.api.compression_enabled:
+    # Добавлен раньше метрик, значит внутри них: время сжатия входит в замер
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.api.compression_minimum_size,
+        gzip_level=settings.api.compression_gzip_level,
+        brotli_quality=settings.api.compression_brotli_quality,
+    )
+app.add_middleware(RequestMetricsMiddleware, debug_headers=settings.api.debug)
 
 
 app.include_router(api_router)
@@ -1,6 +1,4 @@
 #!/bin/bash
 
-echo "Run apply migrations.."
-/app/.venv/bin/alembic upgrade head
-echo "End apply migartions.."
-exec /app/.venv/bin/uvicorn main:app --host 0.0.0.0 --port 8000
+# Миграции применяет лаунчер один раз перед запуском воркеров (SERVER_MIGRATE)
+exec /app/.venv/bin/python -m app.launcher
@@ -0,0 +1,102 @@
+import os
+
+# Локальный агент вместо Yandex GPT; настройки читаются при импорте приложения
+os.environ.setdefault("GPT_FAKE", "true")
+os.environ.setdefault("GPT_FAKE_LATENCY", "0")
+os.environ.setdefault("GPT_FAKE_TOKEN_DELAY", "0")
+
+from dataclasses import dataclass
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.authentication.auth import current_active_user
+from app.core.jobs import job_queue
+from app.db.database import db_helper
+from app.db.instrumentation import instrument_engine
+from app.db.models import Base, Chat, User
+from app.db.replicas import ReplicaRouter
+from main import app
+
+pytest_plugins = ["pytester", "app.testing.statement_budget"]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@dataclass
+class Users:
+    """Владелец данных и посторонний пользователь; current - тот, от чьего имени запрос"""
+
+    owner: User
+    stranger: User
+    current: User
+
+
+@pytest.fixture
+async def db(monkeypatch, tmp_path):
+    """Приложение на файле SQLite со счетчиком запросов, без реплик
+
+    Файл, а не база в памяти: у каждой сессии свое соединение и своя
+    транзакция, как с настоящей базой.
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    instrument_engine(engine.sync_engine)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(db_helper, "engine", engine)
+    monkeypatch.setattr(
+        db_helper,
+        "session_factory",
+        async_sessionmaker(engine, autoflush=False, expire_on_commit=False),
+    )
+    monkeypatch.setattr(db_helper, "replicas", ReplicaRouter([]))
+    try:
+        yield db_helper.session_factory
+    finally:
+        # Фоновые задачи теста (ответы бота, названия) дописываются в его базу
+        await job_queue.stop(timeout=5)
+        await engine.dispose()
+
+
+@pytest.fixture
+async def users(db):
+    async with db() as session:
+        owner, stranger = (
+            User(
+                email=email,
+                hashed_password="-",
+                is_active=True,
+                is_superuser=False,
+                is_verified=True,
+            )
+            for email in ("owner@example.com", "stranger@example.com")
+        )
+        session.add_all([owner, stranger])
+        await session.commit()
+    users = Users(owner=owner, stranger=stranger, current=owner)
+    app.dependency_overrides[current_active_user] = lambda: users.current
+    try:
+        yield users
+    finally:
+        app.dependency_overrides.pop(current_active_user, None)
+
+
+@pytest.fixture
+async def chat(db, users):
+    async with db() as session:
+        chat = Chat(title="chat", user_id=users.owner.id)
+        session.add(chat)
+        await session.commit()
+    return chat
+
+
+@pytest.fixture
+async def client(users):
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        yield client
@@ -0,0 +1,28 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def vary(response) -> set:
+    return {value.strip() for value in response.headers.get("vary", "").split(",")}
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, weak", [("gzip", True), ("identity", False)]
+)
+async def test_not_modified_repeats_validators_and_vary(
+    client, chat, accept_encoding, weak
+):
+    headers = {"Accept-Encoding": accept_encoding}
+    full = await client.get("/chats", headers=headers)
+    etag = full.headers["etag"]
+    assert etag.startswith("W/") is weak
+
+    cached = await client.get(
+        "/chats", headers={**headers, "If-None-Match": etag}
+    )
+
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert cached.headers["last-modified"] == full.headers["last-modified"]
+    assert vary(cached) == vary(full) == {"Accept", "Accept-Encoding"}
@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from app.utils.job_queue import InMemoryJobBackend, JobQueue
+
+pytestmark = pytest.mark.anyio
+
+
+def make_queue(concurrency: int) -> JobQueue:
+    return JobQueue(
+        InMemoryJobBackend(),
+        concurrency=concurrency,
+        max_retries=1,
+        backoff_base=0.4,
+        backoff_max=0.4,
+    )
+
+
+async def wait_until(condition) -> None:
+    async with asyncio.timeout(2):
+        while not condition():
+            await asyncio.sleep(0.01)
+
+
+async def test_burst_for_one_key_leaves_workers_for_other_keys():
+    queue = make_queue(concurrency=2)
+    release = asyncio.Event()
+    done = []
+
+    async def job(name: str) -> None:
+        if name.startswith("a"):
+            await release.wait()
+        done.append(name)
+
+    queue.register("job", job)
+    for idx in range(5):
+        await queue.enqueue("job", {"name": f"a{idx}"}, key="chat:1")
+    await queue.enqueue("job", {"name": "b"}, key="chat:2")
+    try:
+        await wait_until(lambda: "b" in done)
+        release.set()
+        await wait_until(lambda: len(done) == 6)
+        assert [name for name in done if name.startswith("a")] == [
+            f"a{idx}" for idx in range(5)
+        ]
+    finally:
+        release.set()
+        await queue.stop(timeout=1)
+
+
+async def test_backoff_does_not_hold_a_worker_or_break_key_order():
+    queue = make_queue(concurrency=1)
+    failed = set()
+    done = []
+
+    async def job(name: str) -> None:
+        if name == "a1" and name not in failed:
+            failed.add(name)
+            raise RuntimeError("temporary failure")
+        done.append(name)
+
+    queue.register("job", job)
+    await queue.enqueue("job", {"name": "a1"}, key="chat:1")
+    await queue.enqueue("job", {"name": "a2"}, key="chat:1")
+    await queue.enqueue("job", {"name": "b"}, key="chat:2")
+    try:
+        await wait_until(lambda: len(done) == 3)
+        # b прошла, пока a1 ждала повтора; a2 - только после a1
+        assert done == ["b", "a1", "a2"]
+        await queue.stop(timeout=1)
+        assert queue.in_flight == 0
+    finally:
+        await queue.stop(timeout=1)
@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from sqlalchemy import delete
+
+from app.core.config import settings
+from app.db.models import Message
+from app.schemas.message import MessageCreate
+from app.services.MessageService import message_service
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("flush_chars", [1, 100000], ids=["flushing", "final-save"])
+async def test_bot_message_deleted_mid_stream_ends_with_error(
+    db, users, chat, monkeypatch, flush_chars
+):
+    monkeypatch.setattr(settings.gpt, "stream_flush_chars", flush_chars)
+    async with db() as session:
+        user_message, bot_message = await message_service.start_stream(
+            session,
+            MessageCreate(text="one two three four five", chat_id=chat.id),
+            users.owner.id,
+        )
+
+    events = []
+    async for event, data in message_service.stream_ai_response(
+        bot_message, user_message
+    ):
+        events.append((event, json.loads(data)))
+        if len(events) == 1:
+            async with db() as session:
+                await session.execute(delete(Message).where(Message.id == bot_message.id))
+                await session.commit()
+
+    event, data = events[-1]
+    assert event == "error"
+    assert data == {
+        "id": bot_message.id,
+        "chat_id": chat.id,
+        "detail": "Message was deleted",
+    }
+    if flush_chars == 1:
+        # Генерация остановилась на первом же сохранении после удаления
+        assert [event for event, _ in events] == ["token", "error"]
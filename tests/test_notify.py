@@ -0,0 +1,100 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.db.notify import PgNotifier
+from app.utils.pubsub import RESYNC, PubSubHub
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeDriver:
+    """Соединение asyncpg: слушатели каналов и закрытия"""
+
+    def __init__(self) -> None:
+        self.channels = {}
+        self.on_terminate = []
+        self.alive = True
+
+    async def add_listener(self, channel, callback):
+        self.channels[channel] = callback
+
+    def add_termination_listener(self, callback):
+        self.on_terminate.append(callback)
+
+    async def fetchval(self, query):
+        if not self.alive:
+            raise ConnectionError("connection is closed")
+        return 1
+
+    def terminate(self):
+        self.alive = False
+        for callback in self.on_terminate:
+            callback(self)
+
+
+class FakeEngine:
+    def __init__(self) -> None:
+        self.drivers = []
+
+    async def connect(self):
+        driver = FakeDriver()
+        self.drivers.append(driver)
+
+        async def get_raw_connection():
+            return SimpleNamespace(driver_connection=driver)
+
+        async def noop():
+            pass
+
+        return SimpleNamespace(
+            get_raw_connection=get_raw_connection, invalidate=noop, close=noop
+        )
+
+
+async def wait_for_connections(engine: FakeEngine, count: int) -> None:
+    async with asyncio.timeout(1):
+        while len(engine.drivers) < count:
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+async def notifier():
+    engine = FakeEngine()
+    notifier = PgNotifier(engine, health_interval=0.05, health_timeout=0.05)
+    try:
+        yield notifier
+    finally:
+        await notifier.close()
+
+
+@pytest.mark.parametrize("silent", [False, True], ids=["terminated", "health-check"])
+async def test_reconnects_and_listens_again(notifier, silent):
+    received, reconnects = [], []
+    notifier.on_reconnect(lambda: reconnects.append(True))
+    await notifier.subscribe("events", received.append)
+    first = notifier.engine.drivers[0]
+
+    if silent:
+        first.alive = False
+    else:
+        first.terminate()
+    await wait_for_connections(notifier.engine, 2)
+    await asyncio.sleep(0)
+
+    second = notifier.engine.drivers[1]
+    second.channels["events"](second, 1, "events", "after")
+    assert received == ["after"]
+    assert reconnects == [True]
+
+
+async def test_hub_resync_resets_every_subscription():
+    hub = PubSubHub(queue_size=10)
+    first, second = hub.subscribe("chat:1"), hub.subscribe("chat:2")
+    hub.publish("chat:1", "stale")
+
+    hub.resync()
+
+    assert await first.get() == RESYNC
+    assert await second.get() == RESYNC
@@ -0,0 +1,82 @@
+"""Сколько запросов к базе делают эндпоинты с проверкой владельца
+
+Владелец проверяется в том же запросе, что читает или меняет данные;
+второй запрос бывает только на ошибке, чтобы отличить 404 от 403.
+"""
+
+import pytest
+
+from app.db.models import Message
+from app.db.models.message import MessageSender, MessageStatus
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def message(db, chat):
+    async with db() as session:
+        message = Message(
+            text="hello",
+            status=MessageStatus.DELIVERED,
+            sender=MessageSender.USER,
+            chat_id=chat.id,
+            user_id=chat.user_id,
+        )
+        session.add(message)
+        await session.commit()
+    return message
+
+
+# (пользователь, метод, путь, тело, статус, запросов к базе)
+CASES = [
+    ("owner", "GET", "/messages/{message}", None, 200, 1),
+    ("owner", "GET", "/messages/0", None, 404, 1),
+    ("stranger", "GET", "/messages/{message}", None, 403, 1),
+    ("owner", "PUT", "/messages/{message}", {"text": "edited"}, 200, 1),
+    ("owner", "PUT", "/messages/0", {"text": "edited"}, 404, 2),
+    ("stranger", "PUT", "/messages/{message}", {"text": "edited"}, 403, 2),
+    ("owner", "DELETE", "/messages/{message}", None, 204, 3),
+    ("owner", "DELETE", "/messages/0", None, 404, 2),
+    ("stranger", "DELETE", "/messages/{message}", None, 403, 2),
+    ("owner", "GET", "/messages/chat/{chat}/latest", None, 200, 1),
+    ("stranger", "GET", "/messages/chat/{chat}/latest", None, 403, 2),
+    ("owner", "GET", "/messages/chat/{chat}/count", None, 200, 1),
+    ("stranger", "GET", "/messages/chat/{chat}/count", None, 403, 1),
+    ("owner", "GET", "/chats/{chat}", None, 200, 1),
+    ("stranger", "GET", "/chats/{chat}", None, 403, 1),
+    ("owner", "PUT", "/chats/{chat}", {"title": "renamed"}, 200, 1),
+    ("owner", "PUT", "/chats/0", {"title": "renamed"}, 404, 2),
+    ("stranger", "PUT", "/chats/{chat}", {"title": "renamed"}, 403, 2),
+    ("owner", "PATCH", "/chats/{chat}/title", {"title": "renamed"}, 200, 1),
+    ("stranger", "PATCH", "/chats/{chat}/title", {"title": "renamed"}, 403, 2),
+    ("owner", "DELETE", "/chats/{chat}", None, 204, 5),
+    ("owner", "DELETE", "/chats/0", None, 404, 2),
+    ("stranger", "DELETE", "/chats/{chat}", None, 403, 2),
+]
+
+
+@pytest.mark.parametrize(
+    "who, method, path, body, expected_status, expected_statements",
+    CASES,
+    ids=[f"{who}-{method}-{path}-{status}" for who, method, path, _, status, _ in CASES],
+)
+async def test_statements_per_endpoint(
+    client,
+    users,
+    chat,
+    message,
+    statement_counter,
+    who,
+    method,
+    path,
+    body,
+    expected_status,
+    expected_statements,
+):
+    users.current = getattr(users, who)
+    url = path.format(chat=chat.id, message=message.id)
+    with statement_counter() as stats:
+        response = await client.request(method, url, json=body)
+
+    assert response.status_code == expected_status
+    assert stats.statements == expected_statements
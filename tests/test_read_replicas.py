@@ -0,0 +1,24 @@
+import pytest
+
+from app.db.database import db_helper
+from app.db.replicas import Replica, ReplicaRouter
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def replica(db, monkeypatch, tmp_path):
+    """Реплика, к которой нельзя подключиться: файла базы нет и создать его негде"""
+    replica = Replica(f"sqlite+aiosqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    monkeypatch.setattr(db_helper, "replicas", ReplicaRouter([replica]))
+    yield replica
+    await replica.engine.dispose()
+
+
+async def test_unreachable_replica_falls_back_to_primary(replica, chat, client):
+    response = await client.get("/chats")
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [chat.id]
+    assert not replica.healthy
+    assert replica.in_use == 0
@@ -0,0 +1,43 @@
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.endpoints.realtime import _bearer_token, _TokenRedactingFilter
+
+
+def websocket(subprotocols=(), authorization=None):
+    headers = {"authorization": authorization} if authorization else {}
+    return SimpleNamespace(scope={"subprotocols": list(subprotocols)}, headers=headers)
+
+
+@pytest.mark.parametrize(
+    "socket, query, expected",
+    [
+        (websocket(["bearer", "abc"]), None, ("abc", "bearer")),
+        (websocket(["bearer", "abc"]), "old", ("abc", "bearer")),
+        (websocket(["bearer"]), None, (None, None)),
+        (websocket(authorization="Bearer abc"), "old", ("abc", None)),
+        (websocket(), "old", ("old", None)),
+        (websocket(), None, (None, None)),
+    ],
+)
+def test_bearer_token_sources(socket, query, expected):
+    assert _bearer_token(socket, query) == expected
+
+
+def test_token_is_redacted_from_uvicorn_logs():
+    record = logging.LogRecord(
+        "uvicorn.error",
+        logging.INFO,
+        __file__,
+        1,
+        '%s - "WebSocket %s" [accepted]',
+        ("127.0.0.1:5000", "/ws/chats/1?token=secret&x=1"),
+        None,
+    )
+
+    assert _TokenRedactingFilter().filter(record)
+    assert record.getMessage() == (
+        '127.0.0.1:5000 - "WebSocket /ws/chats/1?token=***&x=1" [accepted]'
+    )
@@ -0,0 +1,84 @@
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+
+from app.db.models import Message
+from app.db.models.message import MessageSender, MessageStatus
+from app.db.notify import MAX_PAYLOAD_BYTES
+from app.services.RealtimeService import RealtimeService
+from app.utils.pubsub import RESYNC, PostgresPubSubBackend
+
+pytestmark = pytest.mark.anyio
+
+# Каждый символ экранируется и в событии, и в обертке NOTIFY
+ESCAPE_HEAVY_TEXT = '"\\' * 1600 + "\n" * 200
+
+
+class FakeNotifier:
+    def __init__(self) -> None:
+        self.payloads = []
+
+    async def subscribe(self, channel, callback):
+        pass
+
+    def on_reconnect(self, callback):
+        pass
+
+    async def publish(self, channel, payload):
+        self.payloads.append(payload)
+
+    async def close(self):
+        pass
+
+
+def message(text: str) -> Message:
+    now = datetime(2025, 1, 1)
+    return Message(
+        id=1,
+        text=text,
+        status=MessageStatus.DELIVERED,
+        sender=MessageSender.BOT,
+        chat_id=1,
+        user_id=1,
+        created_at=now,
+        updated_at=now,
+    )
+
+
+@pytest.fixture
+async def backend():
+    backend = PostgresPubSubBackend(FakeNotifier())
+    await backend.start(lambda topic, data: None, lambda: None)
+    try:
+        yield backend
+    finally:
+        await backend.close()
+
+
+async def sent(backend) -> dict:
+    async with asyncio.timeout(1):
+        while not backend.notifier.payloads:
+            await asyncio.sleep(0.01)
+    payload = backend.notifier.payloads[-1]
+    assert len(payload.encode()) <= MAX_PAYLOAD_BYTES
+    return json.loads(payload)
+
+
+async def test_escape_heavy_message_is_truncated_to_fit_notify(backend):
+    event = RealtimeService.message_event(message(ESCAPE_HEAVY_TEXT))
+    # Само событие меньше лимита, вдвое больше оно только в обертке
+    assert len(json.dumps({"type": "message", "text": ESCAPE_HEAVY_TEXT})) < 7000
+
+    backend.publish("chat:1", event)
+
+    data = json.loads((await sent(backend))["data"])
+    assert data["truncated"] is True
+    assert data["message"]["text"] is None
+
+
+async def test_oversized_payload_becomes_resync(backend):
+    backend.publish("chat:1", json.dumps({"text": ESCAPE_HEAVY_TEXT * 2}))
+
+    assert (await sent(backend))["data"] == RESYNC
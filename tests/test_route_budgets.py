@@ -0,0 +1,157 @@
+"""Маршруты с бюджетом запросов укладываются в него, в том числе с ошибкой
+
+Превышение бюджета роняет тест через плагин statement_budget. Тест
+роутера проверяет еще, что вызван каждый его маршрут с бюджетом.
+"""
+
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Set, Tuple
+
+import pytest
+from fastapi import APIRouter
+from starlette.routing import Match
+
+from app.api.endpoints.chats import chats_router
+from app.api.endpoints.messages import messages_router
+from app.api.endpoints.sync import sync_router
+from app.db.models import Message
+from app.db.models.message import MessageSender, MessageStatus
+from app.utils.pagination import SyncToken, encode_sync_token
+
+pytestmark = pytest.mark.anyio
+
+
+class Call(NamedTuple):
+    who: str
+    method: str
+    path: str
+    status: int
+    body: Optional[dict] = None
+    params: Optional[dict] = None
+
+
+def budgeted_routes(router: APIRouter) -> Set[Tuple[str, str]]:
+    return {
+        (method, route.path)
+        for route in router.routes
+        if hasattr(route.endpoint, "statement_budget")
+        for method in route.methods
+    }
+
+
+def matched_route(router: APIRouter, method: str, path: str) -> Tuple[str, str]:
+    scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+    for route in router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return method, route.path
+    raise AssertionError(f"No route for {method} {path}")
+
+
+async def check_router(
+    router: APIRouter, client, users, calls: List[Call], **ids
+) -> None:
+    called = set()
+    for call in calls:
+        users.current = getattr(users, call.who)
+        path = call.path.format(**ids)
+        response = await client.request(
+            call.method, path, json=call.body, params=call.params
+        )
+        assert response.status_code == call.status, (call, response.text)
+        called.add(matched_route(router, call.method, path))
+
+    assert budgeted_routes(router) <= called
+
+
+@pytest.fixture
+async def message(db, chat):
+    async with db() as session:
+        message = Message(
+            text="hello",
+            status=MessageStatus.DELIVERED,
+            sender=MessageSender.USER,
+            chat_id=chat.id,
+            user_id=chat.user_id,
+        )
+        session.add(message)
+        await session.commit()
+    return message
+
+
+async def test_chats_router_budgets(client, users, chat):
+    await check_router(
+        chats_router,
+        client,
+        users,
+        [
+            Call("owner", "GET", "/chats", 200),
+            Call("owner", "POST", "/chats", 201, {"title": "new", "user_id": users.owner.id}),
+            Call("stranger", "POST", "/chats", 403, {"title": "new", "user_id": users.owner.id}),
+            Call("owner", "GET", "/chats/{chat}", 200),
+            Call("owner", "GET", "/chats/0", 404),
+            Call("stranger", "GET", "/chats/{chat}", 403),
+            Call("owner", "PUT", "/chats/{chat}", 200, {"title": "renamed"}),
+            Call("owner", "PUT", "/chats/0", 404, {"title": "renamed"}),
+            Call("stranger", "PUT", "/chats/{chat}", 403, {"title": "renamed"}),
+            Call("owner", "PATCH", "/chats/{chat}/title", 200, {"title": "renamed"}),
+            Call("stranger", "PATCH", "/chats/{chat}/title", 403, {"title": "renamed"}),
+            Call("stranger", "DELETE", "/chats/{chat}", 403),
+            Call("owner", "DELETE", "/chats/0", 404),
+            Call("owner", "DELETE", "/chats/{chat}", 204),
+        ],
+        chat=chat.id,
+    )
+
+
+async def test_messages_router_budgets(client, users, chat, message):
+    new_message = {"text": "hi", "chat_id": chat.id}
+    await check_router(
+        messages_router,
+        client,
+        users,
+        [
+            Call("owner", "GET", "/messages/chat/{chat}", 200),
+            Call("stranger", "GET", "/messages/chat/{chat}", 200),
+            Call("owner", "GET", "/messages/chat/{chat}", 400, params={"before": "x", "after": "y"}),
+            Call("owner", "GET", "/messages/chat/{chat}", 400, params={"before": "x"}),
+            Call("owner", "GET", "/messages/chat/{chat}/export", 200),
+            Call("stranger", "GET", "/messages/chat/{chat}/export", 403),
+            Call("owner", "GET", "/messages/{message}", 200),
+            Call("owner", "GET", "/messages/0", 404),
+            Call("stranger", "GET", "/messages/{message}", 403),
+            Call("owner", "POST", "/messages", 201, new_message),
+            Call("stranger", "POST", "/messages", 404, new_message),
+            Call("owner", "POST", "/messages/stream", 200, new_message),
+            Call("stranger", "POST", "/messages/stream", 404, new_message),
+            Call("owner", "PUT", "/messages/{message}", 200, {"text": "edited"}),
+            Call("owner", "PUT", "/messages/0", 404, {"text": "edited"}),
+            Call("stranger", "PUT", "/messages/{message}", 403, {"text": "edited"}),
+            Call("owner", "GET", "/messages/chat/{chat}/latest", 200),
+            Call("stranger", "GET", "/messages/chat/{chat}/latest", 403),
+            Call("owner", "GET", "/messages/chat/{chat}/count", 200),
+            Call("stranger", "GET", "/messages/chat/{chat}/count", 403),
+            Call("stranger", "DELETE", "/messages/{message}", 403),
+            Call("owner", "DELETE", "/messages/0", 404),
+            Call("owner", "DELETE", "/messages/{message}", 204),
+        ],
+        chat=chat.id,
+        message=message.id,
+    )
+
+
+async def test_sync_router_budgets(client, users, chat, message):
+    response = await client.get("/sync")
+    next_token = response.json()["next_token"]
+    expired = encode_sync_token(SyncToken(watermark=datetime(2000, 1, 1)))
+    await check_router(
+        sync_router,
+        client,
+        users,
+        [
+            Call("owner", "GET", "/sync", 200),
+            Call("owner", "GET", "/sync", 200, params={"since": next_token}),
+            Call("owner", "GET", "/sync", 400, params={"since": "not a token"}),
+            Call("owner", "GET", "/sync", 410, params={"since": expired}),
+        ],
+    )
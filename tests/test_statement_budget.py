@@ -0,0 +1,67 @@
+"""Плагин app.testing.statement_budget на отдельном прогоне pytest"""
+
+import pytest
+
+TEST_MODULE = '''
+import asyncio
+
+from sqlalchemy import create_engine, text
+
+from app.db.instrumentation import instrument_engine, statement_budget
+
+engine = create_engine("sqlite://")
+instrument_engine(engine)
+
+
+async def run_statements(count):
+    with engine.connect() as conn:
+        for _ in range(count):
+            conn.execute(text("SELECT 1"))
+
+
+@statement_budget(2)
+async def endpoint(count):
+    await run_statements(count)
+
+
+def test_within_budget():
+    asyncio.run(endpoint(2))
+
+
+def test_over_budget():
+    asyncio.run(endpoint(3))
+
+
+def test_counter_fixture(statement_counter):
+    with statement_counter() as stats:
+        asyncio.run(run_statements(3))
+    assert stats.statements == 3
+'''
+
+
+@pytest.fixture
+def isolated(pytester, monkeypatch, request):
+    # Отдельный процесс: budget_listeners общий на процесс, а внешний тест
+    # сам идет под плагином
+    monkeypatch.setenv("PYTHONPATH", str(request.config.rootpath))
+    pytester.makepyfile(test_budget=TEST_MODULE)
+    return pytester
+
+
+def test_plugin_fails_test_over_budget(isolated):
+    result = isolated.runpytest_subprocess("-p", "app.testing.statement_budget")
+
+    result.assert_outcomes(passed=2, failed=1)
+    result.stdout.fnmatch_lines(
+        [
+            "*test_over_budget*",
+            "SQL statement budget exceeded:",
+            "*test_budget.endpoint: 3 statements, budget 2",
+        ]
+    )
+
+
+def test_without_plugin_budget_is_only_logged(isolated):
+    result = isolated.runpytest_subprocess("-k", "not counter_fixture")
+
+    result.assert_outcomes(passed=2)
@@ -0,0 +1,45 @@
+"""Страница /sync читается по индексу (user_id, updated_at, id)
+
+План берется у того самого запроса, что выполняет get_changed_since: без
+соединения с чатами и без сортировки во временном B-дереве.
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, text
+
+from app.crud.CRUDMessage import crud_message
+from app.db.database import db_helper
+from app.utils.pagination import Cursor
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_changed_since_uses_user_index(db, users):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    sync_engine = db_helper.engine.sync_engine
+    event.listen(sync_engine, "before_cursor_execute", capture)
+    try:
+        async with db() as session:
+            await crud_message.get_changed_since(
+                session, users.owner.id, Cursor(datetime(2025, 1, 1), 0), 100
+            )
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", capture)
+
+    [(statement, parameters)] = statements
+    async with db_helper.engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        cursor = await raw.driver_connection.execute(
+            f"EXPLAIN QUERY PLAN {statement}", parameters
+        )
+        plan = " | ".join(row[-1] for row in await cursor.fetchall())
+
+    assert "ix_messages_user_id_updated_at_id" in plan, plan
+    assert "chats" not in plan, plan
+    assert "TEMP B-TREE" not in plan, plan
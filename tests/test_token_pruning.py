@@ -0,0 +1,81 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.core.authentication import token_pruning
+from app.db.maintenance import drop_daily_partitions_before
+from app.db.models import AccessToken
+
+pytestmark = pytest.mark.anyio
+
+
+async def fail(*args, **kwargs):
+    raise RuntimeError("partition maintenance failed")
+
+
+async def test_partition_errors_do_not_stop_pruning(db, users, monkeypatch, caplog):
+    async def partitioned(session, table):
+        return True
+
+    monkeypatch.setattr(token_pruning, "is_partitioned", partitioned)
+    monkeypatch.setattr(token_pruning, "ensure_daily_partitions", fail)
+    monkeypatch.setattr(token_pruning, "drop_daily_partitions_before", fail)
+    expired = datetime.now(timezone.utc) - timedelta(days=30)
+    async with db() as session:
+        session.add_all(
+            [
+                AccessToken(token="expired", user_id=users.owner.id, created_at=expired),
+                AccessToken(token="fresh", user_id=users.owner.id),
+            ]
+        )
+        await session.commit()
+
+    assert await token_pruning.prune_access_tokens() == 1
+    assert "Failed to create access token partitions" in caplog.text
+    assert "Failed to drop expired access token partitions" in caplog.text
+
+
+class PartitionSession:
+    """Сессия без PostgreSQL: каталог отвечает списком партиций, DROP запоминается"""
+
+    def __init__(self, partitions):
+        self.partitions = partitions
+        self.dropped = []
+
+    async def execute(self, statement, params=None):
+        sql = str(statement)
+        if sql.startswith("DROP TABLE"):
+            self.dropped.append(sql)
+            return None
+        # Фильтр по имени выполнил бы PostgreSQL; выражение то же, что в ~
+        pattern = re.compile(params["pattern"])
+        return Rows([name for name in self.partitions if pattern.search(name)])
+
+
+class Rows:
+    def __init__(self, names):
+        self.names = names
+
+    def scalars(self):
+        return iter(self.names)
+
+
+async def test_drop_partitions_matches_names_exactly(caplog):
+    session = PartitionSession(
+        [
+            "access_tokens_p20250101",
+            "access_tokens_p20250199",
+            "accessXtokens_p20250101",
+            "access_tokens_p20250101_old",
+            "access_tokens_p20250102",
+        ]
+    )
+
+    dropped = await drop_daily_partitions_before(
+        session, "access_tokens", datetime(2025, 1, 2, tzinfo=timezone.utc)
+    )
+
+    assert dropped == ["access_tokens_p20250101"]
+    assert session.dropped == ['DROP TABLE "access_tokens_p20250101"']
+    assert "access_tokens_p20250199" in caplog.text